@@ -4,51 +4,84 @@ import os
 import sys
 import logging
 import argparse
-import io
 import contextlib
-from ennchan_rag.ask import ask
+import shutil
+import warnings
+from ennchan_rag.engine import Engine
 
-class QuietFilter(logging.Filter):
-    def filter(self, record):
-        return False
+HISTORY_FILE = os.path.expanduser("~/.ennchan_rag_history")
+EXIT_COMMANDS = ["exit", "quit", "close", "q"]
 
-@contextlib.contextmanager
-def suppress_output(verbose=False):
-    """Context manager to suppress both stdout and stderr output."""
+def configure_logging(verbose=False):
+    """Configure logging once for the whole session."""
     if verbose:
-        yield  # Don't suppress anything in verbose mode
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        return
+    logging.basicConfig(level=logging.CRITICAL)
+    # Libraries that install their own handlers ignore the root level
+    for name in ("transformers", "sentence_transformers", "httpx", "urllib3"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+
+def quiet_output(verbose=False, sink=None):
+    """Redirect stdout/stderr to sink unless verbose; cheap enough to use every turn."""
+    if verbose:
+        return contextlib.nullcontext()
+    stack = contextlib.ExitStack()
+    stack.enter_context(contextlib.redirect_stdout(sink))
+    stack.enter_context(contextlib.redirect_stderr(sink))
+    return stack
+
+def enable_history():
+    """Enable line editing and persistent input history when readline is available."""
+    try:
+        import readline
+    except ImportError:
         return
-        
-    # Save original stdout/stderr and logging configuration
-    save_stdout = sys.stdout
-    save_stderr = sys.stderr
-    root_logger = logging.getLogger()
-    original_level = root_logger.level
-    original_filters = root_logger.filters.copy()
-    original_handlers = root_logger.handlers.copy()
-    
+    import atexit
     try:
-        # Redirect stdout/stderr
-        sys.stdout = io.StringIO()
-        sys.stderr = io.StringIO()
-        
-        # Silence root logger
-        root_logger.setLevel(logging.CRITICAL)
-        quiet_filter = QuietFilter()
-        root_logger.addFilter(quiet_filter)
-        
-        # Silence all other loggers
-        for logger_name in logging.root.manager.loggerDict:
-            logging.getLogger(logger_name).setLevel(logging.CRITICAL)
-        
-        yield
-    finally:
-        # Restore stdout/stderr and logging configuration
-        sys.stdout = save_stdout
-        sys.stderr = save_stderr
-        root_logger.setLevel(original_level)
-        root_logger.filters = original_filters
-        root_logger.handlers = original_handlers
+        readline.read_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+    readline.set_history_length(1000)
+    atexit.register(readline.write_history_file, HISTORY_FILE)
+
+def read_prompt(multiline=False):
+    """Read one question; in multi-line mode an empty line ends it."""
+    prompt = input("\033[1mUser:\033[0m ")
+    if not multiline or prompt.strip().lower() in EXIT_COMMANDS or prompt.startswith("/"):
+        return prompt
+    lines = [prompt]
+    while lines[-1].strip():
+        lines.append(input("... "))
+    return "\n".join(lines).strip()
+
+def count_lines(text):
+    """Number of terminal lines text takes up once wrapped."""
+    width = shutil.get_terminal_size().columns or 80
+    return sum(max(1, -(-len(line) // width)) for line in text.split("\n"))
+
+def erase_lines(count, stream=None):
+    """Move the cursor up and clear the last count lines."""
+    (stream or sys.stdout).write("\033[F\033[K" * count)
+
+def parse_duration(value):
+    """Parse a duration such as '10s', '500ms', '2m' or '10' into seconds."""
+    units = {"ms": 0.001, "s": 1, "m": 60}
+    value = value.strip().lower()
+    for suffix in sorted(units, key=len, reverse=True):
+        if value.endswith(suffix):
+            value, scale = value[:-len(suffix)], units[suffix]
+            break
+    else:
+        scale = 1
+    try:
+        return float(value) * scale
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration: {value!r}")
 
 def clear_screen():
     """Clear the terminal screen."""
@@ -57,69 +90,141 @@ def clear_screen():
 def clean_output(output):
     return output.split("Answer:")[-1].strip()
 
-def print_header():
+def print_header(multiline=False):
     """Print the application header."""
     print("=" * 80)
     print("EnnchanRAG Command Line Interface".center(80))
-    print("Type 'exit', 'quit', 'close', or 'q' to exit".center(80))
+    print("Type 'exit', 'quit', 'close', or 'q' to exit, '/stats' for statistics".center(80))
+    print("'/new' starts a new conversation".center(80))
+    if multiline:
+        print("Finish a question with an empty line".center(80))
     print("=" * 80)
     print()
 
-def main():    
+def print_stats(stats):
+    """Print startup time, cache hit rates and the per-stage timings of the last answer."""
+    startup = stats["startup"]
+    rss = startup["peak_rss_bytes"]
+    print(f"\033[1mStartup\033[0m {startup['seconds']:.2f}s"
+          + (f", peak RSS {rss / (1024 * 1024):.0f} MiB" if rss else ""))
+    for name, model in startup["models"].items():
+        print(f"  {name:<28} {model['seconds']:.2f}s from {model['source']}")
+    caches = stats["caches"]
+    print("\033[1mCaches\033[0m")
+    for name, value in caches.items():
+        print(f"  {name:<28} {value:.0%}" if name.endswith("rate") else f"  {name:<28} {value}")
+    store = stats["store"]
+    print(f"  {'store_documents':<28} {store.get('documents', 0)}")
+
+    latency = stats["latency"]
+    if latency["count"]:
+        print("\033[1mLatency\033[0m")
+        print(f"  {latency['count']} answers, p50 {latency['p50']:.2f}s, "
+              f"p95 {latency['p95']:.2f}s, max {latency['max']:.2f}s")
+    replay = stats.get("replay")
+    if replay:
+        print(f"\033[1mCassette\033[0m {replay['recorded']} recorded, {replay['replayed']} replayed, "
+              f"{replay['missed']} replayed from another input of the same stage")
+
+    last = stats["last_answer"]
+    if not last["timings"]:
+        print("\nNo answer yet.\n")
+        return
+    phases = last["phase_timings"]
+    if phases:
+        print("\033[1mPhases\033[0m " + ", ".join(f"{phase} after {seconds:.2f}s" for phase, seconds in phases.items()))
+    print(f"\033[1mLast answer\033[0m ({last['pipeline_path'] or 'full'} pipeline)")
+    for stage, seconds in last["timings"].items():
+        print(f"  {stage:<28} {seconds:.2f}s")
+    if last["degraded"]:
+        print(f"  degraded: {', '.join(f'{stage} x{count}' for stage, count in last['degraded'].items())}")
+    dedup = last["dedup_stats"]
+    if dedup:
+        print(f"  search results: {dedup['results']} -> {dedup['unique']} unique")
+    compression = last.get("compression_stats")
+    if compression:
+        print(f"  context: {compression['tokens_before']} -> {compression['tokens_after']} tokens, "
+              f"~{compression['prefill_seconds_saved']:.2f}s prefill saved")
+    print()
+
+def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="EnnchanRAG Command Line Interface")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    parser.add_argument("--config", default=None, help="Path to the configuration file")
+    parser.add_argument("--latency-budget", type=parse_duration, default=None,
+                        help="Target response time, e.g. 10s; the pipeline skips stages to meet it")
+    parser.add_argument("--multiline", action="store_true",
+                        help="Read multi-line questions, finished by an empty line")
     args = parser.parse_args()
-    
+
+    configure_logging(args.verbose)
     if args.verbose:
-        # Configure verbose logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
         print("Verbose mode enabled. Debug information will be displayed.")
-    else:
-        # Configure minimal logging
-        logging.basicConfig(level=logging.CRITICAL)
- 
-    clear_screen()
-    print_header()
-    
-    run = True
-    while run:
-        try:
-            prompt = input("\033[1mUser:\033[0m ")
-            if prompt.lower() in ["exit", "quit", "close", "q"]:
-                print("\nThank you for using EnnchanRAG. Goodbye!")
+    enable_history()
+
+    # Load the models once; every question reuses them
+    print("\033[90mLoading models...\033[0m")
+    with open(os.devnull, "w") as sink:
+        with quiet_output(args.verbose, sink):
+            engine = Engine(args.config, latency_budget=args.latency_budget)
+        # Follow-ups are rewritten against the conversation and reuse its documents
+        session = engine.new_session() if engine.config.conversation_turns > 0 else None
+
+        clear_screen()
+        print_header(args.multiline)
+
+        run = True
+        while run:
+            try:
+                prompt = read_prompt(args.multiline)
+                if prompt.strip().lower() in EXIT_COMMANDS:
+                    print("\nThank you for using EnnchanRAG. Goodbye!")
+                    run = False
+                elif prompt.strip() == "":
+                    continue
+                elif prompt.strip() == "/stats":
+                    print_stats(engine.stats())
+                elif prompt.strip() == "/new":
+                    if session is not None:
+                        session.reset()
+                    print("\033[90mStarted a new conversation.\033[0m\n")
+                else:
+                    start_time = time.time()
+                    print("\033[90mThinking...\033[0m")
+                    # Lines to clear before printing the next phase: "Thinking..." at first
+                    shown = 1
+
+                    # Background threads of the request print too, so keep them
+                    # quiet until the answer is final and write to the terminal
+                    terminal = sys.stdout
+                    with quiet_output(args.verbose, sink):
+                        for phase in engine.ask_progressive(prompt, session):
+                            runtime = time.time() - start_time
+
+                            if not args.verbose:
+                                erase_lines(shown, terminal)
+
+                            if phase["phase"] == "provisional":
+                                # Shown dimmed until the refined answer replaces it
+                                text = f"Assistant (provisional): {clean_output(phase['answer'])}"
+                                note = f"(Provisional after {runtime:.2f} seconds, refining...)"
+                                print(f"\033[90m{text}\033[0m", file=terminal)
+                                print(f"\033[90m{note}\033[0m", file=terminal, flush=True)
+                                shown = count_lines(text) + count_lines(note)
+                            else:
+                                print(f"\033[1;34mAssistant:\033[0m {clean_output(phase['answer'])}", file=terminal)
+                                print(f"\033[90m(Response time: {runtime:.2f} seconds)\033[0m\n", file=terminal)
+
+            except (KeyboardInterrupt, EOFError):
+                print("\n\nOperation cancelled by user. Exiting...")
                 run = False
-            elif prompt.strip() == "":
-                continue
-            else:
-                start_time = time.time()
-                print("\033[90mThinking...\033[0m")
-                
-                # Suppress all output if not in verbose mode
-                with suppress_output(args.verbose):
-                    reply = ask(prompt, "..\\config.json")
-                
-                end_time = time.time()
-                runtime = end_time - start_time
-                
-                # Clear the "Thinking..." line
-                sys.stdout.write("\033[F\033[K")
-                
-                print(f"\033[1;34mAssistant:\033[0m {clean_output(reply)}")
-                print(f"\033[90m(Response time: {runtime:.2f} seconds)\033[0m\n")
-        
-        except KeyboardInterrupt:
-            print("\n\nOperation cancelled by user. Exiting...")
-            run = False
-        except Exception as e:
-            print(f"\n\033[31mError: {e}\033[0m")
-            if args.verbose:
-                import traceback
-                print("\033[31m" + traceback.format_exc() + "\033[0m")
-            print("Please try again or type 'exit' to quit.")
+            except Exception as e:
+                print(f"\n\033[31mError: {e}\033[0m")
+                if args.verbose:
+                    import traceback
+                    print("\033[31m" + traceback.format_exc() + "\033[0m")
+                print("Please try again or type 'exit' to quit.")
 
 if __name__ == "__main__":
     main()
@@ -5,6 +5,7 @@ __version__ = "0.1.0"
 # Convenience imports
 from langchain_core.documents import Document
 from ennchan_rag.ask import ask
+from ennchan_rag.engine import Engine
 from ennchan_rag.core.model import QAModel, SearchAugmentedQAModel
 from ennchan_rag.core.interfaces import LLMInterface, \
     VectorStoreInterface, RetrievalStrategy, DocLoader
\ No newline at end of file
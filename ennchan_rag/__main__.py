@@ -0,0 +1,216 @@
+import argparse
+import os
+import statistics
+import sys
+
+from ennchan_rag.config import load_config
+from ennchan_rag.engine import load_llm
+from ennchan_rag.ingest import MANIFEST_FILE, ingest
+from ennchan_rag.loaders import TextLoaderAdapter
+from ennchan_rag.retrievers import CrossEncoderReranker, benchmark_reranker
+from ennchan_rag.stores import ManagedVectorStore, benchmark_store
+from ennchan_rag.utils.embeddings import EMBEDDING_BACKENDS, benchmark_embeddings, embedding_options, load_embeddings
+from ennchan_rag.utils.stubs import benchmark_pipeline
+
+
+def format_bytes(size: float) -> str:
+    """Format a byte count with a binary unit."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def run_ingest(args: argparse.Namespace) -> int:
+    """Ingest sources into the persistent index and report throughput."""
+    stats = ingest(args.sources, args.config, workers=args.workers)
+    print(f"Ingested {stats['sources']} sources ({stats['skipped']} unchanged, "
+          f"{stats['removed']} removed) as {stats['chunks']} chunks in {stats['seconds']:.1f}s "
+          f"({stats['sources_per_second']:.1f} sources/s, {stats['chunks_per_second']:.1f} chunks/s)")
+    print(f"Index: {stats['documents']} documents, {format_bytes(stats['index_bytes'])} in memory, "
+          f"{format_bytes(stats['disk_bytes'])} on disk")
+    return 0
+
+
+def run_bench_embeddings(args: argparse.Namespace) -> int:
+    """Compare embedding throughput of the runtime options on CPU."""
+    if args.texts:
+        texts = [line for doc in TextLoaderAdapter(args.texts).lazy_load()
+                 for line in doc.page_content.splitlines() if line.strip()]
+    else:
+        texts = [f"Sentence number {i} about the history of the Second World War." for i in range(1000)]
+    texts = texts[:args.sentences]
+
+    results = benchmark_embeddings(
+        embedding_options(load_config(args.config)),
+        texts,
+        backends=args.backends,
+        batch_sizes=args.batch_sizes,
+        thread_counts=args.threads or [None],
+    )
+    print(f"{'backend':<10} {'batch':>6} {'threads':>8} {'sentences/s':>12}")
+    for result in results:
+        print(f"{result['backend']:<10} {result['batch_size']:>6} {str(result['threads'] or '-'):>8} "
+              f"{result['sentences_per_second']:>12.1f}")
+    return 0
+
+
+def run_bench_pipeline(args: argparse.Namespace) -> int:
+    """Compare request latency of the linear and pipelined graph with stub backends."""
+    results = benchmark_pipeline(
+        repeats=args.repeats,
+        search_latency=args.search_latency,
+        embedding_seconds=args.embedding_seconds,
+    )
+    print(f"{'mode':<10} {'requests':>9} {'mean s':>8} {'best s':>8}")
+    for result in results:
+        print(f"{result['mode']:<10} {result['requests']:>9} {result['mean_seconds']:>8.2f} "
+              f"{result['best_seconds']:>8.2f}")
+    linear, pipelined = results
+    print(f"Critical path reduced by {linear['mean_seconds'] - pipelined['mean_seconds']:.2f}s "
+          f"({1 - pipelined['mean_seconds'] / linear['mean_seconds']:.0%})")
+    for result in results:
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items())
+        print(f"{result['mode']} stages: {stages}")
+    return 0
+
+
+def run_bench_rerank(args: argparse.Namespace) -> int:
+    """Compare the latency reranking adds with the prompt tokens it saves, over the knowledge base."""
+    config = load_config(args.config)
+    if not config.index_dir or not os.path.exists(os.path.join(os.path.expanduser(config.index_dir), MANIFEST_FILE)):
+        print("No knowledge base to retrieve from: run 'ingest' first")
+        return 1
+    vector_store = ManagedVectorStore.load(config.index_dir, load_embeddings(config))
+    reranker = CrossEncoderReranker(
+        **({"model_name": config.reranker_model} if config.reranker_model else {}),
+        top_n=config.rerank_top_n,
+        max_candidates=config.rerank_max_candidates,
+        time_budget=None,
+    )
+
+    results = benchmark_reranker(reranker, vector_store, args.questions, baseline_k=args.baseline_k)
+    print(f"{'rerank s':>9} {'top-k tokens':>13} {'reranked':>9} {'saved':>6}  question")
+    for result in results:
+        print(f"{result['seconds']:>9.3f} {result['tokens_baseline']:>13} {result['tokens_out']:>9} "
+              f"{result['tokens_saved']:>6}  {result['question']}")
+    seconds = statistics.mean(result["seconds"] for result in results)
+    saved = statistics.mean(result["tokens_saved"] for result in results)
+    print(f"Mean: {seconds:.3f}s added for {saved:.0f} prompt tokens saved against the top {args.baseline_k}"
+          + (f" ({seconds / saved * 1000:.1f} ms per token saved)" if saved > 0 else ""))
+    return 0
+
+
+def run_bench_store(args: argparse.Namespace) -> int:
+    """Measure the memory the vector store keeps per chunk and its filtered search time."""
+    result = benchmark_store(chunks=args.chunks, dimension=args.dimension,
+                             chunks_per_page=args.chunks_per_page, chunk_chars=args.chunk_chars)
+    print(f"{result['chunks']} chunks of {result['text_bytes_per_chunk']:.0f} bytes of text, "
+          f"{result['metadata_records']} metadata records")
+    print(f"{'store':<22} {result['store_bytes_per_chunk']:>8.0f} bytes/chunk besides the embedding matrix")
+    print(f"{'one Document a chunk':<22} {result['documents_bytes_per_chunk']:>8.0f} bytes/chunk")
+    print(f"Embedding matrix {format_bytes(result['matrix_bytes'])}, "
+          f"filtered top-8 search {result['search_ms']:.2f} ms")
+    return 0
+
+
+# Answer-style prompt whose context the answer can copy from, as prompt lookup expects
+SPECULATIVE_PROMPT = (
+    "Use the following context to answer the question.\n\n"
+    "Context: The Allied invasion of Normandy began on 6 June 1944. Operation Overlord was led by "
+    "General Dwight D. Eisenhower, with Bernard Montgomery commanding the ground forces. Five beaches, "
+    "code-named Utah, Omaha, Gold, Juno and Sword, were assaulted by American, British and Canadian troops.\n\n"
+    "Question: Who led the Allied invasion of Normandy, and which beaches were assaulted?\n\nAnswer:"
+)
+
+
+def run_bench_speculative(args: argparse.Namespace) -> int:
+    """Compare greedy decode throughput of the same prompt with and without speculative decoding."""
+    config = load_config(args.config)
+    llm = load_llm(config)
+    if not getattr(llm, "speculative", False) or not hasattr(llm, "compare_speculative"):
+        print("No speculative decoding configured: set draft_model_name or prompt_lookup_num_tokens "
+              "for an in-process model")
+        return 1
+    prompt = SPECULATIVE_PROMPT
+    if args.prompt_file:
+        with open(args.prompt_file, "r", encoding="utf-8") as f:
+            prompt = f.read()
+
+    # Warm up both paths, so the first measurement does not pay for it
+    llm.compare_speculative(prompt, max_new_tokens=8)
+    results = [llm.compare_speculative(prompt, max_new_tokens=args.max_new_tokens) for _ in range(args.repeats)]
+    plain = statistics.mean(result["plain_tokens_per_second"] for result in results)
+    speculative = statistics.mean(result["speculative_tokens_per_second"] for result in results)
+    print(f"{'plain':<12} {plain:>8.1f} tokens/s")
+    print(f"{'speculative':<12} {speculative:>8.1f} tokens/s")
+    print(f"Speedup {speculative / plain if plain else 0.0:.2f}x on the same prompt, "
+          f"outputs {'identical' if all(result['identical'] for result in results) else 'differ'}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="ennchan_rag", description="EnnchanRAG tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="Build or update the offline knowledge base")
+    ingest_parser.add_argument("sources", nargs="+", help="Files, directories of text files or URLs")
+    ingest_parser.add_argument("--config", default=None, help="Path to the configuration file")
+    ingest_parser.add_argument("--workers", type=int, default=None,
+                               help="Embedding processes; 0 embeds in the main process")
+    ingest_parser.set_defaults(func=run_ingest)
+
+    bench_parser = subparsers.add_parser(
+        "bench-embeddings", help="Measure embedding sentences/sec for each runtime option")
+    bench_parser.add_argument("texts", nargs="?", default=None,
+                              help="File or directory of text to embed, one sentence per line")
+    bench_parser.add_argument("--config", default=None, help="Path to the configuration file")
+    bench_parser.add_argument("--sentences", type=int, default=1000, help="Number of sentences to embed")
+    bench_parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS, default=list(EMBEDDING_BACKENDS))
+    bench_parser.add_argument("--batch-sizes", nargs="+", type=int, default=[32, 128])
+    bench_parser.add_argument("--threads", nargs="+", type=int, default=None,
+                              help="Intra-op thread counts to compare")
+    bench_parser.set_defaults(func=run_bench_embeddings)
+
+    pipeline_parser = subparsers.add_parser(
+        "bench-pipeline", help="Measure request latency of the linear and pipelined graph with stub backends")
+    pipeline_parser.add_argument("--repeats", type=int, default=3, help="Requests per mode")
+    pipeline_parser.add_argument("--search-latency", type=float, default=0.5,
+                                 help="Seconds the fastest stub search query takes")
+    pipeline_parser.add_argument("--embedding-seconds", type=float, default=0.005,
+                                 help="Seconds the stub embeddings take per text")
+    pipeline_parser.set_defaults(func=run_bench_pipeline)
+
+    rerank_parser = subparsers.add_parser(
+        "bench-rerank", help="Measure reranking latency against the prompt tokens it saves")
+    rerank_parser.add_argument("questions", nargs="+", help="Questions to retrieve and rerank for")
+    rerank_parser.add_argument("--config", default=None, help="Path to the configuration file")
+    rerank_parser.add_argument("--baseline-k", type=int, default=4,
+                               help="Documents the context holds without reranking")
+    rerank_parser.set_defaults(func=run_bench_rerank)
+
+    store_parser = subparsers.add_parser(
+        "bench-store", help="Measure the vector store's memory per chunk and its filtered search time")
+    store_parser.add_argument("--chunks", type=int, default=100_000, help="Number of synthetic chunks")
+    store_parser.add_argument("--dimension", type=int, default=384, help="Embedding dimension")
+    store_parser.add_argument("--chunks-per-page", type=int, default=5,
+                              help="Chunks sharing one page's metadata")
+    store_parser.add_argument("--chunk-chars", type=int, default=800, help="Characters of text per chunk")
+    store_parser.set_defaults(func=run_bench_store)
+
+    speculative_parser = subparsers.add_parser(
+        "bench-speculative", help="Compare decode throughput with and without speculative decoding")
+    speculative_parser.add_argument("--config", default=None, help="Path to the configuration file")
+    speculative_parser.add_argument("--prompt-file", default=None,
+                                    help="File holding the prompt; defaults to a short answer prompt")
+    speculative_parser.add_argument("--max-new-tokens", type=int, default=128, help="Tokens generated per run")
+    speculative_parser.add_argument("--repeats", type=int, default=3, help="Runs averaged per mode")
+    speculative_parser.set_defaults(func=run_bench_speculative)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
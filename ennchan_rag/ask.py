@@ -1,46 +1,20 @@
-from ennchan_rag.core.model import SearchAugmentedQAModel
-from ennchan_rag.config import load_config
-from ennchan_rag.loaders import WebLoaderAdapter
-from ennchan_rag.utils.quantization import load_quantization
-from ennchan_rag.utils.model_cache import get_model
-from langchain_huggingface import HuggingFacePipeline, HuggingFaceEmbeddings
-from langchain_core.vectorstores import InMemoryVectorStore
+from ennchan_rag.engine import get_engine
 
 
-def ask(question: str, p_config: str = None) -> str:
+def ask(question: str, p_config: str = None, latency_budget: float = None) -> str:
     """
     Inquire about a question using the QAModel.
 
+    The models and vector store are loaded on the first call and reused by
+    later calls with the same configuration.
+
     Args:
         question (str): The question to inquire about.
+        p_config (str): Path to the configuration file.
+        latency_budget (float): Target latency in seconds; overrides the
+            configured latency_budget.
 
     Returns:
         str: The answer to the question.
     """
-    # Initialize components
-    config = load_config(p_config)
-    embeddings = HuggingFaceEmbeddings(model_name=config.embeddings_model)
-    vector_store = InMemoryVectorStore(embeddings)
-    llm = get_model(
-        model_id=config.model_name,
-        task="text-generation",
-        pipeline_kwargs=dict(
-            max_new_tokens=512,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-        ),
-        model_kwargs=load_quantization(config),
-    )
-
-    # Create and use the model
-    model = SearchAugmentedQAModel(
-        llm=llm,
-        vector_store=vector_store,
-        prompt_source=config.prompt_source,
-        context_scope=config.context_scope,
-    )
-
-    # Ask a question
-    answer = model.graph.invoke({"question": question})
-    return answer["answer"]
\ No newline at end of file
+    return get_engine(p_config).ask(question, latency_budget=latency_budget)
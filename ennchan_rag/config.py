@@ -2,7 +2,7 @@
 import os
 import json
 from dataclasses import dataclass
-from typing import Dict, Any, ClassVar
+from typing import Dict, Any, ClassVar, List, Optional, Union
 
 @dataclass
 class Config:
@@ -23,11 +23,76 @@ class Config:
     model_name: str
     embeddings_model: str
     quantization: bool
+    prefix_cache: bool
+    draft_model_name: Optional[str]
+    prompt_lookup_num_tokens: Optional[int]
+    model_cache_dir: Optional[str]
+    model_dtype: Optional[str]
+
+    # Inference server settings; with a URL the model is not loaded in-process
+    llm_server_url: Optional[str]
+    llm_server_api: str
+    llm_server_model: Optional[str]
+    llm_server_connections: int
     
     # RAG settings
-    docs_source: str
+    docs_source: Union[str, List[str]]
     prompt_source: str
     context_scope: int
+    extract_token_budget: int
+    extract_relevance_floor: float
+    latency_budget: Optional[float]
+    request_timeout: Optional[float]
+    search_timeout: Optional[float]
+    summary_timeout: Optional[float]
+    dedup_max_distance: int
+    profile_memory: bool
+    progressive_answer: bool
+    pipelined_graph: bool
+    context_compression_ratio: Optional[float]
+    conversation_turns: int
+    followup_coverage_threshold: float
+    followup_min_documents: int
+    summary_cache_path: Optional[str]
+    summary_cache_max_entries: int
+    summary_cache_max_age: Optional[float]
+
+    # Record/replay of LLM and web search calls; with a cassette, replay
+    # answers from it without loading the model or searching
+    replay_cassette: Optional[str]
+    replay_mode: str
+    replay_latency_scale: float
+
+    # Document loading settings
+    site_extractors: Dict[str, Dict[str, Any]]
+    http_cache_dir: Optional[str]
+    chunk_size: int
+    chunk_overlap: int
+    index_dir: Optional[str]
+    ingest_workers: int
+
+    # Embedding runtime settings
+    embedding_backend: str
+    embedding_batch_size: int
+    embedding_normalize: bool
+    embedding_max_seq_length: Optional[int]
+    embedding_threads: Optional[int]
+    embedding_cache_dir: str
+    embedding_quantization: str
+
+    # Vector store settings
+    store_ttl: Dict[str, float]
+    store_max_documents: Optional[int]
+    store_max_bytes: Optional[int]
+    store_eviction: str
+    retrieval_scope: str
+    multi_query_retrieval: bool
+
+    # Reranking settings
+    reranker_model: Optional[str]
+    rerank_top_n: int
+    rerank_max_candidates: int
+    rerank_time_budget: Optional[float]
 
     # Quantization settings
     quantization_config: Dict[str, Any]
@@ -37,9 +102,66 @@ class Config:
         "model_name": "deepseek-ai/DeepSeek-R1-Distill-Llama-8B",
         "embeddings_model": "sentence-transformers/all-MiniLM-L6-v2",
         "quantization": False,
+        "prefix_cache": True,
+        "draft_model_name": None,
+        "prompt_lookup_num_tokens": None,
+        "model_cache_dir": None,
+        "model_dtype": None,
+        "llm_server_url": None,
+        "llm_server_api": "openai",
+        "llm_server_model": None,
+        "llm_server_connections": 8,
         "docs_source": "https://en.wikipedia.org/wiki/World_War_II",
         "prompt_source": "rlm/rag-prompt",
         "context_scope": 1000,
+        "extract_token_budget": 400,
+        "extract_relevance_floor": 0.2,
+        "latency_budget": None,
+        "request_timeout": None,
+        "search_timeout": 10.0,
+        "summary_timeout": 60.0,
+        "dedup_max_distance": 3,
+        "profile_memory": False,
+        "progressive_answer": False,
+        "pipelined_graph": True,
+        "context_compression_ratio": None,
+        "conversation_turns": 5,
+        "followup_coverage_threshold": 0.6,
+        "followup_min_documents": 2,
+        "summary_cache_path": None,
+        "summary_cache_max_entries": 10000,
+        "summary_cache_max_age": 7 * 24 * 3600,
+        "replay_cassette": None,
+        "replay_mode": "replay",
+        "replay_latency_scale": 0.0,
+        "site_extractors": {
+            "wikipedia.org": {"class_": "mw-content-container"},
+        },
+        "http_cache_dir": "~/.cache/ennchan_rag/http",
+        "chunk_size": 1000,
+        "chunk_overlap": 200,
+        "index_dir": "~/.cache/ennchan_rag/index",
+        "ingest_workers": 2,
+        "embedding_backend": "torch",
+        "embedding_batch_size": 256,
+        "embedding_normalize": True,
+        "embedding_max_seq_length": None,
+        "embedding_threads": None,
+        "embedding_cache_dir": "~/.cache/ennchan_rag/embeddings",
+        "embedding_quantization": "avx2",
+        "store_ttl": {
+            "web_search": 3600,
+            "compiled_reference": 3600,
+        },
+        "store_max_documents": 20000,
+        "store_max_bytes": None,
+        "store_eviction": "lru",
+        "retrieval_scope": "request",
+        "multi_query_retrieval": False,
+        "reranker_model": None,
+        "rerank_top_n": 4,
+        "rerank_max_candidates": 16,
+        "rerank_time_budget": 2.0,
         "quantization_config": {
             "load_in_4bit": True,
             "bnb_4bit_quant_type": "nf4",
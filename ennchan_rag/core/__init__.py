@@ -4,3 +4,9 @@ from ennchan_rag.core.model import QAModel, SearchAugmentedQAModel
 from ennchan_rag.core.interfaces import LLMInterface, VectorStoreInterface, RetrievalStrategy, DocLoader
 from ennchan_rag.core.state import State
 from ennchan_rag.core.context import ContextProcessor
+from ennchan_rag.core.compression import ContextCompressor
+from ennchan_rag.core.session import ConversationSession
+from ennchan_rag.core.content import ContentStore
+from ennchan_rag.core.generation import GenerationConfig
+from ennchan_rag.core.planner import PipelinePlanner
+from ennchan_rag.core.deadline import Deadline
@@ -0,0 +1,129 @@
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from ennchan_rag.core.extractive import count_tokens
+
+
+class ContextCompressor:
+    """
+    Prunes the retrieved context down to the sentences that matter for the question.
+
+    Every sentence of the context is embedded in one batch and scored against
+    the question. Sentences are kept best first while they fit in the target
+    share of the context's tokens, skipping sentences nearly identical to one
+    already kept, and the survivors are put back in document order. Prefill of
+    the final prompt shrinks by roughly the pruned share.
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 ratio: float = 0.5,
+                 redundancy_threshold: float = 0.95,
+                 min_tokens: int = 200):
+        """
+        Initialize the context compressor.
+
+        Args:
+            embeddings: Embedding model used to score sentences
+            ratio: Share of the context's tokens to keep, between 0 and 1
+            redundancy_threshold: Cosine similarity to a kept sentence above
+                which a sentence is dropped as redundant
+            min_tokens: Contexts this short are left as they are
+        """
+        if not 0 < ratio <= 1:
+            raise ValueError(f"Compression ratio must be in (0, 1], got {ratio}")
+        self.embeddings = embeddings
+        self.ratio = ratio
+        self.redundancy_threshold = redundancy_threshold
+        self.min_tokens = min_tokens
+
+    @staticmethod
+    def split(text: str) -> List[str]:
+        """Split text into sentences, treating line breaks as boundaries."""
+        return [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+|\n+", text) if sentence.strip()]
+
+    def compress(self,
+                 question: str,
+                 documents: Sequence[Document],
+                 max_tokens: Optional[int] = None,
+                 question_embedding: Optional[Sequence[float]] = None) -> Tuple[List[Document], Dict[str, float]]:
+        """
+        Compress documents to the sentences most relevant to the question.
+
+        Args:
+            question: The user's question
+            documents: The context documents, in prompt order
+            max_tokens: Tokens to keep, by default ratio of the documents' tokens;
+                pass the share of what the prompt would hold when the
+                documents do not all fit in it
+            question_embedding: Precomputed embedding of the question
+
+        Returns:
+            Tuple of the compressed documents, in the same order and without
+            those left empty, and statistics on sentences and tokens kept
+        """
+        start = time.perf_counter()
+        sentences = [(index, sentence) for index, doc in enumerate(documents)
+                     for sentence in self.split(doc.page_content)]
+        tokens = np.asarray([count_tokens(sentence) for _, sentence in sentences], dtype=np.int64)
+        total = int(tokens.sum())
+        stats = {
+            "sentences": len(sentences),
+            "kept_sentences": len(sentences),
+            "redundant_sentences": 0,
+            "tokens_before": total,
+            "tokens_after": total,
+        }
+        budget = self.ratio * total if max_tokens is None else max_tokens
+        if total < self.min_tokens or budget >= total:
+            stats["seconds"] = time.perf_counter() - start
+            return list(documents), stats
+
+        if question_embedding is None:
+            question_embedding = self.embeddings.embed_query(question)
+        matrix = self._normalize(np.asarray(
+            self.embeddings.embed_documents([sentence for _, sentence in sentences]), dtype=np.float32))
+        query = self._normalize(np.asarray(question_embedding, dtype=np.float32).reshape(1, -1))[0]
+        scores = matrix @ query
+
+        kept: List[int] = []
+        kept_tokens = 0
+        redundant = 0
+        for index in np.argsort(-scores):
+            # Fill the budget with the best sentences that fit, but keep at least one
+            if kept and kept_tokens + tokens[index] > budget:
+                continue
+            # Repeated facts across chunks only cost prefill
+            if kept and float(np.max(matrix[kept] @ matrix[index])) >= self.redundancy_threshold:
+                redundant += 1
+                continue
+            kept.append(int(index))
+            kept_tokens += int(tokens[index])
+
+        texts: Dict[int, List[str]] = {}
+        for index in sorted(kept):
+            doc_index, sentence = sentences[index]
+            texts.setdefault(doc_index, []).append(sentence)
+        compressed = [
+            Document(id=doc.id, page_content=" ".join(texts[index]), metadata=doc.metadata)
+            for index, doc in enumerate(documents)
+            if index in texts
+        ]
+
+        stats.update({
+            "kept_sentences": len(kept),
+            "redundant_sentences": redundant,
+            "tokens_after": kept_tokens,
+            "seconds": time.perf_counter() - start,
+        })
+        return compressed, stats
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
@@ -0,0 +1,84 @@
+import hashlib
+import threading
+from typing import Dict, Optional, Set
+
+
+class ContentStore:
+    """
+    Holds page bodies once, referenced from the pipeline state by content id.
+
+    Search results carry a content id instead of their full text, so a page
+    is kept in memory once no matter how many stages look at it. Bodies are
+    owned by the requests that added them and dropped once every owner has
+    released them; identical pages fetched by concurrent requests share one
+    copy.
+    """
+
+    def __init__(self):
+        """Initialize an empty content store."""
+        self._contents: Dict[str, str] = {}
+        self._owners: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_id(text: str) -> str:
+        """Return the id a text is stored under."""
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def put(self, owner: str, text: str) -> str:
+        """
+        Store a text on behalf of a request.
+
+        Args:
+            owner: Id of the request that needs the text
+            text: The text to store
+
+        Returns:
+            The content id to reference the text by
+        """
+        content_id = self.content_id(text)
+        with self._lock:
+            self._contents.setdefault(content_id, text)
+            self._owners.setdefault(content_id, set()).add(owner)
+        return content_id
+
+    def get(self, content_id: str) -> Optional[str]:
+        """
+        Look up a stored text.
+
+        Args:
+            content_id: The id returned by put
+
+        Returns:
+            The text, or None if it was released
+        """
+        return self._contents.get(content_id)
+
+    def release(self, owner: str) -> int:
+        """
+        Release every text held for a request.
+
+        Args:
+            owner: Id of the request that no longer needs its texts
+
+        Returns:
+            Number of texts dropped from memory
+        """
+        dropped = 0
+        with self._lock:
+            for content_id in [cid for cid, owners in self._owners.items() if owner in owners]:
+                owners = self._owners[content_id]
+                owners.discard(owner)
+                if not owners:
+                    del self._owners[content_id]
+                    del self._contents[content_id]
+                    dropped += 1
+        return dropped
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored texts and their size in characters."""
+        with self._lock:
+            return {
+                "contents": len(self._contents),
+                "chars": sum(len(text) for text in self._contents.values()),
+            }
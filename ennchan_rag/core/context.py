@@ -1,3 +1,7 @@
+from typing import List
+
+from langchain_core.documents import Document
+
 from ennchan_rag.core.state import State
 
 class ContextProcessor:
@@ -7,7 +11,9 @@ class ContextProcessor:
     This class handles the extraction and formatting of document content
     to be used as context for the language model.
     """
-    
+    # Characters of the first document used when no document fits whole
+    FALLBACK_CHARS = 1000
+
     def process(self, state: State, max_chars: int):
         """
         Process documents from state into a context string.
@@ -23,15 +29,50 @@ class ContextProcessor:
             A string containing the concatenated document content
         """
         docs = state["context"]
-        docs_content = ""
+        selected = self.select(docs, max_chars)
+        docs_content = "".join(doc.page_content + "\n\n" for doc in selected)
+
+        if not docs_content and docs:
+            docs_content = docs[0].page_content[:self.FALLBACK_CHARS]
+
+        return docs_content
 
+    def select(self, docs: List[Document], max_chars: int) -> List[Document]:
+        """
+        Select the leading documents whose content fits in max_chars.
+
+        Args:
+            docs: The documents, in priority order
+            max_chars: Maximum number of characters of content
+
+        Returns:
+            The documents process would concatenate
+        """
+        selected = []
+        chars = 0
         for doc in docs:
-            if len(doc.page_content) + len(docs_content) < max_chars:
-                docs_content += doc.page_content + "\n\n"
+            if len(doc.page_content) + chars < max_chars:
+                selected.append(doc)
+                chars += len(doc.page_content) + 2
             else:
                 break
+        return selected
 
-        if not docs_content and docs:
-            docs_content = docs[0].page_content[:1000]
+    def reachable(self, docs: List[Document], max_chars: int) -> List[Document]:
+        """
+        Return the documents, or the part of one, that process would put in the prompt.
 
-        return docs_content
\ No newline at end of file
+        Args:
+            docs: The documents, in priority order
+            max_chars: Maximum number of characters of content
+
+        Returns:
+            The selected documents, or the beginning of the first document
+            when none fits whole
+        """
+        selected = self.select(docs, max_chars)
+        if not selected and docs:
+            first = docs[0]
+            selected = [Document(id=first.id, page_content=first.page_content[:self.FALLBACK_CHARS],
+                                 metadata=first.metadata)]
+        return selected
@@ -0,0 +1,55 @@
+import math
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    End-to-end deadline of a request, shared by every stage of the graph.
+
+    The deadline is kept in the state as an absolute time.monotonic()
+    timestamp so it survives being passed between nodes. Stages use it to
+    cap their own timeouts and to decide what to skip once time runs out.
+    """
+
+    def __init__(self, at: Optional[float] = None):
+        """
+        Initialize the deadline.
+
+        Args:
+            at: time.monotonic() timestamp of the deadline, or None for no deadline
+        """
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> "Deadline":
+        """Create a deadline a number of seconds from now, or none for None."""
+        return cls(None if seconds is None else time.monotonic() + seconds)
+
+    @classmethod
+    def from_state(cls, state) -> "Deadline":
+        """Read the deadline of a request from the graph state."""
+        return cls(state.get("deadline"))
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline, infinite without one."""
+        return math.inf if self.at is None else max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None, floor: float = 0.0) -> Optional[float]:
+        """
+        Timeout for a task that must finish before the deadline.
+
+        Args:
+            cap: The task's own timeout, or None for no limit
+            floor: Minimum time granted even when the deadline is near
+
+        Returns:
+            The smaller of the cap and the remaining time, at least floor,
+            or None when neither limits the task
+        """
+        timeout = min(self.remaining(), math.inf if cap is None else cap)
+        return None if math.isinf(timeout) else max(timeout, floor)
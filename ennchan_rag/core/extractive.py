@@ -0,0 +1,123 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of LLM tokens in a text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class PassageExtractor:
+    """
+    Selects the passages of a page that are most relevant to a question.
+
+    This is a fast, non-LLM stage: the page is split into passages which are
+    embedded and scored against the question, and only the best ones are kept
+    up to a token budget. It shrinks what the LLM has to summarize and lets
+    irrelevant pages skip summarization entirely.
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 token_budget: int = 400,
+                 relevance_floor: float = 0.2,
+                 passage_chars: int = 500):
+        """
+        Initialize the passage extractor.
+
+        Args:
+            embeddings: Embedding model used to score passages
+            token_budget: Maximum number of tokens kept per page
+            relevance_floor: Minimum cosine similarity of the best passage for
+                a page to be considered relevant
+            passage_chars: Target size of a passage in characters
+        """
+        self.embeddings = embeddings
+        self.token_budget = token_budget
+        self.relevance_floor = relevance_floor
+        self.passage_chars = passage_chars
+
+    def split(self, text: str) -> List[str]:
+        """
+        Split text into passages of roughly passage_chars characters.
+
+        Paragraphs are kept together when they fit; longer paragraphs are
+        split on sentence boundaries.
+
+        Args:
+            text: The text to split
+
+        Returns:
+            List of passages in document order
+        """
+        passages = []
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = " ".join(paragraph.split())
+            if not paragraph:
+                continue
+            pieces = [paragraph] if len(paragraph) <= self.passage_chars \
+                else re.split(r"(?<=[.!?])\s+", paragraph)
+            for piece in pieces:
+                if current and len(current) + len(piece) + 1 > self.passage_chars:
+                    passages.append(current)
+                    current = ""
+                current = f"{current} {piece}" if current else piece
+        if current:
+            passages.append(current)
+        return passages
+
+    def embed_question(self, question: str) -> List[float]:
+        """Embed the question once so it can be reused for every page."""
+        return self.embeddings.embed_query(question)
+
+    def extract(self,
+                question: str,
+                text: str,
+                question_embedding: Optional[Sequence[float]] = None) -> Tuple[str, float]:
+        """
+        Extract the passages of a page most relevant to the question.
+
+        Args:
+            question: The user's question
+            text: The page content
+            question_embedding: Precomputed embedding of the question
+
+        Returns:
+            Tuple of the extracted text (passages in document order) and the
+            relevance score of the best passage
+        """
+        passages = self.split(text)
+        if not passages:
+            return "", 0.0
+
+        if question_embedding is None:
+            question_embedding = self.embed_question(question)
+
+        query = np.asarray(question_embedding, dtype=np.float32)
+        matrix = np.asarray(self.embeddings.embed_documents(passages), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+
+        selected = []
+        budget = self.token_budget
+        for index in np.argsort(-scores):
+            tokens = count_tokens(passages[index])
+            if tokens > budget:
+                if selected:
+                    continue
+                # Always keep (a cut of) the best passage
+                selected.append(int(index))
+                break
+            selected.append(int(index))
+            budget -= tokens
+
+        extract = "\n\n".join(passages[i] for i in sorted(selected))
+        return extract[:self.token_budget * 4], float(scores.max())
+
+    def is_relevant(self, score: float) -> bool:
+        """Check whether a page's best passage clears the relevance floor."""
+        return score >= self.relevance_floor
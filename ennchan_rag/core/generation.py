@@ -0,0 +1,74 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class GenerationConfig:
+    """
+    Per-call generation settings for an LLM.
+
+    Each pipeline stage declares its own budget so that short outputs, like a
+    classification label, do not pay for the decode budget of a full answer.
+    """
+    max_new_tokens: int = 512
+    do_sample: bool = False
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    # Generation stops before any of these strings; they are not returned
+    stop: List[str] = field(default_factory=list)
+    # Generation stops right after the first of these labels is produced
+    choices: List[str] = field(default_factory=list)
+    # Use the LLM's speculative decoding, if it has any, for this stage
+    speculative: bool = False
+    # Seconds after which generation stops, or None for no limit
+    max_time: Optional[float] = None
+
+    def to_generate_kwargs(self) -> Dict[str, Any]:
+        """
+        Convert the settings into keyword arguments for transformers' generate.
+
+        Returns:
+            Dictionary of generation keyword arguments
+        """
+        kwargs: Dict[str, Any] = {
+            "max_new_tokens": self.max_new_tokens,
+            "do_sample": self.do_sample,
+        }
+        if self.max_time is not None:
+            kwargs["max_time"] = self.max_time
+        if self.do_sample:
+            if self.temperature is not None:
+                kwargs["temperature"] = self.temperature
+            if self.top_p is not None:
+                kwargs["top_p"] = self.top_p
+        return kwargs
+
+    def find_end(self, text: str) -> Optional[int]:
+        """
+        Find where generated text should end according to stop strings and choices.
+
+        Args:
+            text: The generated text so far
+
+        Returns:
+            The end offset, or None if generation should continue
+        """
+        end = None
+        for stop in self.stop:
+            index = text.find(stop)
+            if index != -1 and (end is None or index < end):
+                end = index
+
+        if self.choices:
+            pattern = r"\b(" + "|".join(re.escape(choice) for choice in self.choices) + r")\b"
+            match = re.search(pattern, text if end is None else text[:end])
+            if match:
+                end = match.end()
+
+        return end
+
+    def truncate(self, text: str) -> str:
+        """Cut generated text at its first stop string or right after its first choice."""
+        end = self.find_end(text)
+        return text if end is None else text[:end]
@@ -1,10 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Optional
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
 from langchain_community.document_loaders.base import BaseLoader
 from langchain_huggingface import HuggingFacePipeline
 
+from ennchan_rag.core.generation import GenerationConfig
+
 
 class RetrievalStrategy(ABC):
     """Abstract base class for document retrieval strategies."""
@@ -18,8 +20,8 @@ class LLMInterface(ABC):
     """Abstract base class for LLM interfaces."""
     
     @abstractmethod
-    def invoke(self, messages: Dict[str, str]) -> HuggingFacePipeline:
-        """Invoke the LLM with the given messages."""
+    def invoke(self, messages: Dict[str, str], generation: Optional[GenerationConfig] = None) -> str:
+        """Invoke the LLM with the given messages and optional per-call generation settings."""
 
 
 class VectorStoreInterface(ABC):
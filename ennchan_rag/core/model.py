@@ -1,139 +1,494 @@
-from typing import Dict, Optional
+import dataclasses
+import functools
+import math
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional
 from langchain import hub
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
-from langgraph.graph import START, StateGraph
+from langgraph.graph import START, END, StateGraph
 
+from ennchan_rag.core import prompts
+from ennchan_rag.core.compression import ContextCompressor
+from ennchan_rag.core.content import ContentStore
 from ennchan_rag.core.context import ContextProcessor
+from ennchan_rag.core.deadline import Deadline
+from ennchan_rag.core.extractive import PassageExtractor, count_tokens
+from ennchan_rag.core.generation import GenerationConfig
 from ennchan_rag.core.interfaces import LLMInterface, VectorStoreInterface, RetrievalStrategy
+from ennchan_rag.core.planner import PipelinePlanner, DIRECT, SUMMARIZE, COMPILE
 from ennchan_rag.core.state import State
+from ennchan_rag.core.summaries import SummaryStage
 from ennchan_rag.retrievers.similarity import SimilaritySearchRetrieval
 from ennchan_rag.retrievers.mmr import MMRRetrieval
 from ennchan_rag.retrievers.hybrid import HybridRetrieval
 from ennchan_rag.retrievers.keyword import KeywordRetrieval
+from ennchan_rag.retrievers.multi_query import MultiQueryRetrieval, reciprocal_rank_fusion
+from ennchan_rag.retrievers.rerank import CrossEncoderReranker
+from ennchan_rag.utils.dedup import SearchResultDeduplicator, content_hash
+from ennchan_rag.utils.profiling import LatencyStats
+from ennchan_rag.utils.summary_cache import SummaryCache
 from ennchan_search import search as web_search
 import concurrent.futures
 print("Invoking model...")
 
+# Request id of documents loaded ahead of time, which every request may retrieve
+CORPUS_REQUEST_ID = "corpus"
+
 
 class QAModel:
+    # Generation budget of each LLM stage
+    GENERATION_BUDGETS: Dict[str, GenerationConfig] = {
+        "answer": GenerationConfig(max_new_tokens=512, do_sample=True, temperature=0.7, top_p=0.9,
+                                   speculative=True),
+    }
+    # Seconds the answer may always take, even when the request deadline has passed
+    MIN_ANSWER_SECONDS = 5.0
+
     def __init__(self, 
                  llm: LLMInterface, 
                  vector_store: VectorStoreInterface, 
                  prompt_source: str,
                  context_scope: int,
-                 retrieval_strategy: RetrievalStrategy = SimilaritySearchRetrieval()):
+                 retrieval_strategy: RetrievalStrategy = SimilaritySearchRetrieval(),
+                 generation_budgets: Optional[Dict[str, GenerationConfig]] = None,
+                 compressor: Optional[ContextCompressor] = None):
         # self.prompt = hub.pull(prompt_source)
         self.prompt_source = prompt_source
         self.prompt = ChatPromptTemplate([("system",
-            """
-            {prompt_source}
-            Question: {question} 
-            Context: {context} 
-            Answer:
-            """,)])
+            prompts.ANSWER_PREFIX + prompts.ANSWER_SUFFIX,)])
         self.context_scope = context_scope
         self.llm = llm
         self.vector_store = vector_store
         self.retrieval_strategy = retrieval_strategy or SimilaritySearchRetrieval()
+        self.generation_budgets = {**self.GENERATION_BUDGETS, **(generation_budgets or {})}
+        # Prunes the context to the sentences relevant to the question before generating
+        self.compressor = compressor
+        self._register_prompt_prefixes()
 
         # Compile application and test
-        self.graph_builder = StateGraph(State).add_sequence([
-            self.retrieve, 
-            self.generate
-        ])
+        steps = [("retrieve", self._timed(self.retrieve))]
+        if self.compressor is not None:
+            steps.append(("compress_context", self._timed(self.compress_context)))
+        steps.append(("generate", self._timed(self.generate)))
+        self.graph_builder = StateGraph(State).add_sequence(steps)
         self.graph_builder.add_edge(START, "retrieve")
         self.graph = self.graph_builder.compile()
 
+    def _prompt_prefixes(self) -> List[str]:
+        """Return the static prefixes of the prompts this model sends to the LLM."""
+        answer_prefix = ChatPromptTemplate([("system", prompts.ANSWER_PREFIX,)])
+        return [answer_prefix.invoke({"prompt_source": self.prompt_source}).to_string()]
+
+    def _register_prompt_prefixes(self) -> None:
+        """Register static prompt prefixes with LLMs that support prefix caching."""
+        if hasattr(self.llm, "register_prefix"):
+            for prefix in self._prompt_prefixes():
+                self.llm.register_prefix(prefix)
+
+    def _invoke_llm(self, prompt, stage: str, deadline: Optional[Deadline] = None, floor: float = 0.0) -> str:
+        """Invoke the LLM with the generation budget of a stage, stopping at the request deadline."""
+        if isinstance(self.llm, LLMInterface):
+            generation = self.generation_budgets[stage]
+            max_time = deadline.timeout(generation.max_time, floor) if deadline is not None else None
+            if max_time is not None:
+                generation = dataclasses.replace(generation, max_time=max_time)
+            return self.llm.invoke(prompt, generation=generation)
+        return self.llm.invoke(prompt)
+
+    def _timed(self, node: Callable) -> Callable:
+        """Wrap a graph node so its duration is recorded in the state's timings."""
+        @functools.wraps(node)
+        def timed_node(state: State) -> Dict:
+            start = time.perf_counter()
+            update = node(state)
+            seconds = time.perf_counter() - start
+            self._record_timing(node.__name__, seconds, update)
+            return {**update, "timings": {node.__name__: seconds}}
+        return timed_node
+
+    def _record_timing(self, stage: str, seconds: float, update: Dict) -> None:
+        """Hook called with the duration of every graph node."""
+
     # Define application steps
     def retrieve(self, state: State) -> Dict[str, list[Document]]:
         query = state["question"]
         retrieved_docs = self.retrieval_strategy.retrieve(query, self.vector_store) 
         return {"context": retrieved_docs}
 
+    def compress_context(self, state: State) -> Dict:
+        """Compress the context to a share of what the prompt would hold."""
+        documents = state.get("context") or []
+        if not documents:
+            return {}
+        # Only what can reach the prompt is embedded; web pages are indexed
+        # whole, so the full documents may hold thousands of sentences
+        documents = ContextProcessor().reachable(documents, self.context_scope)
+        prompt_tokens = count_tokens(ContextProcessor().process({"context": documents}, self.context_scope))
+        try:
+            compressed, stats = self.compressor.compress(
+                state["question"], documents, max_tokens=int(self.compressor.ratio * prompt_tokens))
+        except Exception as e:
+            print(f"Context compression failed, keeping the full context: {e}")
+            return {}
+
+        stats["tokens_before"] = prompt_tokens
+        stats["tokens_after"] = min(stats["tokens_after"], prompt_tokens)
+        stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+        stats["prefill_seconds_saved"] = stats["tokens_saved"] * self._prefill_seconds_per_token()
+        return {"context": compressed, "compression_stats": stats}
+
+    def _prefill_seconds_per_token(self) -> float:
+        """Observed prefill cost of the LLM, or 0 if it does not report one."""
+        stats = getattr(self.llm, "stats", None) or {}
+        if not stats.get("prefill_tokens") or "prefill_seconds" not in stats:
+            return 0.0
+        return stats["prefill_seconds"] / stats["prefill_tokens"]
+
     def generate(self, state: State) -> Dict[str, str]:
         context = ContextProcessor()
         messages = self.prompt.invoke({
             "prompt_source": self.prompt_source,
             "question": state["question"], 
             "context": context.process(state, self.context_scope)})
-        response = self.llm.invoke(messages)
+        # Answer from whatever was retrieved, even if the deadline has passed
+        response = self._invoke_llm(messages, "answer", Deadline.from_state(state), self.MIN_ANSWER_SECONDS)
 
         return {"answer": response}
 
 
 class SearchAugmentedQAModel(QAModel):
+    GENERATION_BUDGETS: Dict[str, GenerationConfig] = {
+        **QAModel.GENERATION_BUDGETS,
+        "classify": GenerationConfig(max_new_tokens=8, choices=prompts.QUESTION_TYPES),
+        "queries": GenerationConfig(max_new_tokens=96, stop=["]"]),
+        "summary": GenerationConfig(max_new_tokens=256),
+        "compile": GenerationConfig(max_new_tokens=512),
+        "strategy": GenerationConfig(max_new_tokens=4, choices=["1", "2", "3", "4"]),
+        "rewrite": GenerationConfig(max_new_tokens=64, stop=["\n"]),
+        "quick": GenerationConfig(max_new_tokens=96, speculative=True),
+    }
+    # Search results and characters of each page the provisional answer reads
+    QUICK_ANSWER_RESULTS = 3
+    QUICK_ANSWER_CHARS = 600
+    # Seconds to wait past the deadline for summaries that it cut short
+    DEADLINE_GRACE = 0.5
+    # Documents retrieved for the context when there is no reranker
+    RETRIEVAL_K = 4
+
     def __init__(self, 
                  llm: LLMInterface, 
                  vector_store: VectorStoreInterface, 
                  prompt_source: str,
                  context_scope: int,
-                 search_config: Optional[Dict] = None):
-        super().__init__(llm, vector_store, prompt_source, context_scope)
+                 search_config: Optional[Dict] = None,
+                 generation_budgets: Optional[Dict[str, GenerationConfig]] = None,
+                 extractor: Optional[PassageExtractor] = None,
+                 planner: Optional[PipelinePlanner] = None,
+                 retrieval_scope: str = "request",
+                 reranker: Optional[CrossEncoderReranker] = None,
+                 deduplicator: Optional[SearchResultDeduplicator] = None,
+                 request_timeout: Optional[float] = None,
+                 search_timeout: Optional[float] = 10.0,
+                 summary_timeout: Optional[float] = 60.0,
+                 multi_query: bool = False,
+                 summary_cache: Optional[SummaryCache] = None,
+                 progressive: bool = False,
+                 pipelined: bool = True,
+                 search: Optional[Callable[[str, Optional[Dict]], List[Dict]]] = None,
+                 compressor: Optional[ContextCompressor] = None):
+        super().__init__(llm, vector_store, prompt_source, context_scope,
+                         generation_budgets=generation_budgets,
+                         compressor=compressor)
         self.search_config = search_config
-        
-        # Rebuild the graph with search step
-        self.graph_builder = StateGraph(State).add_sequence([
-            self.formulate_query, 
-            self.search_web,
-            self.process_search_results,  # New step
-            self.compile_reference_document,  # New step
-            self.retrieve,
-            self.generate
-        ])
+        # Web search function taking a query and the search config
+        self.search = search or web_search
+        self.extractor = extractor
+        self.planner = planner or PipelinePlanner()
+        # "request" retrieves only this request's documents and the corpus, "global" everything
+        self.retrieval_scope = retrieval_scope
+        self.reranker = reranker
+        # Retrieve with the planned search queries too, fused into one ranking
+        self.multi_query = multi_query
+        # Summaries of pages already summarized for a similar question
+        self.summary_cache = summary_cache
+        # Answer provisionally from the raw search results while the pipeline runs
+        self.progressive = progressive
+        self._provisional_listeners: Dict[str, Callable[[Dict], None]] = {}
+        self._quick_answers = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="provisional")
+        self.deduplicator = deduplicator or SearchResultDeduplicator()
+        # Page bodies of in-flight requests, referenced by content id from the state
+        self.content_store = ContentStore()
+        # Hard end-to-end deadline of a request and per-task timeouts, in seconds
+        self.request_timeout = request_timeout
+        self.search_timeout = search_timeout
+        if summary_timeout is not None:
+            self.generation_budgets["summary"] = dataclasses.replace(
+                self.generation_budgets["summary"], max_time=summary_timeout)
+        self.latency = LatencyStats()
+        # Overlap independent stages: corpus retrieval with the web search,
+        # summaries with the remaining searches and indexing with summaries
+        self.pipelined = pipelined
+        self._summary_stages: Dict[str, SummaryStage] = {}
+        self._pending_index: Dict[str, List[concurrent.futures.Future]] = {}
+        self._stages_lock = threading.Lock()
+        # A single thread keeps additions to the vector store in order
+        self._indexer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="indexer")
+        
+        # Rebuild the graph with search and planning steps
+        self.graph_builder = StateGraph(State)
+        for node in (self.formulate_query,
+                     self.search_web,
+                     self.plan_pipeline,
+                     self.process_search_results,
+                     self.compile_reference_document,
+                     self.retrieve,
+                     self.generate):
+            self.graph_builder.add_node(node.__name__, self._timed(node))
+        if self.reranker is not None:
+            self.graph_builder.add_node("rerank", self._timed(self.rerank))
+        if self._retrieves_locally():
+            self.graph_builder.add_node("retrieve_local", self._timed(self.retrieve_local))
+            # The corpus does not depend on the web search, so search it meanwhile
+            self.graph_builder.add_edge(START, "retrieve_local")
+            self.graph_builder.add_edge(["search_web", "retrieve_local"], "plan_pipeline")
+        else:
+            self.graph_builder.add_edge("search_web", "plan_pipeline")
         self.graph_builder.add_edge(START, "formulate_query")
+        self.graph_builder.add_edge("formulate_query", "search_web")
+        self.graph_builder.add_conditional_edges(
+            "plan_pipeline", self._route_after_plan,
+            ["process_search_results", "retrieve"])
+        self.graph_builder.add_conditional_edges(
+            "process_search_results", self._route_after_summaries,
+            ["compile_reference_document", "retrieve"])
+        self.graph_builder.add_edge("compile_reference_document", "retrieve")
+        if self.compressor is not None:
+            self.graph_builder.add_node("compress_context", self._timed(self.compress_context))
+        # retrieve -> [rerank] -> [compress_context] -> generate
+        stages = ["retrieve"]
+        if self.reranker is not None:
+            stages.append("rerank")
+        if self.compressor is not None:
+            stages.append("compress_context")
+        stages.append("generate")
+        for source, target in zip(stages, stages[1:]):
+            self.graph_builder.add_edge(source, target)
+        self.graph_builder.add_edge("generate", END)
         self.graph = self.graph_builder.compile()
-        
+        self.followup_graph = self._build_followup_graph()
+
+    def _build_followup_graph(self):
+        """Compile the graph answering a follow-up from given context: [rerank] -> [compress_context] -> generate."""
+        builder = StateGraph(State)
+        stages = []
+        if self.reranker is not None:
+            builder.add_node("rerank", self._timed(self.rerank))
+            stages.append("rerank")
+        if self.compressor is not None:
+            builder.add_node("compress_context", self._timed(self.compress_context))
+            stages.append("compress_context")
+        builder.add_node("generate", self._timed(self.generate))
+        stages.append("generate")
+        builder.add_edge(START, stages[0])
+        for source, target in zip(stages, stages[1:]):
+            builder.add_edge(source, target)
+        builder.add_edge("generate", END)
+        return builder.compile()
+
+    def rewrite_followup(self, question: str, history: str) -> str:
+        """
+        Rewrite a follow-up question as a standalone question.
+
+        Args:
+            question: The follow-up question
+            history: The earlier turns of the conversation
+
+        Returns:
+            The standalone question, or the question itself if rewriting failed
+        """
+        if not history:
+            return question
+        rewrite_prompt = prompts.REWRITE_PREFIX + prompts.REWRITE_SUFFIX.format(
+            history=history,
+            question=question)
+        try:
+            rewritten = self._invoke_llm(rewrite_prompt, "rewrite").strip().strip('"')
+        except Exception as e:
+            print(f"Could not rewrite the follow-up question: {e}")
+            return question
+        # A blank or runaway rewrite is worse than the original question
+        if not rewritten or len(rewritten) > 4 * len(question) + 200:
+            return question
+        return rewritten
+
+    def _prompt_prefixes(self) -> List[str]:
+        """Return the static prefixes of the prompts this model sends to the LLM."""
+        return super()._prompt_prefixes() + [
+            prompts.CLASSIFY_PREFIX,
+            prompts.QUERY_PREFIX,
+            prompts.SUMMARY_PREFIX,
+            prompts.COMPILE_PREFIX,
+            prompts.STRATEGY_PREFIX,
+            prompts.REWRITE_PREFIX,
+        ]
+
+    def _record_timing(self, stage: str, seconds: float, update: Dict) -> None:
+        """Feed observed stage durations into the planner's cost estimates."""
+        if stage == "process_search_results":
+            extraction_stats = update.get("extraction_stats", {})
+            summarized = extraction_stats.get("summarized", 0)
+            # Summaries started during the search, so the node only saw their tail
+            seconds = extraction_stats.get("seconds", seconds)
+            self.planner.record("summary", seconds, math.ceil(summarized / self.planner.summary_workers))
+        else:
+            self.planner.record(stage, seconds)
+
+    def plan_pipeline(self, state: State) -> Dict:
+        """Choose how much of the pipeline to run for this question."""
+        # Stages overlap, so measure the request clock rather than adding them up
+        if state.get("started_at") is not None:
+            elapsed = time.monotonic() - state["started_at"]
+        else:
+            elapsed = sum((state.get("timings") or {}).values())
+        path = self.planner.plan(
+            state.get("question_type"),
+            len(state.get("raw_search_results") or []),
+            elapsed,
+            Deadline.from_state(state).remaining(),
+            state.get("latency_budget"))
+        # The direct path never reads the page bodies again
+        if path == DIRECT:
+            stage = self._pop_summary_stage(state)
+            if stage is not None:
+                stage.cancel()
+            self._release_pages(state)
+        return {"pipeline_path": path}
+
+    def _release_pages(self, state: State) -> None:
+        """Drop the page bodies of this request once no later stage needs them."""
+        self.content_store.release(state.get("request_id") or "")
+
+    def stream(self, inputs: Dict, graph=None) -> Iterator[Dict]:
+        """
+        Run a request through a graph, yielding the state after every step.
+
+        However the request ends, including when a node raises or a stage
+        is skipped to meet the deadline, what it still holds is released
+        afterwards: its page bodies, its summary stage and its pending index
+        additions.
+
+        Args:
+            inputs: The graph's input state
+            graph: The compiled graph to run, by default the main graph
+
+        Returns:
+            Iterator of the states after each step
+        """
+        # formulate_query assigns a request id when the inputs have none
+        request_id = inputs.get("request_id")
+        try:
+            for state in (graph or self.graph).stream(inputs, stream_mode="values"):
+                request_id = state.get("request_id") or request_id
+                yield state
+        finally:
+            if request_id:
+                self.finish_request(request_id)
+
+    def finish_request(self, request_id: str) -> None:
+        """Release everything a request still holds once it ended."""
+        with self._stages_lock:
+            stage = self._summary_stages.pop(request_id, None)
+            self._pending_index.pop(request_id, None)
+        if stage is not None:
+            stage.cancel()
+        self.content_store.release(request_id)
+
+    def _retrieves_locally(self) -> bool:
+        """Whether the corpus is retrieved on its own branch, alongside the web search."""
+        return self.pipelined and self.retrieval_scope != "global"
+
+    def _pop_summary_stage(self, state: State) -> Optional[SummaryStage]:
+        """Take the summary stage the search step started for this request, if any."""
+        with self._stages_lock:
+            return self._summary_stages.pop(state.get("request_id") or "", None)
+
+    def _start_summaries(self, state: State) -> SummaryStage:
+        """Start summarizing this request's search results as they are submitted."""
+        question = state["question"]
+        # Embed the question once for the extractive stage of every result
+        question_embedding = None
+        if self.extractor is not None:
+            question_embedding = self.extractor.embed_question(question)
+        bucket = None
+        if self.summary_cache is not None:
+            bucket = self.summary_cache.bucket(question_embedding, state.get("question_type") or "")
+
+        return SummaryStage(
+            functools.partial(
+                self._process_single_result,
+                question=question,
+                question_embedding=question_embedding,
+                deadline=Deadline.from_state(state),
+                bucket=bucket),
+            workers=self.planner.summary_workers)
+
+    def _index_documents(self, state: State, documents: List[Document]) -> None:
+        """Add documents to the vector store, in the background when pipelined."""
+        if not documents:
+            return
+        if not self.pipelined:
+            self.vector_store.add_documents(documents)
+            return
+        future = self._indexer.submit(self.vector_store.add_documents, documents)
+        with self._stages_lock:
+            self._pending_index.setdefault(state.get("request_id") or "", []).append(future)
+
+    def _wait_for_index(self, state: State) -> None:
+        """Wait until this request's documents are searchable."""
+        with self._stages_lock:
+            futures = self._pending_index.pop(state.get("request_id") or "", [])
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error adding search results to the vector store: {e}")
+
+    def _route_after_plan(self, state: State) -> str:
+        """Skip summarization on the direct path."""
+        return "retrieve" if state.get("pipeline_path") == DIRECT else "process_search_results"
+
+    def _route_after_summaries(self, state: State) -> str:
+        """Only compile a reference document on the full path."""
+        return "compile_reference_document" if state.get("pipeline_path") == COMPILE else "retrieve"
 
     def formulate_query(self, state: State) -> Dict:
         """Convert user question to search query with classification and validation"""
         user_question = state["question"]
+
+        # Start the request clock; a deadline given by the caller takes precedence
+        started_at = state.get("started_at") or time.monotonic()
+        deadline = state.get("deadline")
+        if deadline is None and self.request_timeout is not None:
+            deadline = started_at + self.request_timeout
         
         # Step 1: Classify the question type
-        classification_prompt = f"""
-        Analyze the following question and classify it into one of these categories:
-        - FACTUAL: Seeking objective information or facts
-        - HOW_TO: Seeking instructions or procedures
-        - OPINION: Seeking subjective views or evaluations
-        - COMPARISON: Seeking to compare multiple items
-        - EXPLANATION: Seeking to understand concepts or reasons
-        
-        Question: {user_question}
-        
-        Classification (return only the category name):
-        """
+        classification_prompt = prompts.CLASSIFY_PREFIX + prompts.CLASSIFY_SUFFIX.format(
+            question=user_question)
         
-        question_type = self.llm.invoke(classification_prompt).strip()
+        question_type = self._invoke_llm(classification_prompt, "classify", Deadline(deadline)).strip()
         
         # Step 2: Generate tailored search queries based on question type
-        query_prompt = f"""
-        Your task is to convert a user's question into 1-3 effective search engine queries.
-        
-        Question type: {question_type}
-        
-        Guidelines:
-        - For FACTUAL questions: Focus on key entities and relationships, use neutral terms
-        - For HOW_TO questions: Include terms like "tutorial", "guide", "steps", "instructions"
-        - For OPINION questions: Include terms like "review", "opinion", "analysis", "perspective"
-        - For COMPARISON questions: Include terms like "versus", "compared to", "differences"
-        - For EXPLANATION questions: Include terms like "explained", "understanding", "concept"
-        
-        Examples:
-        User: "What were the major causes of World War II?" (FACTUAL)
-        Queries: ["main causes World War II historical analysis", "economic political factors leading to World War II"]
-        
-        User: "How do I build a simple website?" (HOW_TO)
-        Queries: ["beginner website creation tutorial", "step by step build simple website guide"]
-        
-        User question: {user_question}
-        
-        Return a JSON array of 1-3 search queries (more for complex questions):
-        """
+        query_prompt = prompts.QUERY_PREFIX + prompts.QUERY_SUFFIX.format(
+            question_type=question_type,
+            question=user_question)
         
         # Parse the response as a list of queries
         try:
             import json
-            search_queries_text = self.llm.invoke(query_prompt).strip()
+            search_queries_text = self._invoke_llm(query_prompt, "queries", Deadline(deadline)).strip()
             # Handle potential formatting issues in LLM response
             if not search_queries_text.startswith("["):
                 search_queries_text = "[" + search_queries_text
@@ -160,6 +515,9 @@ class SearchAugmentedQAModel(QAModel):
         
         return {
             "question": user_question,
+            "request_id": state.get("request_id") or uuid.uuid4().hex,
+            "started_at": started_at,
+            "deadline": deadline,
             "question_type": question_type,
             "search_queries": valid_queries
         }
@@ -167,54 +525,108 @@ class SearchAugmentedQAModel(QAModel):
     def process_search_results(self, state: State) -> Dict:
         """Process and summarize individual search results."""
         raw_results = state.get("raw_search_results", [])
-        processed_results = []
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            result_threads = {
-                executor.submit(
-                    self._process_single_result, 
-                    result, 
-                    state["question"]
-                ): result for result in raw_results if result.get("content")
-            }
+        deadline = Deadline.from_state(state)
 
-            for future in concurrent.futures.as_completed(result_threads):
-                try:
-                    processed_result = future.result()
-                    if processed_result:
-                        processed_results.append(processed_result)
-                except Exception as e:
-                    print(f"Error processing result: {e}")
+        # Pick up the summaries started while searching, or start them now
+        stage = self._pop_summary_stage(state)
+        if stage is None:
+            stage = self._start_summaries(state)
+            for result in raw_results:
+                if result.get("content_id"):
+                    # A full queue never holds the request past its deadline
+                    stage.submit(result, timeout=deadline.timeout())
 
-        return {**state, "processed_results": processed_results}
-        
-    def _process_single_result(self, result: Dict, question: str) -> Optional[Dict]:
+        wait = deadline.timeout()
+        outputs, timed_out = stage.collect(timeout=None if wait is None else wait + self.DEADLINE_GRACE)
+        # Results that found no room in the queue before the deadline were never summarized
+        timed_out += stage.dropped
+        if timed_out:
+            # Out of time: answer with the summaries that are done
+            print(f"Request deadline reached, skipping {timed_out} remaining summaries")
+        # Summaries finish in any order; keep the search results' order for the compile prompt
+        positions = {result.get("url"): position for position, result in enumerate(raw_results)}
+        processed_results = sorted(
+            (output for output in outputs if not output.get("skipped")),
+            key=lambda output: positions.get(output.get("url"), len(positions)))
+        skipped = len(outputs) - len(processed_results)
+
+        # Summaries and the vector store now hold everything later stages need
+        self._release_pages(state)
+
+        update = {
+            "processed_results": processed_results,
+            "extraction_stats": {
+                "pages": stage.submitted + stage.dropped,
+                "summarized": len(processed_results),
+                "cached": sum(1 for result in processed_results if result.get("cached")),
+                "generated": sum(1 for result in processed_results if not result.get("cached")),
+                "skipped": skipped,
+                "timed_out": timed_out,
+                "seconds": stage.seconds(),
+            }
+        }
+        # Skip the reference document if it no longer fits before the deadline
+        if state.get("pipeline_path") == COMPILE and deadline.remaining() < self.planner.estimate(COMPILE, 0):
+            print("Not enough time left to compile a reference document, answering from the summaries")
+            update["pipeline_path"] = SUMMARIZE
+            update["degraded"] = {"compile_skipped": 1}
+        if timed_out:
+            update["degraded"] = {**update.get("degraded", {}), "summaries_skipped": timed_out}
+        return update
+        
+    def _process_single_result(self,
+                               result: Dict,
+                               question: str,
+                               question_embedding: Optional[List[float]] = None,
+                               deadline: Optional[Deadline] = None,
+                               bucket: Optional[str] = None) -> Optional[Dict]:
         """Process a single search result into a summarized version."""
         # Skip results without content
-        if not result.get("content"):
+        page = self.content_store.get(result.get("content_id", ""))
+        if not page:
             return None
+
+        # Reuse the summary written for this page and a similar question
+        page_hash = None
+        if self.summary_cache is not None and bucket is not None:
+            page_hash = content_hash(page)
+            summary = self.summary_cache.get(page_hash, bucket)
+            if summary is not None:
+                return {
+                    "title": result.get("title", "Unknown Source"),
+                    "url": result.get("url", ""),
+                    "summary": summary,
+                    "cached": True,
+                }
+
+        # Keep only the passages relevant to the question, if an extractor is set
+        if self.extractor is not None:
+            content, relevance = self.extractor.extract(
+                question, page, question_embedding)
+            if not self.extractor.is_relevant(relevance):
+                return {"url": result.get("url", ""), "relevance": relevance, "skipped": True}
+        else:
+            content = page[:2000] + "..."
             
         # Create a summary prompt for this specific result
-        summary_prompt = f"""
-        Summarize the following content in relation to this question: "{question}"
-        
-        Content from {result.get('title', 'Unknown Source')} ({result.get('url', 'No URL')}):
-        {result.get('content')[:2000]}...
-        
-        Provide a concise summary that captures the key information relevant to the question.
-        Include specific facts, figures, and quotes if relevant.
-        """
+        summary_prompt = prompts.SUMMARY_PREFIX + prompts.SUMMARY_SUFFIX.format(
+            question=question,
+            title=result.get('title', 'Unknown Source'),
+            url=result.get('url', 'No URL'),
+            content=content)
         
         try:
             # Generate summary using LLM
-            summary = self.llm.invoke(summary_prompt)
+            summary = self._invoke_llm(summary_prompt, "summary", deadline)
+            # A summary cut short by the deadline is not worth keeping
+            if page_hash is not None and summary and not (deadline and deadline.expired()):
+                self.summary_cache.put(page_hash, bucket, summary)
             
             # Return processed result
             return {
                 "title": result.get("title", "Unknown Source"),
                 "url": result.get("url", ""),
                 "summary": summary,
-                "original_content": result.get("content", "")
             }
         except Exception as e:
             print(f"Error processing result from {result.get('url', 'unknown URL')}: {e}")
@@ -223,72 +635,126 @@ class SearchAugmentedQAModel(QAModel):
     def search_web(self, state: State) -> Dict:
         """Search the web for relevant information using multiple queries"""
         search_queries = state.get("search_queries", [state["question"]])
-        
-        # Use all generated queries
-        all_search_results = []
-        for query in search_queries:
-            try:
-                # Use your search module to get results
-                results = web_search(query, self.search_config)
-                all_search_results.extend(results)
-            except Exception as e:
-                print(f"Search failed for query '{query}': {e}")
-        
-        # Remove duplicates based on URL
-        unique_results = {}
-        for result in all_search_results:
-            if "url" in result and result["url"] not in unique_results:
-                unique_results[result["url"]] = result
-        
-        # Convert search results to documents
-        search_documents = []
-        for result in unique_results.values():
-            if "content" in result and result["content"]:
-                doc = Document(
-                    page_content=result["content"],
-                    metadata={
-                        "title": result.get("title", "Unknown Title"),
-                        "url": result.get("url", ""),
-                        "source": "web_search",
-                        "query": result.get("query", "")
-                    }
-                )
-                search_documents.append(doc)
-        
-        # Add search documents to vector store for retrieval
-        if search_documents:
-            self.vector_store.add_documents(search_documents)
-        
+        deadline = Deadline.from_state(state)
+        request_id = state.get("request_id") or ""
+
+        # Run all generated queries concurrently, each within the search timeout
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(search_queries)))
+        futures = {executor.submit(self.search, query, self.search_config): query for query in search_queries}
+        query_order = {future: index for index, future in enumerate(futures)}
+
+        # Start summarizing as results arrive, unless the planner would answer directly anyway
+        stage = None
+        if self.pipelined and not deadline.expired():
+            elapsed = time.monotonic() - state["started_at"] if state.get("started_at") is not None else 0.0
+            path = self.planner.plan(
+                state.get("question_type"), self.planner.many_results, elapsed, deadline.remaining(),
+                state.get("latency_budget"))
+            if path != DIRECT:
+                stage = self._start_summaries(state)
+                with self._stages_lock:
+                    self._summary_stages[request_id] = stage
+
+        run = self.deduplicator.start()
+        page_results = []
+        page_order = []
+        search_document_count = 0
+        search_timeouts = 0
+        try:
+            # Hand each query's results on as soon as it returns
+            for future in concurrent.futures.as_completed(futures, timeout=deadline.timeout(self.search_timeout)):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"Search failed for query '{futures[future]}': {e}")
+                    continue
+                # Remove URL variants, identical pages and near-duplicate mirrors
+                unique_results = run.add_all(results)
+                search_document_count += self._index_results(state, unique_results)
+                for rank, result in enumerate(unique_results):
+                    page = self._store_page(state, result, len(page_results))
+                    page_results.append(page)
+                    page_order.append((query_order[future], rank))
+                    if stage is not None and page.get("content_id"):
+                        # Dropped rather than waited for once the deadline passes
+                        stage.submit(page, timeout=deadline.timeout())
+        except concurrent.futures.TimeoutError:
+            for future, query in futures.items():
+                if not future.done():
+                    search_timeouts += 1
+                    print(f"Search timed out for query '{query}'")
+        finally:
+            # A hung search cannot be interrupted, so stop waiting for it instead
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        # In query order rather than arrival order, so later prompts do not depend on timing
+        page_results = [page for _, page in sorted(zip(page_order, page_results), key=lambda pair: pair[0])]
+        if self.progressive:
+            # Off the graph, so no later stage waits for the provisional answer
+            self._quick_answers.submit(self._answer_provisionally, {**state, "raw_search_results": page_results})
+
         # Update state with search results for later steps
         return {
-            **state,
-            "raw_search_results": list(unique_results.values()),
-            "search_document_count": len(search_documents)
+            "raw_search_results": page_results,
+            "search_document_count": search_document_count,
+            "dedup_stats": run.stats,
+            "degraded": {"search_timeouts": search_timeouts} if search_timeouts else {}
         }
+
+    def _index_results(self, state: State, results: List[Dict]) -> int:
+        """Add search results to the vector store for retrieval and return how many."""
+        search_documents = [
+            Document(
+                page_content=result["content"],
+                metadata={
+                    "title": result.get("title", "Unknown Title"),
+                    "url": result.get("url", ""),
+                    "source": "web_search",
+                    "query": result.get("query", ""),
+                    "request_id": state.get("request_id")
+                }
+            )
+            for result in results
+            if "content" in result and result["content"]
+        ]
+        self._index_documents(state, search_documents)
+        return len(search_documents)
+
+    def _store_page(self, state: State, result: Dict, position: int) -> Dict:
+        """Keep a page body once in the content store and return the result with only its id."""
+        page = {key: value for key, value in result.items() if key != "content"}
+        if result.get("content"):
+            page["content_id"] = self.content_store.put(state.get("request_id") or "", result["content"])
+            # The provisional answer may run after planning released the bodies
+            if self.progressive and position < self.QUICK_ANSWER_RESULTS:
+                page.setdefault("snippet", result["content"][:self.QUICK_ANSWER_CHARS])
+        return page
     
     def select_retrieval_strategy(self, state: State) -> Dict:
         """Select the most appropriate retrieval strategy based on question type and content"""
         question_type = state.get("question_type", "FACTUAL")
         question = state["question"]
+        search_filter = self._retrieval_filter(state)
+        # With a reranker, over-fetch candidates and let it pick the best
+        k = self.reranker.max_candidates if self.reranker is not None else self.RETRIEVAL_K
+
+        # The planned queries already cover the question's angles; fuse them instead of asking
+        queries = [query for query in state.get("search_queries") or [] if query != question]
+        if self.multi_query and queries:
+            strategy = MultiQueryRetrieval(queries=queries, k=k, filter=search_filter)
+            return {"selected_retrieval_strategy": type(strategy).__name__}, strategy
         
         # Define a prompt to help select the best retrieval strategy
-        strategy_prompt = f"""
-        Based on the question type and content, select the most appropriate retrieval strategy:
-        
-        Question: {question}
-        Question Type: {question_type}
-        
-        Available strategies:
-        1. SIMILARITY: Vector similarity search (best for semantic understanding and conceptual questions)
-        2. MMR: Maximum Marginal Relevance (best for diverse information needs)
-        3. HYBRID: Combines keyword and semantic search (best for specific technical questions)
-        4. KEYWORD: Traditional keyword search (best for exact term matching)
-        
-        Select the most appropriate strategy number (1-4):
-        """
+        strategy_prompt = prompts.STRATEGY_PREFIX + prompts.STRATEGY_SUFFIX.format(
+            question=question,
+            question_type=question_type)
         
+        deadline = Deadline.from_state(state)
         try:
-            strategy_selection = self.llm.invoke(strategy_prompt).strip()
+            # Out of time: go straight to similarity search
+            if deadline.expired():
+                raise TimeoutError("request deadline reached")
+            strategy_selection = self._invoke_llm(strategy_prompt, "strategy", deadline).strip()
             # Extract just the number if there's additional text
             import re
             match = re.search(r'[1-4]', strategy_selection)
@@ -301,55 +767,55 @@ class SearchAugmentedQAModel(QAModel):
         
         # Map strategy number to actual strategy
         strategies = {
-            1: SimilaritySearchRetrieval(),
-            2: MMRRetrieval(diversity=0.7),
-            3: HybridRetrieval(alpha=0.5),  # 50% keyword, 50% semantic
-            4: KeywordRetrieval()
+            1: SimilaritySearchRetrieval(k=k, filter=search_filter),
+            2: MMRRetrieval(diversity=0.7, k=k, filter=search_filter),
+            3: HybridRetrieval(alpha=0.5, k=k, filter=search_filter),  # 50% keyword, 50% semantic
+            4: KeywordRetrieval(k=k, filter=search_filter)
         }
         
-        selected_strategy = strategies.get(strategy_num, SimilaritySearchRetrieval())
+        selected_strategy = strategies.get(strategy_num, strategies[1])
         
         return {
-            **state,
             "selected_retrieval_strategy": type(selected_strategy).__name__
         }, selected_strategy
     
+    def _retrieval_filter(self, state: State) -> Optional[Dict]:
+        """Build the metadata filter that scopes retrieval to this request."""
+        if self.retrieval_scope == "global" or not state.get("request_id"):
+            return None
+        # Earlier turns of a conversation may already have found what is needed
+        request_ids = [state["request_id"], *(state.get("history_request_ids") or [])]
+        # The corpus was already searched alongside the web search
+        if state.get("local_context") is not None:
+            return {"request_id": request_ids}
+        return {"request_id": request_ids + [CORPUS_REQUEST_ID]}
+
     def compile_reference_document(self, state: State) -> Dict:
         """Compile processed results into a structured reference document."""
         processed_results = state.get("processed_results", [])
         question = state["question"]
         
         if not processed_results:
-            return {**state, "reference_document": ""}
-        
-        # Create a compilation prompt
-        compilation_prompt = f"""
-        Based on the following summaries, create a comprehensive reference document that answers this question:
-        
-        Question: {question}
-        
-        Summaries:
-        """
+            return {"reference_document": ""}
         
         # Add each summary with source information
-        for i, result in enumerate(processed_results, 1):
-            compilation_prompt += f"""
-            Source {i}: {result.get('title')} ({result.get('url')})
-            {result.get('summary')}
-            """
-        
-        compilation_prompt += """
-        
-        Create a well-structured reference document that:
-        1. Synthesizes information from all sources
-        2. Organizes content by topic or relevance
-        3. Includes proper citations [Source X] for each piece of information
-        4. Presents a comprehensive answer to the question
-        """
+        summaries = "\n".join(
+            prompts.COMPILE_SOURCE.format(
+                index=i,
+                title=result.get('title'),
+                url=result.get('url'),
+                summary=result.get('summary'))
+            for i, result in enumerate(processed_results, 1)
+        )
+
+        # Create a compilation prompt
+        compilation_prompt = prompts.COMPILE_PREFIX + prompts.COMPILE_SUFFIX.format(
+            question=question,
+            summaries=summaries)
         
         try:
             # Generate compiled document
-            reference_document = self.llm.invoke(compilation_prompt)
+            reference_document = self._invoke_llm(compilation_prompt, "compile")
             
             # Add to vector store for retrieval
             if reference_document:
@@ -358,26 +824,147 @@ class SearchAugmentedQAModel(QAModel):
                     metadata={
                         "title": f"Reference Document for: {question}",
                         "source": "compiled_reference",
-                        "question": question
+                        "question": question,
+                        "request_id": state.get("request_id")
                     }
                 )
                 self.vector_store.add_documents([doc])
             
-            return {**state, "reference_document": reference_document}
+            return {"reference_document": reference_document}
         except Exception as e:
             print(f"Error compiling reference document: {e}")
-            return {**state, "reference_document": ""}
+            return {"reference_document": ""}
         
+    def retrieve_local(self, state: State) -> Dict:
+        """Search the preloaded corpus, which does not depend on the web search."""
+        k = self.reranker.max_candidates if self.reranker is not None else self.RETRIEVAL_K
+        strategy = SimilaritySearchRetrieval(k=k, filter={"request_id": CORPUS_REQUEST_ID})
+        try:
+            return {"local_context": strategy.retrieve(state["question"], self.vector_store)}
+        except Exception as e:
+            print(f"Error searching the local corpus: {e}")
+            # Leave the corpus to the main retrieval
+            return {"local_context": None}
+
     def retrieve(self, state: State) -> Dict[str, list[Document]]:
         """Retrieve documents using dynamically selected strategy"""
+        # The search results are indexed in the background; wait until they are searchable
+        self._wait_for_index(state)
+
         # Select the appropriate retrieval strategy
-        updated_state, strategy = self.select_retrieval_strategy(state)
+        update, strategy = self.select_retrieval_strategy(state)
         
         # Use the selected strategy to retrieve documents
         query = state["question"]
         retrieved_docs = strategy.retrieve(query, self.vector_store)
+
+        # Merge in the corpus documents found alongside the web search
+        local_context = state.get("local_context")
+        if local_context:
+            retrieved_docs = reciprocal_rank_fusion([retrieved_docs, local_context])
+            retrieved_docs = retrieved_docs[:getattr(strategy, 'k', len(retrieved_docs))]
+
+        # Without a reference document, the summaries lead the context
+        if state.get("pipeline_path") == SUMMARIZE:
+            summary_docs = [
+                Document(
+                    page_content=result["summary"],
+                    metadata={
+                        "title": result.get("title", "Unknown Source"),
+                        "url": result.get("url", ""),
+                        "source": "summary"
+                    }
+                )
+                for result in state.get("processed_results") or []
+                if result.get("summary")
+            ]
+            retrieved_docs = summary_docs + retrieved_docs
         
+        if isinstance(strategy, MultiQueryRetrieval):
+            update["retrieval_stats"] = strategy.stats
+
+        # The summaries are consumed by now, so release them
         return {
-            **updated_state,
-            "context": retrieved_docs
+            **update,
+            "context": retrieved_docs,
+            "processed_results": None,
+            "local_context": None
         }
+
+    def generate(self, state: State) -> Dict[str, str]:
+        """Generate the answer and record the end-to-end latency of the request."""
+        update = super().generate(state)
+        if state.get("started_at") is not None:
+            seconds = time.monotonic() - state["started_at"]
+            self.latency.record(seconds)
+            update["phase_timings"] = {"final": seconds}
+        return update
+
+    def on_provisional(self, request_id: str, callback: Optional[Callable[[Dict], None]]) -> None:
+        """
+        Register the receiver of a request's provisional answer.
+
+        Args:
+            request_id: Request id passed in the graph's input state
+            callback: Called from a background thread with the quick_answer
+                update, or None to stop listening
+        """
+        with self._stages_lock:
+            if callback is None:
+                self._provisional_listeners.pop(request_id, None)
+            else:
+                self._provisional_listeners[request_id] = callback
+
+    def _answer_provisionally(self, state: State) -> None:
+        """Answer provisionally and hand the answer to the request's listener, if any."""
+        with self._stages_lock:
+            listening = (state.get("request_id") or "") in self._provisional_listeners
+        if not listening:
+            return
+        update = self.quick_answer(state)
+        with self._stages_lock:
+            callback = self._provisional_listeners.pop(state.get("request_id") or "", None)
+        if update and callback is not None:
+            callback(update)
+
+    def quick_answer(self, state: State) -> Dict:
+        """Answer provisionally from the beginning of the top search results."""
+        deadline = Deadline.from_state(state)
+        snippets = [
+            f"{result.get('title', 'Unknown Source')}: {result['snippet']}"
+            for result in (state.get("raw_search_results") or [])[:self.QUICK_ANSWER_RESULTS]
+            if result.get("snippet")
+        ]
+        if not snippets or deadline.expired():
+            return {}
+
+        # Same prompt as the final answer, so its cached prefix is reused
+        messages = self.prompt.invoke({
+            "prompt_source": self.prompt_source,
+            "question": state["question"],
+            "context": "\n\n".join(snippets)})
+        try:
+            provisional = self._invoke_llm(messages, "quick", deadline)
+        except Exception as e:
+            print(f"Provisional answer failed: {e}")
+            return {}
+
+        update = {"provisional_answer": provisional}
+        if state.get("started_at") is not None:
+            update["phase_timings"] = {"provisional": time.monotonic() - state["started_at"]}
+        return update
+
+    def rerank(self, state: State) -> Dict:
+        """Rerank the retrieved documents with the cross-encoder and keep the best."""
+        documents = state.get("context") or []
+        # Summaries are already distilled for this question, so they always stay
+        summaries = [doc for doc in documents if doc.metadata.get("source") == "summary"]
+        candidates = [doc for doc in documents if doc.metadata.get("source") != "summary"]
+
+        try:
+            reranked, stats = self.reranker.rerank(state["question"], candidates, baseline_k=self.RETRIEVAL_K)
+        except Exception as e:
+            print(f"Reranking failed, keeping retrieval order: {e}")
+            return {"context": summaries + candidates[:self.reranker.top_n]}
+
+        return {"context": summaries + reranked, "rerank_stats": stats}
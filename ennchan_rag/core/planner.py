@@ -0,0 +1,127 @@
+import math
+from typing import Dict, Optional
+
+# Graph variants, from cheapest to most expensive
+DIRECT = "direct"  # Answer directly from retrieved chunks
+SUMMARIZE = "summarize"  # Summarize search results, then answer
+COMPILE = "compile"  # Summarize, compile a reference document, then answer
+
+PATHS = [DIRECT, SUMMARIZE, COMPILE]
+
+
+class PipelinePlanner:
+    """
+    Chooses which variant of the search pipeline to run for a question.
+
+    Each question type has a preferred variant. If a latency budget is set,
+    the planner falls back to cheaper variants until the estimated cost of
+    the remaining stages fits in what is left of the budget. Stage costs
+    start from defaults and are refined from observed timings.
+    """
+
+    # Preferred variant per question type, as (few results, many results)
+    PREFERRED_PATHS: Dict[str, tuple] = {
+        "FACTUAL": (DIRECT, SUMMARIZE),
+        "HOW_TO": (SUMMARIZE, SUMMARIZE),
+        "OPINION": (SUMMARIZE, COMPILE),
+        "COMPARISON": (SUMMARIZE, COMPILE),
+        "EXPLANATION": (SUMMARIZE, COMPILE),
+    }
+
+    # Initial stage cost estimates in seconds
+    DEFAULT_COSTS: Dict[str, float] = {
+        "summary": 10.0,
+        "compile_reference_document": 30.0,
+        "retrieve": 2.0,
+        "generate": 20.0,
+    }
+
+    def __init__(self,
+                 latency_budget: Optional[float] = None,
+                 many_results: int = 3,
+                 summary_workers: int = 5,
+                 smoothing: float = 0.3):
+        """
+        Initialize the pipeline planner.
+
+        Args:
+            latency_budget: Target end-to-end latency in seconds, or None for no limit
+            many_results: Result count from which a question counts as having many results
+            summary_workers: Number of summaries generated in parallel
+            smoothing: Weight of a new observation in the moving average of stage costs
+        """
+        self.latency_budget = latency_budget
+        self.many_results = many_results
+        self.summary_workers = summary_workers
+        self.smoothing = smoothing
+        self.costs = dict(self.DEFAULT_COSTS)
+
+    def estimate(self, path: str, result_count: int) -> float:
+        """
+        Estimate the remaining cost of a pipeline variant.
+
+        Args:
+            path: The pipeline variant
+            result_count: Number of search results to process
+
+        Returns:
+            Estimated seconds until the answer is generated
+        """
+        cost = self.costs["retrieve"] + self.costs["generate"]
+        if path in (SUMMARIZE, COMPILE):
+            waves = math.ceil(result_count / self.summary_workers)
+            cost += waves * self.costs["summary"]
+        if path == COMPILE:
+            cost += self.costs["compile_reference_document"]
+        return cost
+
+    def plan(self,
+             question_type: Optional[str],
+             result_count: int,
+             elapsed: float = 0.0,
+             remaining: float = math.inf,
+             latency_budget: Optional[float] = None) -> str:
+        """
+        Choose a pipeline variant for a question.
+
+        Args:
+            question_type: The classified question type
+            result_count: Number of search results available
+            elapsed: Seconds already spent on the request
+            remaining: Seconds left before the request's hard deadline
+            latency_budget: Target latency of this request; defaults to the
+                planner's latency_budget
+
+        Returns:
+            One of DIRECT, SUMMARIZE or COMPILE
+        """
+        if result_count == 0:
+            return DIRECT
+
+        few, many = self.PREFERRED_PATHS.get((question_type or "").upper(), (SUMMARIZE, COMPILE))
+        path = many if result_count >= self.many_results else few
+
+        if latency_budget is None:
+            latency_budget = self.latency_budget
+        if latency_budget is not None:
+            remaining = min(remaining, latency_budget - elapsed)
+        if not math.isinf(remaining):
+            # Fall back to cheaper variants until the estimate fits
+            while path != DIRECT and self.estimate(path, result_count) > remaining:
+                path = PATHS[PATHS.index(path) - 1]
+
+        return path
+
+    def record(self, stage: str, seconds: float, units: int = 1) -> None:
+        """
+        Update the cost estimate of a stage from an observed timing.
+
+        Args:
+            stage: The stage name
+            seconds: Observed duration of the stage
+            units: Number of units of work the duration covers
+        """
+        if stage not in self.costs or units <= 0:
+            return
+        observed = seconds / units
+        self.costs[stage] += self.smoothing * (observed - self.costs[stage])
@@ -0,0 +1,123 @@
+"""
+Prompt templates used by the QA pipeline.
+
+Each template is split into a static ``*_PREFIX`` holding the instructions and
+a ``*_SUFFIX`` holding the per-call fields. The prefix always comes first so
+that LLM backends which support prefix caching can reuse its precomputed
+key/value states across calls instead of prefilling it every time.
+"""
+
+QUESTION_TYPES = ["FACTUAL", "HOW_TO", "OPINION", "COMPARISON", "EXPLANATION"]
+
+CLASSIFY_PREFIX = """Analyze the question below and classify it into one of these categories:
+- FACTUAL: Seeking objective information or facts
+- HOW_TO: Seeking instructions or procedures
+- OPINION: Seeking subjective views or evaluations
+- COMPARISON: Seeking to compare multiple items
+- EXPLANATION: Seeking to understand concepts or reasons
+
+Return only the category name.
+"""
+
+CLASSIFY_SUFFIX = """
+Question: {question}
+
+Classification:"""
+
+QUERY_PREFIX = """Your task is to convert a user's question into 1-3 effective search engine queries.
+
+Guidelines:
+- For FACTUAL questions: Focus on key entities and relationships, use neutral terms
+- For HOW_TO questions: Include terms like "tutorial", "guide", "steps", "instructions"
+- For OPINION questions: Include terms like "review", "opinion", "analysis", "perspective"
+- For COMPARISON questions: Include terms like "versus", "compared to", "differences"
+- For EXPLANATION questions: Include terms like "explained", "understanding", "concept"
+
+Examples:
+User: "What were the major causes of World War II?" (FACTUAL)
+Queries: ["main causes World War II historical analysis", "economic political factors leading to World War II"]
+
+User: "How do I build a simple website?" (HOW_TO)
+Queries: ["beginner website creation tutorial", "step by step build simple website guide"]
+
+Return a JSON array of 1-3 search queries (more for complex questions).
+"""
+
+QUERY_SUFFIX = """
+Question type: {question_type}
+User question: {question}
+
+Queries:"""
+
+SUMMARY_PREFIX = """Summarize the content below in relation to the question that precedes it.
+Provide a concise summary that captures the key information relevant to the question.
+Include specific facts, figures, and quotes if relevant.
+"""
+
+SUMMARY_SUFFIX = """
+Question: "{question}"
+
+Content from {title} ({url}):
+{content}
+
+Summary:"""
+
+COMPILE_PREFIX = """Based on the summaries below, create a comprehensive reference document that answers the question.
+
+Create a well-structured reference document that:
+1. Synthesizes information from all sources
+2. Organizes content by topic or relevance
+3. Includes proper citations [Source X] for each piece of information
+4. Presents a comprehensive answer to the question
+"""
+
+COMPILE_SUFFIX = """
+Question: {question}
+
+Summaries:
+{summaries}
+
+Reference document:"""
+
+COMPILE_SOURCE = """Source {index}: {title} ({url})
+{summary}
+"""
+
+STRATEGY_PREFIX = """Based on the question type and content, select the most appropriate retrieval strategy.
+
+Available strategies:
+1. SIMILARITY: Vector similarity search (best for semantic understanding and conceptual questions)
+2. MMR: Maximum Marginal Relevance (best for diverse information needs)
+3. HYBRID: Combines keyword and semantic search (best for specific technical questions)
+4. KEYWORD: Traditional keyword search (best for exact term matching)
+"""
+
+STRATEGY_SUFFIX = """
+Question: {question}
+Question Type: {question_type}
+
+Select the most appropriate strategy number (1-4):"""
+
+REWRITE_PREFIX = """Rewrite the follow-up question below as a standalone question, using the
+conversation before it to resolve pronouns, omitted subjects and references
+such as "that" or "then". If it is already standalone, repeat it unchanged.
+
+Return only the standalone question, on one line.
+"""
+
+REWRITE_SUFFIX = """
+Conversation:
+{history}
+
+Follow-up question: {question}
+
+Standalone question:"""
+
+ANSWER_PREFIX = """
+{prompt_source}
+"""
+
+ANSWER_SUFFIX = """Question: {question}
+Context: {context}
+Answer:
+"""
@@ -0,0 +1,216 @@
+import concurrent.futures
+import dataclasses
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Pipeline path of a follow-up answered from the conversation's documents
+FOLLOWUP = "followup"
+
+
+@dataclasses.dataclass
+class Turn:
+    """One answered question of a conversation."""
+    question: str  # The question as asked
+    standalone_question: str  # The question rewritten against the history
+    answer: str
+    request_id: Optional[str]
+    documents: List[Document]  # Retrieved chunks, summaries and the reference document
+    vectors: np.ndarray  # Normalized embeddings of the documents
+
+
+class ConversationSession:
+    """
+    Conversation state shared by the turns of one chat.
+
+    Keeps the last turns' questions, answers and the documents they were
+    answered from: the retrieved chunks, the page summaries and the compiled
+    reference document, embedded once when the turn ends. A follow-up is
+    rewritten against this history, and if enough of these documents are
+    close to it, it is answered from them without a new web search.
+
+    Turns can be recorded in the background after their answer is out;
+    reading the session waits for them.
+
+    Example:
+        session = engine.new_session()
+        engine.ask("Who led the Allied invasion of Normandy?", session)
+        engine.ask("What about in 1943?", session)
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 max_turns: int = 5,
+                 coverage_threshold: float = 0.6,
+                 min_documents: int = 2,
+                 answer_chars: int = 300,
+                 vector_store: Optional[Any] = None):
+        """
+        Initialize the session.
+
+        Args:
+            embeddings: Embedding model used to match follow-ups to earlier documents
+            max_turns: Number of recent turns kept
+            coverage_threshold: Cosine similarity an earlier document must reach
+                to count towards covering a follow-up
+            min_documents: Earlier documents that must reach the threshold for
+                a follow-up to be answered without searching
+            answer_chars: Characters of each earlier answer shown to the rewrite prompt
+            vector_store: Store whose embeddings of retrieved chunks are reused
+                instead of embedding them again
+        """
+        self.embeddings = embeddings
+        self.max_turns = max_turns
+        self.coverage_threshold = coverage_threshold
+        self.min_documents = min_documents
+        self.answer_chars = answer_chars
+        self.vector_store = vector_store
+        self.turns: List[Turn] = []
+        self.stats = {"turns": 0, "rewritten": 0, "covered": 0}
+        self._lock = threading.Lock()
+        self._recorder = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="session")
+        self._pending: List[concurrent.futures.Future] = []
+
+    def add_turn(self,
+                 question: str,
+                 standalone_question: str,
+                 answer: str,
+                 request_id: Optional[str] = None,
+                 context: Sequence[Document] = (),
+                 summaries: Sequence[Dict] = (),
+                 reference_document: Optional[str] = None) -> None:
+        """
+        Record an answered question with the documents it was answered from.
+
+        Args:
+            question: The question as asked
+            standalone_question: The question rewritten against the history
+            answer: The answer given
+            request_id: Request id of the answer's documents in the vector store
+            context: The documents the answer was generated from
+            summaries: The page summaries of the request
+            reference_document: The compiled reference document, if any
+        """
+        documents = list(context)
+        documents += [
+            Document(
+                page_content=result["summary"],
+                metadata={"title": result.get("title", "Unknown Source"), "url": result.get("url", ""),
+                          "source": "summary"})
+            for result in summaries
+            if result.get("summary")
+        ]
+        if reference_document:
+            documents.append(Document(
+                page_content=reference_document,
+                metadata={"title": f"Reference Document for: {standalone_question}",
+                          "source": "compiled_reference"}))
+        # The same chunk is often retrieved again by the next turn
+        documents = list({doc.page_content: doc for doc in documents}.values())
+
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        if documents:
+            # Retrieved chunks are already embedded in the store
+            known = {}
+            if hasattr(self.vector_store, "get_vectors"):
+                known = self.vector_store.get_vectors([doc.id for doc in documents if doc.id])
+            rows = [known.get(doc.id) for doc in documents]
+            missing = [index for index, row in enumerate(rows) if row is None]
+            if missing:
+                embedded = self._normalize(np.asarray(
+                    self.embeddings.embed_documents([documents[index].page_content for index in missing]),
+                    dtype=np.float32))
+                for index, vector in zip(missing, embedded):
+                    rows[index] = vector
+            vectors = np.stack(rows)
+
+        with self._lock:
+            self.turns.append(Turn(question, standalone_question, answer, request_id, documents, vectors))
+            del self.turns[:-self.max_turns]
+            self.stats["turns"] += 1
+
+    def add_turn_async(self, *args: Any, **kwargs: Any) -> concurrent.futures.Future:
+        """Record a turn in the background; takes the arguments of add_turn."""
+        future = self._recorder.submit(self.add_turn, *args, **kwargs)
+        with self._lock:
+            self._pending = [pending for pending in self._pending if not pending.done()] + [future]
+        return future
+
+    def wait(self) -> None:
+        """Wait for the turns being recorded in the background."""
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error recording conversation turn: {e}")
+        with self._lock:
+            self._pending = [future for future in self._pending if future not in pending]
+
+    def history(self) -> str:
+        """Format the kept turns for the rewrite prompt."""
+        self.wait()
+        with self._lock:
+            turns = list(self.turns)
+        return "\n".join(
+            f"User: {turn.standalone_question}\nAssistant: {turn.answer[:self.answer_chars]}"
+            for turn in turns
+        )
+
+    def request_ids(self) -> List[str]:
+        """Request ids of the kept turns, whose documents may still be in the vector store."""
+        self.wait()
+        with self._lock:
+            return [turn.request_id for turn in self.turns if turn.request_id]
+
+    def recall(self, question: str, k: int = 4) -> Tuple[List[Document], float]:
+        """
+        Find the earlier documents most similar to a question.
+
+        Args:
+            question: The standalone question
+            k: Maximum number of documents to return
+
+        Returns:
+            Tuple of the documents above the coverage threshold, best first,
+            or no documents if fewer than min_documents reach it, and the best
+            similarity found
+        """
+        self.wait()
+        with self._lock:
+            turns = [turn for turn in self.turns if turn.documents]
+        if not turns:
+            return [], 0.0
+
+        documents = [doc for turn in turns for doc in turn.documents]
+        matrix = np.concatenate([turn.vectors for turn in turns])
+        query = self._normalize(np.asarray(self.embeddings.embed_query(question), dtype=np.float32).reshape(1, -1))[0]
+        scores = matrix @ query
+        recalled = []
+        seen = set()
+        for index in np.argsort(-scores):
+            if scores[index] < self.coverage_threshold or len(recalled) == k:
+                break
+            # Turns answered from earlier documents hold them again
+            if documents[index].page_content not in seen:
+                seen.add(documents[index].page_content)
+                recalled.append(documents[index])
+        # One close chunk is often the same topic, not the answer to the new question
+        if len(recalled) < self.min_documents:
+            recalled = []
+        return recalled, float(scores.max())
+
+    def reset(self) -> None:
+        """Forget the conversation."""
+        self.wait()
+        with self._lock:
+            self.turns = []
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
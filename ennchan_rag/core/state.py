@@ -1,7 +1,12 @@
-from typing_extensions import List, TypedDict, Optional, Dict
+from typing_extensions import Annotated, List, TypedDict, Optional, Dict
 from langchain_core.documents import Document
 
 
+def merge_dicts(left: Optional[Dict], right: Optional[Dict]) -> Dict:
+    """Reducer that merges dictionary updates into the existing value."""
+    return {**(left or {}), **(right or {})}
+
+
 # Define state for application
 class State(TypedDict):
     """
@@ -12,9 +17,28 @@ class State(TypedDict):
     a query and generating a response.
     """
     question: str  # The user's original question
+    request_id: Optional[str]  # Tags the documents this request adds to the store
+    history_request_ids: Optional[List[str]]  # Request ids of the earlier turns of a conversation
+    started_at: Optional[float]  # time.monotonic() when the request started
+    deadline: Optional[float]  # time.monotonic() by which the request must answer
+    latency_budget: Optional[float]  # Target latency of this request, overriding the planner's
+    question_type: Optional[str]  # Classification of the question
     context: List[Document]  # Retrieved documents for context
+    local_context: Optional[List[Document]]  # Corpus documents found alongside the web search
     answer: str  # The generated answer
     search_queries: Optional[List[str]]  # Added for query tracking
     search_results: Optional[List[Dict]]  # Added for raw search results
-    processed_results: Optional[List[Dict]]  # Added for individual summaries
-    reference_document: Optional[str]  # Added for compiled document
\ No newline at end of file
+    raw_search_results: Optional[List[Dict]]  # Deduplicated search results, bodies referenced by content_id
+    search_document_count: Optional[int]  # Search results added to the vector store
+    dedup_stats: Optional[Dict[str, int]]  # Duplicate search results dropped and LLM calls avoided
+    processed_results: Optional[List[Dict]]  # Individual summaries, released after retrieval
+    extraction_stats: Optional[Dict[str, float]]  # Pages summarized (cached vs. generated) vs. skipped as irrelevant, and summary seconds
+    reference_document: Optional[str]  # Added for compiled document
+    selected_retrieval_strategy: Optional[str]  # Name of the retrieval strategy used
+    retrieval_stats: Optional[Dict[str, int]]  # Queries fused and candidates found by multi-query retrieval
+    rerank_stats: Optional[Dict[str, float]]  # Latency and context tokens of the rerank stage
+    compression_stats: Optional[Dict[str, float]]  # Sentences and tokens kept by context compression, and prefill seconds saved
+    pipeline_path: Optional[str]  # Pipeline variant chosen by the planner
+    timings: Annotated[Dict[str, float], merge_dicts]  # Seconds spent in each stage
+    phase_timings: Annotated[Dict[str, float], merge_dicts]  # Seconds from the start to the provisional and final answers
+    degraded: Annotated[Dict[str, int], merge_dicts]  # Work skipped to meet the deadline
@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Tells a worker that no more results will arrive
+_DONE = object()
+
+
+class SummaryStage:
+    """
+    Bounded producer/consumer stage that summarizes search results as they arrive.
+
+    The search step submits each new result as soon as its query returns, and
+    a fixed pool of workers summarizes them while other queries are still in
+    flight. The queue is bounded, so a producer far ahead of the workers
+    waits, up to its timeout, instead of piling up pending work; a result
+    that finds no room in time is dropped and counted. Collecting the
+    results closes the stage; cancelling it drops whatever has not started
+    yet. Neither ever blocks on a full queue: the stop signals are queued
+    only if there is room, and idle workers also stop once they see the
+    stage closed and the queue empty.
+
+    Example:
+        stage = SummaryStage(summarize, workers=5)
+        for result in results:
+            stage.submit(result)
+        summaries, unfinished = stage.collect(timeout=30)
+    """
+
+    # Seconds an idle worker waits for a result before checking whether the stage closed
+    POLL_SECONDS = 0.1
+
+    def __init__(self,
+                 summarize: Callable[[Dict], Optional[Dict]],
+                 workers: int = 5,
+                 max_pending: int = 32):
+        """
+        Initialize the stage and start its workers.
+
+        Args:
+            summarize: Turns one search result into a processed result, or None
+            workers: Number of results summarized concurrently
+            max_pending: Maximum number of submitted results waiting for a worker
+        """
+        self.summarize = summarize
+        self.submitted = 0
+        self.dropped = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._outputs: List[Dict] = []
+        self._completed = 0
+        self._closed = False
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"summary-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, result: Dict, timeout: Optional[float] = None) -> bool:
+        """
+        Queue a search result for summarization.
+
+        Args:
+            result: The search result
+            timeout: Seconds to wait for room in the queue, or None to wait
+
+        Returns:
+            Whether the result was queued; a result that found no room in
+            time is counted in dropped
+        """
+        if self._closed or self._cancelled.is_set():
+            return False
+        try:
+            self._queue.put(result, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+            if self.started_at is None:
+                self.started_at = time.perf_counter()
+        return True
+
+    def close(self) -> None:
+        """Signal that no more results will be submitted."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_workers()
+
+    def cancel(self) -> None:
+        """Drop queued results and stop the workers once their current result is done."""
+        self._cancelled.set()
+        self._closed = True
+        # Draining also drops the stop signals a close queued, so queue them again
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._stop_workers()
+
+    def collect(self, timeout: Optional[float] = None) -> Tuple[List[Dict], int]:
+        """
+        Close the stage and wait for the submitted results.
+
+        Args:
+            timeout: Seconds to wait, or None to wait for every result
+
+        Returns:
+            Tuple of the processed results that finished, and the number of
+            submitted results that did not finish in time
+        """
+        self.close()
+        end = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(None if end is None else max(0.0, end - time.monotonic()))
+        if any(worker.is_alive() for worker in self._workers):
+            # Out of time: running summaries stop at their own max_time
+            self.cancel()
+        with self._lock:
+            return list(self._outputs), self.submitted - self._completed
+
+    def seconds(self) -> float:
+        """Seconds from the first submitted result until the last one finished."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def _stop_workers(self) -> None:
+        """Queue a stop signal per worker where there is room; the others notice the stage closed."""
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(_DONE)
+            except queue.Full:
+                return
+
+    def _work(self) -> None:
+        while True:
+            try:
+                result = self._queue.get(timeout=self.POLL_SECONDS)
+            except queue.Empty:
+                if self._closed:
+                    return
+                continue
+            if result is _DONE:
+                return
+            if self._cancelled.is_set():
+                continue
+            try:
+                output = self.summarize(result)
+            except Exception as e:
+                print(f"Error processing result: {e}")
+                output = None
+            with self._lock:
+                self._completed += 1
+                self.finished_at = time.perf_counter()
+                if output and not self._cancelled.is_set():
+                    self._outputs.append(output)
@@ -0,0 +1,464 @@
+import contextlib
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ennchan_search import search as web_search
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ennchan_rag.config import Config, load_config
+from ennchan_rag.core import prompts
+from ennchan_rag.core.compression import ContextCompressor
+from ennchan_rag.core.extractive import PassageExtractor
+from ennchan_rag.core.interfaces import LLMInterface
+from ennchan_rag.core.model import SearchAugmentedQAModel, CORPUS_REQUEST_ID
+from ennchan_rag.core.session import ConversationSession, FOLLOWUP
+from ennchan_rag.core.planner import PipelinePlanner
+from ennchan_rag.ingest import MANIFEST_FILE
+from ennchan_rag.llms import HuggingFaceLLM, ServerLLM
+from ennchan_rag.loaders import load_sources
+from ennchan_rag.retrievers import CrossEncoderReranker
+from ennchan_rag.stores import ManagedVectorStore
+from ennchan_rag.utils.dedup import SearchResultDeduplicator
+from ennchan_rag.utils.embeddings import load_embeddings
+from ennchan_rag.utils.model_cache import get_model, load_stats
+from ennchan_rag.utils.profiling import MemoryProfile, peak_rss_bytes
+from ennchan_rag.utils.replay import Cassette, RecordingLLM, RecordingSearch
+from ennchan_rag.utils.summary_cache import SummaryCache
+from ennchan_rag.utils.quantization import load_quantization
+
+
+class Engine:
+    """
+    Long-lived question answering engine.
+
+    Loads the configuration, models, vector store and graph once, so that
+    every question after the first only pays for answering it. The state of
+    the last answer is kept for inspection with stats().
+    """
+
+    def __init__(self, p_config: str = None, latency_budget: Optional[float] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            p_config: Path to the configuration file, or None for the default
+            latency_budget: Target latency in seconds; overrides the
+                configured latency_budget
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        self.config = load_config(p_config)
+        self.latency_budget = latency_budget if latency_budget is not None else self.config.latency_budget
+        timings["config"] = time.perf_counter() - start
+        self.embeddings = load_embeddings(self.config)
+        timings["embeddings"] = time.perf_counter() - start - sum(timings.values())
+        self.vector_store = self._build_vector_store(self.config)
+        timings["vector_store"] = time.perf_counter() - start - sum(timings.values())
+        self.cassette = self._build_cassette(self.config)
+        self.llm = self._build_llm(self.config)
+        timings["llm"] = time.perf_counter() - start - sum(timings.values())
+        self.model = self._build_model(self.config)
+        timings["graph"] = time.perf_counter() - start - sum(timings.values())
+        self.last_state: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+        self.startup = {
+            "seconds": time.perf_counter() - start,
+            "stages": timings,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "models": load_stats(),
+        }
+        rss = self.startup["peak_rss_bytes"]
+        print(f"Engine started in {self.startup['seconds']:.1f}s"
+              + (f" (peak RSS {rss / (1024 * 1024):.0f} MiB)" if rss else ""))
+
+    def _build_vector_store(self, config: Config) -> ManagedVectorStore:
+        """Load the knowledge base, or preload docs_source when there is none."""
+        store_kwargs = dict(
+            ttl=config.store_ttl,
+            max_documents=config.store_max_documents,
+            max_bytes=config.store_max_bytes,
+            eviction=config.store_eviction,
+        )
+        # Start from the ingested knowledge base, if one was built
+        if config.index_dir and os.path.exists(os.path.join(os.path.expanduser(config.index_dir), MANIFEST_FILE)):
+            vector_store = ManagedVectorStore.load(config.index_dir, self.embeddings, **store_kwargs)
+        else:
+            vector_store = ManagedVectorStore(self.embeddings, **store_kwargs)
+
+        # Preload the local corpus, unless the knowledge base already holds it
+        if config.docs_source and not vector_store.stats()["documents"]:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=config.chunk_size,
+                chunk_overlap=config.chunk_overlap,
+            )
+            documents = splitter.split_documents(load_sources(
+                config.docs_source,
+                extractors=config.site_extractors,
+                cache_dir=config.http_cache_dir,
+                headers={"User-Agent": config.USER_AGENT},
+            ))
+            for doc in documents:
+                doc.metadata["request_id"] = CORPUS_REQUEST_ID
+            if documents:
+                vector_store.add_documents(documents)
+        return vector_store
+
+    def _build_cassette(self, config: Config) -> Optional[Cassette]:
+        """Open the record/replay cassette of LLM and search calls, if one is configured."""
+        if not config.replay_cassette:
+            return None
+        cassette = Cassette(config.replay_cassette, mode=config.replay_mode,
+                            latency_scale=config.replay_latency_scale)
+        print(f"{'Recording to' if cassette.recording else 'Replaying'} cassette {cassette.path}"
+              + ("" if cassette.recording else f" ({len(cassette)} calls)"))
+        return cassette
+
+    def _build_llm(self, config: Config) -> LLMInterface:
+        # Replayed outputs need no model
+        if self.cassette is not None and not self.cassette.recording:
+            return RecordingLLM(None, self.cassette)
+        llm = load_llm(config)
+        return RecordingLLM(llm, self.cassette) if self.cassette is not None else llm
+
+    def _build_model(self, config: Config) -> SearchAugmentedQAModel:
+        reranker = None
+        if config.reranker_model:
+            reranker = CrossEncoderReranker(
+                model_name=config.reranker_model,
+                top_n=config.rerank_top_n,
+                max_candidates=config.rerank_max_candidates,
+                time_budget=config.rerank_time_budget,
+            )
+
+        summary_cache = None
+        if config.summary_cache_path:
+            summary_cache = SummaryCache(
+                config.summary_cache_path,
+                model=config.model_name,
+                # Everything besides the page and question that a summary depends on
+                settings={
+                    "summary_prompt": prompts.SUMMARY_PREFIX + prompts.SUMMARY_SUFFIX,
+                    "prompt_source": config.prompt_source,
+                    "embeddings_model": config.embeddings_model,
+                    "extract_token_budget": config.extract_token_budget,
+                    "extract_relevance_floor": config.extract_relevance_floor,
+                },
+                max_entries=config.summary_cache_max_entries,
+                max_age=config.summary_cache_max_age,
+            )
+
+        compressor = None
+        if config.context_compression_ratio is not None:
+            compressor = ContextCompressor(self.embeddings, ratio=config.context_compression_ratio)
+
+        return SearchAugmentedQAModel(
+            llm=self.llm,
+            vector_store=self.vector_store,
+            prompt_source=config.prompt_source,
+            context_scope=config.context_scope,
+            extractor=PassageExtractor(
+                self.embeddings,
+                token_budget=config.extract_token_budget,
+                relevance_floor=config.extract_relevance_floor,
+            ),
+            planner=PipelinePlanner(latency_budget=self.latency_budget),
+            retrieval_scope=config.retrieval_scope,
+            reranker=reranker,
+            deduplicator=SearchResultDeduplicator(max_distance=config.dedup_max_distance),
+            request_timeout=config.request_timeout,
+            search_timeout=config.search_timeout,
+            summary_timeout=config.summary_timeout,
+            multi_query=config.multi_query_retrieval,
+            progressive=config.progressive_answer,
+            pipelined=config.pipelined_graph,
+            compressor=compressor,
+            # Cached summaries would skip LLM calls the cassette has to hold
+            summary_cache=summary_cache if self.cassette is None else None,
+            search=RecordingSearch(web_search, self.cassette) if self.cassette is not None else None,
+        )
+
+    def new_session(self) -> ConversationSession:
+        """Start a conversation whose follow-ups reuse the earlier turns' documents."""
+        return ConversationSession(
+            self.embeddings,
+            max_turns=self.config.conversation_turns,
+            coverage_threshold=self.config.followup_coverage_threshold,
+            min_documents=self.config.followup_min_documents,
+            vector_store=self.vector_store,
+        )
+
+    def ask(self,
+            question: str,
+            session: Optional[ConversationSession] = None,
+            latency_budget: Optional[float] = None) -> str:
+        """
+        Answer a question.
+
+        No provisional answer is generated, since only the final one is
+        returned.
+
+        Args:
+            question: The question to answer
+            session: The conversation the question belongs to, if any
+            latency_budget: Target latency of this question in seconds;
+                defaults to the engine's latency_budget
+
+        Returns:
+            The answer
+        """
+        answer = None
+        for phase in self.ask_progressive(question, session, latency_budget, provisional=False):
+            answer = phase["answer"]
+        return answer
+
+    def ask_progressive(self,
+                        question: str,
+                        session: Optional[ConversationSession] = None,
+                        latency_budget: Optional[float] = None,
+                        provisional: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a question in phases.
+
+        In progressive mode a provisional answer from the raw search results
+        is yielded as soon as it is ready, while the pipeline keeps running in
+        a background thread; the final answer is always yielded last.
+
+        Within a session, a follow-up is first rewritten against the earlier
+        turns; if their documents cover it, it is answered from them without
+        searching again.
+
+        Args:
+            question: The question to answer
+            session: The conversation the question belongs to, if any
+            latency_budget: Target latency of this question in seconds;
+                defaults to the engine's latency_budget
+            provisional: Whether to generate and yield a provisional answer
+                in progressive mode; False only yields the final answer
+
+        Returns:
+            Iterator of dictionaries with the "phase" ("provisional" or
+            "final"), the "answer" and the "seconds" since the request started
+        """
+        profile = MemoryProfile() if self.config.profile_memory else contextlib.nullcontext()
+        state: Dict[str, Any] = {}
+        summaries: List[Dict] = []
+        inputs: Dict[str, Any] = {"question": question, "started_at": time.monotonic()}
+        if latency_budget is not None:
+            inputs["latency_budget"] = latency_budget
+        if self.cassette is not None:
+            self.cassette.begin_request()
+        graph = self.model.graph
+        if session is not None:
+            # The previous turn may still be recorded in the background
+            session.wait()
+        if session is not None and session.turns:
+            inputs, graph = self._follow_up(inputs, session)
+        # The graph runs in its own thread, so a provisional answer can be
+        # yielded while one of its stages is still running
+        events: "queue.Queue" = queue.Queue()
+        provisional_update: Dict[str, Any] = {}
+        if graph is self.model.graph:
+            inputs["request_id"] = uuid.uuid4().hex
+        if provisional and self.model.progressive and graph is self.model.graph:
+            self.model.on_provisional(inputs["request_id"], lambda update: events.put(("provisional", update)))
+
+        def run() -> None:
+            try:
+                for values in self.model.stream(inputs, graph):
+                    events.put(("state", values))
+            except Exception as e:
+                events.put(("error", e))
+            finally:
+                events.put(("done", None))
+
+        with profile:
+            threading.Thread(target=run, name="request", daemon=True).start()
+            try:
+                while True:
+                    kind, value = events.get()
+                    if kind == "done":
+                        break
+                    if kind == "error":
+                        raise value
+                    if kind == "state":
+                        state = value
+                        # Summaries are released after retrieval, so keep them for the session
+                        if state.get("processed_results"):
+                            summaries = state["processed_results"]
+                    elif not provisional_update and not state.get("answer"):
+                        provisional_update = value
+                        yield {
+                            "phase": "provisional",
+                            "answer": value["provisional_answer"],
+                            "seconds": (value.get("phase_timings") or {}).get("provisional"),
+                        }
+            finally:
+                if "request_id" in inputs:
+                    self.model.on_provisional(inputs["request_id"], None)
+        if provisional_update.get("phase_timings"):
+            state = {**state, "phase_timings": {**provisional_update["phase_timings"],
+                                                **(state.get("phase_timings") or {})}}
+        if self.config.profile_memory:
+            print(f"Peak request memory: {profile.peak_mib:.1f} MiB")
+
+        with self._lock:
+            self.last_state = state
+        if session is not None:
+            # Embedding the turn's documents must not hold back the answer
+            session.add_turn_async(
+                question,
+                state["question"],
+                state["answer"],
+                request_id=state.get("request_id"),
+                context=state.get("context") or [],
+                summaries=summaries,
+                reference_document=state.get("reference_document"),
+            )
+        yield {
+            "phase": "final",
+            "answer": state["answer"],
+            "seconds": (state.get("phase_timings") or {}).get("final"),
+        }
+
+    def _follow_up(self, inputs: Dict[str, Any], session: ConversationSession) -> Tuple[Dict[str, Any], Any]:
+        """Rewrite a follow-up against the session and pick the graph that answers it."""
+        start = time.perf_counter()
+        question = self.model.rewrite_followup(inputs["question"], session.history())
+        if question != inputs["question"]:
+            session.stats["rewritten"] += 1
+        k = self.model.reranker.max_candidates if self.model.reranker is not None else self.model.RETRIEVAL_K
+        recalled, _ = session.recall(question, k)
+        inputs = {
+            **inputs,
+            "question": question,
+            "history_request_ids": session.request_ids(),
+            "timings": {"contextualize": time.perf_counter() - start},
+        }
+        if not recalled:
+            return inputs, self.model.graph
+
+        # The earlier turns cover the question: skip planning, search and summaries
+        session.stats["covered"] += 1
+        inputs.update({"context": recalled, "pipeline_path": FOLLOWUP})
+        if self.model.request_timeout is not None:
+            inputs["deadline"] = inputs["started_at"] + self.model.request_timeout
+        return inputs, self.model.followup_graph
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache hit rates, request latencies and the last answer's stages.
+
+        Returns:
+            Dictionary of "startup", "caches", "latency", "store",
+            "last_answer" and "replay" statistics
+        """
+        llm_stats = dict(self.llm.stats)
+        with self._lock:
+            last = self.last_state or {}
+
+        caches = {
+            "prefix_cache_hit_rate": llm_stats["prefix_hits"] / llm_stats["calls"] if llm_stats["calls"] else 0.0,
+            "prefill_tokens_saved": llm_stats["prefill_tokens_saved"],
+        }
+        if self.model.summary_cache is not None:
+            caches["summary_cache_hit_rate"] = self.model.summary_cache.hit_rate()
+        rerank_stats = last.get("rerank_stats") or {}
+        if rerank_stats.get("candidates"):
+            caches["rerank_cache_hit_rate"] = rerank_stats["cache_hits"] / rerank_stats["candidates"]
+
+        return {
+            "startup": self.startup,
+            "caches": caches,
+            "latency": self.model.latency.percentiles(),
+            "store": self.vector_store.stats(),
+            "last_answer": {
+                "timings": last.get("timings") or {},
+                "phase_timings": last.get("phase_timings") or {},
+                "pipeline_path": last.get("pipeline_path"),
+                "dedup_stats": last.get("dedup_stats") or {},
+                "extraction_stats": last.get("extraction_stats") or {},
+                "retrieval_stats": last.get("retrieval_stats") or {},
+                "compression_stats": last.get("compression_stats") or {},
+                "degraded": last.get("degraded") or {},
+            },
+            "replay": dict(self.cassette.stats) if self.cassette is not None else {},
+        }
+
+
+def load_llm(config: Config) -> LLMInterface:
+    """
+    Load the configured LLM: a client of the inference server, or the model in-process.
+
+    Args:
+        config: The configuration
+
+    Returns:
+        The LLM
+    """
+    # Share the model resident in an inference server instead of loading one
+    if config.llm_server_url:
+        return ServerLLM(
+            base_url=config.llm_server_url,
+            api=config.llm_server_api,
+            model=config.llm_server_model or config.model_name,
+            max_connections=config.llm_server_connections,
+        )
+
+    # Optional draft model for speculative decoding of the answer
+    assistant_model = None
+    if config.draft_model_name:
+        assistant_model = get_model(
+            model_id=config.draft_model_name,
+            task="text-generation",
+            model_kwargs=load_quantization(config),
+            artifact_dir=config.model_cache_dir,
+            torch_dtype=config.model_dtype,
+        ).pipeline.model
+
+    return HuggingFaceLLM(
+        get_model(
+            model_id=config.model_name,
+            task="text-generation",
+            pipeline_kwargs=dict(
+                max_new_tokens=512,
+                do_sample=True,
+                temperature=0.7,
+                top_p=0.9,
+            ),
+            model_kwargs=load_quantization(config),
+            artifact_dir=config.model_cache_dir,
+            torch_dtype=config.model_dtype,
+        ),
+        prefix_cache=config.prefix_cache,
+        assistant_model=assistant_model,
+        prompt_lookup_num_tokens=config.prompt_lookup_num_tokens,
+    )
+
+
+# Engines by configuration, so repeated ask() calls reuse the loaded models
+_ENGINES: Dict[Optional[str], Engine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(p_config: str = None) -> Engine:
+    """
+    Get the engine for a configuration, creating it on first use.
+
+    A latency budget is a per-question setting, see Engine.ask, so every
+    budget shares the engine of its configuration.
+
+    Args:
+        p_config: Path to the configuration file, or None for the default
+
+    Returns:
+        The shared Engine instance
+    """
+    with _ENGINES_LOCK:
+        if p_config not in _ENGINES:
+            _ENGINES[p_config] = Engine(p_config)
+        return _ENGINES[p_config]
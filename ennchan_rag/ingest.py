@@ -0,0 +1,333 @@
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ennchan_rag.config import load_config
+from ennchan_rag.core.model import CORPUS_REQUEST_ID
+from ennchan_rag.loaders import MultiWebLoader, TextLoaderAdapter
+from ennchan_rag.stores import ManagedVectorStore
+from ennchan_rag.utils.embeddings import build_embeddings, embedding_options
+from ennchan_rag.utils.validators import is_url
+
+MANIFEST_FILE = "manifest.json"
+
+# Embedding model of an ingest worker process
+_WORKER_EMBEDDINGS = None
+
+
+def _init_worker(options: Dict, threads: int) -> None:
+    """Load the embedding model once per worker process."""
+    global _WORKER_EMBEDDINGS
+    _WORKER_EMBEDDINGS = build_embeddings(**{**options, "threads": threads})
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    return _WORKER_EMBEDDINGS.embed_documents(texts)
+
+
+def file_sha256(path: Path) -> str:
+    """Hash a file in blocks without reading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Ingestor:
+    """
+    Builds a persistent vector index from local files and web pages.
+
+    Sources are streamed, split into chunks and embedded in large batches by
+    a pool of worker processes, each holding its own copy of the embedding
+    model. A manifest records the mtime and hash of every ingested source, so
+    running the ingest again only re-embeds what changed, and the index is
+    checkpointed as it goes so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self,
+                 index_dir: str,
+                 embedding_options: Dict,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200,
+                 workers: int = 2,
+                 batch_size: int = 256,
+                 checkpoint_seconds: float = 60.0,
+                 loader_kwargs: Optional[Dict] = None):
+        """
+        Initialize the ingestor.
+
+        Args:
+            index_dir: Directory of the persistent index and its manifest
+            embedding_options: Keyword arguments for build_embeddings,
+                including the model_name
+            chunk_size: Characters per chunk
+            chunk_overlap: Characters shared by consecutive chunks
+            workers: Number of embedding processes; 0 embeds in this process
+            batch_size: Number of chunks handed to an embedding worker at a time
+            checkpoint_seconds: Seconds between saves of the index
+            loader_kwargs: Further MultiWebLoader options, e.g. headers
+        """
+        self.index_dir = os.path.expanduser(index_dir)
+        self.embedding_options = embedding_options
+        self.embeddings_model = embedding_options["model_name"]
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint_seconds = checkpoint_seconds
+        self.loader_kwargs = loader_kwargs or {}
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(os.path.join(self.index_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {"embeddings_model": self.embeddings_model, "sources": {}}
+        # Vectors from another model are not comparable, so start over
+        if manifest.get("embeddings_model") != self.embeddings_model:
+            print(f"Embedding model changed from {manifest.get('embeddings_model')}, rebuilding the index")
+            return {"embeddings_model": self.embeddings_model, "sources": {}, "rebuild": True}
+        return manifest
+
+    def _save_manifest(self) -> None:
+        path = os.path.join(self.index_dir, MANIFEST_FILE)
+        manifest = {key: value for key, value in self.manifest.items() if key != "rebuild"}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def ingest(self, sources: Sequence[str]) -> Dict[str, float]:
+        """
+        Ingest sources into the index.
+
+        Args:
+            sources: URLs, files and directories of text files
+
+        Returns:
+            Statistics: sources ingested and skipped, chunks, sources and
+            chunks per second and the index size in memory and on disk
+        """
+        start = time.perf_counter()
+        # Worker processes embed the chunks and the store only embeds queries,
+        # so the model is only loaded here when embedding in this process
+        embedding = self._local_embeddings() if self.workers <= 0 else None
+        if self.manifest.pop("rebuild", False):
+            store = ManagedVectorStore(embedding)
+        else:
+            store = ManagedVectorStore.load(self.index_dir, embedding)
+        stats = {"sources": 0, "skipped": 0, "removed": 0, "chunks": 0}
+
+        # Sources being embedded: chunks not yet in the store, whether all
+        # chunks were read and the manifest entry recorded once they are in
+        self._pending: Dict[str, Dict] = {}
+        self._stats = stats
+        last_checkpoint = time.perf_counter()
+
+        with self._executor() as executor:
+            in_flight = {}
+            for batch in self._batches(self._chunks(sources, store)):
+                # Bound the queued batches so chunks stream through memory
+                while len(in_flight) >= max(1, self.workers) * 2:
+                    self._drain(in_flight, store, wait_all=False)
+                texts = [doc.page_content for doc in batch]
+                future = executor.submit(_embed_batch, texts) if executor else _completed(embedding.embed_documents(texts))
+                in_flight[future] = batch
+
+                if time.perf_counter() - last_checkpoint > self.checkpoint_seconds:
+                    self._checkpoint(store)
+                    last_checkpoint = time.perf_counter()
+            self._drain(in_flight, store, wait_all=True)
+
+        self._checkpoint(store)
+        seconds = time.perf_counter() - start
+        return {
+            **stats,
+            "seconds": seconds,
+            "sources_per_second": stats["sources"] / seconds if seconds else 0.0,
+            "chunks_per_second": stats["chunks"] / seconds if seconds else 0.0,
+            "documents": store.stats()["documents"],
+            "index_bytes": store.stats()["bytes"],
+            "disk_bytes": sum(f.stat().st_size for f in Path(self.index_dir).rglob("*") if f.is_file()),
+        }
+
+    def _local_embeddings(self):
+        return build_embeddings(**self.embedding_options)
+
+    def _executor(self):
+        if self.workers <= 0:
+            return _NullExecutor()
+        # Spawn, as forked workers would inherit torch's thread pools
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.embedding_options,
+                      self.embedding_options.get("threads") or max(1, (os.cpu_count() or 1) // self.workers)),
+        )
+
+    def _drain(self, in_flight: Dict, store: ManagedVectorStore, wait_all: bool) -> None:
+        """Add embedded batches to the store as they finish."""
+        done, _ = concurrent.futures.wait(
+            in_flight,
+            return_when=concurrent.futures.ALL_COMPLETED if wait_all else concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            batch = in_flight.pop(future)
+            store.add_vectors(
+                future.result(),
+                [doc.page_content for doc in batch],
+                metadatas=[doc.metadata for doc in batch])
+            self._stats["chunks"] += len(batch)
+            for doc in batch:
+                self._pending[doc.metadata["source"]]["left"] -= 1
+            for source in {doc.metadata["source"] for doc in batch}:
+                self._settle(source, store)
+
+    def _settle(self, source: str, store: ManagedVectorStore) -> None:
+        """Swap a source's old chunks for its new ones once all of them are in the store."""
+        state = self._pending[source]
+        if state["read"] and state["left"] == 0:
+            del self._pending[source]
+            if state["stale"]:
+                store.delete(state["stale"])
+            self.manifest["sources"][source] = state["entry"]
+            self._stats["sources"] += 1
+
+    def _checkpoint(self, store: ManagedVectorStore) -> None:
+        # The index is written before the manifest, so the manifest never
+        # lists a source whose chunks are missing from the saved index
+        store.save(self.index_dir)
+        self._save_manifest()
+
+    def _batches(self, chunks: Iterator[Document]) -> Iterator[List[Document]]:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _chunks(self, sources: Sequence[str], store: ManagedVectorStore) -> Iterator[Document]:
+        """Stream the chunks of every new or changed source."""
+        urls = [source for source in sources if is_url(source)]
+        paths = [source for source in sources if not is_url(source)]
+
+        for path in paths:
+            loader = TextLoaderAdapter(path)
+            files = loader.files()
+            seen = {str(file) for file in files}
+            root = Path(os.path.expanduser(path))
+            for file in files:
+                entry = self._file_entry(file)
+                if entry is None:
+                    self._stats["skipped"] += 1
+                    continue
+                yield from self._source_chunks(str(file), entry, TextLoaderAdapter(str(file)).lazy_load(), store)
+
+            # Drop files that were removed from an ingested directory
+            if root.is_dir():
+                for source in list(self.manifest["sources"]):
+                    if not is_url(source) and source not in seen and root in Path(source).parents:
+                        self._remove_source(source, store)
+                        self._stats["removed"] += 1
+
+        if urls:
+            for doc in MultiWebLoader(urls, **self.loader_kwargs).lazy_load():
+                digest = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+                known = self.manifest["sources"].get(doc.metadata["source"])
+                if known and known["sha256"] == digest:
+                    self._stats["skipped"] += 1
+                    continue
+                entry = {"sha256": digest, "ingested": time.time()}
+                yield from self._source_chunks(doc.metadata["source"], entry, iter([doc]), store)
+
+    def _file_entry(self, file: Path) -> Optional[Dict]:
+        """Return the manifest entry for a file, or None if it is unchanged."""
+        mtime = file.stat().st_mtime
+        known = self.manifest["sources"].get(str(file))
+        if known and known["mtime"] == mtime:
+            return None
+        digest = file_sha256(file)
+        if known and known["sha256"] == digest:
+            # Touched but not modified, so only the mtime needs updating
+            known["mtime"] = mtime
+            return None
+        return {"mtime": mtime, "sha256": digest, "ingested": time.time()}
+
+    def _source_chunks(self, source: str, entry: Dict, documents: Iterator[Document],
+                       store: ManagedVectorStore) -> Iterator[Document]:
+        """Replace a source's chunks in the index with chunks of its new content."""
+        # The old chunks stay until the new ones have landed, see _settle, so
+        # a checkpoint in between never saves the source half-replaced
+        stale = [doc.id for doc in store.get_all_documents(filter={"source": source})]
+        state = {"left": 0, "read": False, "entry": entry, "stale": stale}
+        self._pending[source] = state
+        for doc in documents:
+            for chunk in self.splitter.split_documents([doc]):
+                chunk.metadata["source"] = source
+                chunk.metadata["request_id"] = CORPUS_REQUEST_ID
+                state["left"] += 1
+                yield chunk
+        state["read"] = True
+        self._settle(source, store)
+
+    def _remove_source(self, source: str, store: ManagedVectorStore) -> None:
+        stale = store.get_all_documents(filter={"source": source})
+        if stale:
+            store.delete([doc.id for doc in stale])
+        self.manifest["sources"].pop(source, None)
+
+
+class _NullExecutor:
+    """Stands in for a process pool when embedding in this process."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _completed(result) -> concurrent.futures.Future:
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
+
+
+def ingest(sources: Sequence[str], p_config: str = None, workers: Optional[int] = None) -> Dict[str, float]:
+    """
+    Ingest documents into the persistent index configured in index_dir.
+
+    Args:
+        sources: URLs, files and directories of text files
+        p_config: Path to the configuration file
+        workers: Number of embedding processes; overrides ingest_workers
+
+    Returns:
+        Ingest statistics
+    """
+    config = load_config(p_config)
+    ingestor = Ingestor(
+        index_dir=config.index_dir,
+        embedding_options=embedding_options(config),
+        chunk_size=config.chunk_size,
+        chunk_overlap=config.chunk_overlap,
+        workers=config.ingest_workers if workers is None else workers,
+        batch_size=config.embedding_batch_size,
+        loader_kwargs={
+            "extractors": config.site_extractors,
+            "cache_dir": config.http_cache_dir,
+            "headers": {"User-Agent": config.USER_AGENT},
+        },
+    )
+    return ingestor.ingest(sources)
@@ -0,0 +1,4 @@
+"""LLM backends implementing the LLMInterface."""
+
+from ennchan_rag.llms.huggingface import HuggingFaceLLM
+from ennchan_rag.llms.server import ServerLLM
@@ -0,0 +1,271 @@
+import copy
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from langchain_core.prompt_values import PromptValue
+from langchain_huggingface import HuggingFacePipeline
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from ennchan_rag.core.generation import GenerationConfig
+from ennchan_rag.core.interfaces import LLMInterface
+
+
+class _PrefillTimer(StoppingCriteria):
+    """Stopping criteria that records when the first new token is produced."""
+
+    def __init__(self):
+        self.first_token_at: Optional[float] = None
+
+    def __call__(self, input_ids, scores, **kwargs) -> torch.BoolTensor:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+
+class _StopOnText(StoppingCriteria):
+    """Stopping criteria that ends generation on stop strings or choice labels."""
+
+    def __init__(self, tokenizer, prompt_length: int, generation: GenerationConfig):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.generation = generation
+
+    def __call__(self, input_ids, scores, **kwargs) -> torch.BoolTensor:
+        done = [
+            self.generation.find_end(
+                self.tokenizer.decode(row[self.prompt_length:], skip_special_tokens=True)
+            ) is not None
+            for row in input_ids
+        ]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class HuggingFaceLLM(LLMInterface):
+    """
+    LLM adapter around a LangChain HuggingFacePipeline.
+
+    Generation runs directly on the underlying transformers model so that the
+    key/value cache of a registered static prompt prefix is computed once and
+    reused by every call whose prompt starts with that prefix.
+
+    Calls whose GenerationConfig is speculative can use assisted generation:
+    a small draft model, or n-grams looked up in the prompt itself (which
+    holds the retrieved context), proposes several tokens that the main model
+    verifies in one forward pass. Under greedy decoding the output is the same
+    as without speculation.
+    """
+
+    def __init__(self,
+                 pipeline: HuggingFacePipeline,
+                 prefix_cache: bool = True,
+                 max_cached_prefixes: int = 8,
+                 assistant_model: Any = None,
+                 prompt_lookup_num_tokens: Optional[int] = None):
+        """
+        Initialize the HuggingFace LLM adapter.
+
+        Args:
+            pipeline: The HuggingFacePipeline to generate with
+            prefix_cache: Whether to reuse key/value states of registered prefixes
+            max_cached_prefixes: Maximum number of prefix caches kept in memory
+            assistant_model: Draft model sharing the main model's tokenizer,
+                used for speculative calls
+            prompt_lookup_num_tokens: Number of tokens drafted from matching
+                n-grams of the prompt for speculative calls, used when there
+                is no assistant_model
+        """
+        self.pipeline = pipeline
+        self.prefix_cache = prefix_cache
+        self.max_cached_prefixes = max_cached_prefixes
+        self.assistant_model = assistant_model
+        self.prompt_lookup_num_tokens = prompt_lookup_num_tokens
+        self._prefixes: List[str] = []
+        self._prefix_states: Dict[str, Tuple[torch.Tensor, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "prefix_hits": 0,
+            "prefill_tokens": 0,
+            "prefill_tokens_saved": 0,
+            "prefill_seconds": 0.0,
+            "generate_seconds": 0.0,
+            "generated_tokens": 0,
+            "speculative_calls": 0,
+            "speculative_tokens": 0,
+            "speculative_seconds": 0.0,
+        }
+
+    @property
+    def speculative(self) -> bool:
+        """Whether a speculative decoding method is configured."""
+        return self.assistant_model is not None or bool(self.prompt_lookup_num_tokens)
+
+    def compare_speculative(self, prompt: str, max_new_tokens: int = 128) -> Dict[str, Any]:
+        """
+        Generate greedily with and without speculative decoding and compare.
+
+        Args:
+            prompt: The prompt to generate from
+            max_new_tokens: Number of tokens to generate
+
+        Returns:
+            Tokens per second of both runs, the speedup, and whether the
+            outputs are identical
+        """
+        results = {}
+        for speculative in (False, True):
+            generation = GenerationConfig(max_new_tokens=max_new_tokens, speculative=speculative)
+            start = time.perf_counter()
+            text = self.invoke(prompt, generation)
+            seconds = time.perf_counter() - start
+            tokens = len(self.tokenizer(text, add_special_tokens=False).input_ids)
+            results["speculative" if speculative else "plain"] = (text, tokens / seconds if seconds else 0.0)
+        return {
+            "plain_tokens_per_second": results["plain"][1],
+            "speculative_tokens_per_second": results["speculative"][1],
+            "speedup": results["speculative"][1] / results["plain"][1] if results["plain"][1] else 0.0,
+            "identical": results["plain"][0] == results["speculative"][0],
+        }
+
+    @property
+    def model(self):
+        """The underlying transformers model."""
+        return self.pipeline.pipeline.model
+
+    @property
+    def tokenizer(self):
+        """The underlying transformers tokenizer."""
+        return self.pipeline.pipeline.tokenizer
+
+    def register_prefix(self, prefix: str) -> None:
+        """
+        Register a static prompt prefix for key/value caching.
+
+        The cache itself is built lazily the first time a prompt starting
+        with the prefix is invoked.
+
+        Args:
+            prefix: The static text that prompts start with
+        """
+        if prefix and prefix not in self._prefixes:
+            self._prefixes.append(prefix)
+            # Longest prefix first so the most specific match wins
+            self._prefixes.sort(key=len, reverse=True)
+
+    def invoke(self, messages, generation: Optional[GenerationConfig] = None) -> str:
+        """
+        Generate a completion for the given prompt.
+
+        Args:
+            messages: A prompt string or LangChain PromptValue
+            generation: Per-call generation settings, or None to use the
+                pipeline's default pipeline_kwargs
+
+        Returns:
+            The generated text, without the prompt
+        """
+        prompt = messages.to_string() if isinstance(messages, PromptValue) else str(messages)
+        # Assisted generation does not verify drafts correctly against a
+        # pre-filled cache, so speculative calls prefill the whole prompt
+        speculative = generation is not None and generation.speculative and self.speculative
+        prefix = self._match_prefix(prompt) if self.prefix_cache and not speculative else None
+
+        if prefix is not None:
+            prefix_ids, past_key_values = self._get_prefix_state(prefix)
+            suffix_ids = self.tokenizer(
+                prompt[len(prefix):],
+                add_special_tokens=False,
+                return_tensors="pt",
+            ).input_ids
+            # The last prefix token is never cached, so there is always input to prefill
+            input_ids = torch.cat([prefix_ids, suffix_ids], dim=-1)
+            cached_tokens = prefix_ids.shape[-1] - 1
+        else:
+            input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids
+            past_key_values = None
+            cached_tokens = 0
+
+        return self._generate(input_ids, past_key_values, cached_tokens, generation)
+
+    def _match_prefix(self, prompt: str) -> Optional[str]:
+        """Return the longest registered prefix the prompt starts with."""
+        for prefix in self._prefixes:
+            if prompt.startswith(prefix):
+                return prefix
+        return None
+
+    def _get_prefix_state(self, prefix: str) -> Tuple[torch.Tensor, Any]:
+        """Return the token ids and a private copy of the cache for a prefix."""
+        with self._lock:
+            if prefix not in self._prefix_states:
+                if len(self._prefix_states) >= self.max_cached_prefixes:
+                    # Drop the oldest cache
+                    del self._prefix_states[next(iter(self._prefix_states))]
+
+                prefix_ids = self.tokenizer(prefix, return_tensors="pt").input_ids
+                with torch.no_grad():
+                    outputs = self.model(
+                        input_ids=prefix_ids[:, :-1].to(self.model.device),
+                        use_cache=True,
+                    )
+                self._prefix_states[prefix] = (prefix_ids, outputs.past_key_values)
+
+            prefix_ids, past_key_values = self._prefix_states[prefix]
+
+        # generate() extends the cache in place, so every call gets its own copy
+        return prefix_ids, copy.deepcopy(past_key_values)
+
+    def _generate(self,
+                  input_ids: torch.Tensor,
+                  past_key_values: Any,
+                  cached_tokens: int,
+                  generation: Optional[GenerationConfig]) -> str:
+        """Run generation and record prefill statistics."""
+        if generation is not None:
+            generate_kwargs = generation.to_generate_kwargs()
+        else:
+            generate_kwargs = dict(self.pipeline.pipeline_kwargs or {})
+        if self.tokenizer.pad_token_id is None:
+            generate_kwargs.setdefault("pad_token_id", self.tokenizer.eos_token_id)
+        speculative = generation is not None and generation.speculative and self.speculative
+        if speculative:
+            if self.assistant_model is not None:
+                generate_kwargs["assistant_model"] = self.assistant_model
+            else:
+                generate_kwargs["prompt_lookup_num_tokens"] = self.prompt_lookup_num_tokens
+
+        timer = _PrefillTimer()
+        criteria = StoppingCriteriaList([timer])
+        if generation is not None and (generation.stop or generation.choices):
+            criteria.append(_StopOnText(self.tokenizer, input_ids.shape[-1], generation))
+
+        input_ids = input_ids.to(self.model.device)
+        start = time.perf_counter()
+        with torch.no_grad():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                stopping_criteria=criteria,
+                **generate_kwargs,
+            )
+        end = time.perf_counter()
+        generated_tokens = output.shape[-1] - input_ids.shape[-1]
+
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prefix_hits"] += 1 if cached_tokens else 0
+            self.stats["prefill_tokens"] += input_ids.shape[-1] - cached_tokens
+            self.stats["prefill_tokens_saved"] += cached_tokens
+            self.stats["prefill_seconds"] += (timer.first_token_at or end) - start
+            self.stats["generate_seconds"] += end - start
+            self.stats["generated_tokens"] += generated_tokens
+            if speculative:
+                self.stats["speculative_calls"] += 1
+                self.stats["speculative_tokens"] += generated_tokens
+                self.stats["speculative_seconds"] += end - start
+
+        text = self.tokenizer.decode(output[0, input_ids.shape[-1]:], skip_special_tokens=True)
+        return generation.truncate(text) if generation is not None else text
@@ -0,0 +1,271 @@
+import concurrent.futures
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import requests
+from langchain_core.prompt_values import PromptValue
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ennchan_rag.core.generation import GenerationConfig
+from ennchan_rag.core.interfaces import LLMInterface
+
+SERVER_APIS = ("openai", "llamacpp")
+
+
+class ServerLLM(LLMInterface):
+    """
+    LLM client for a local inference server.
+
+    Talks to an OpenAI-compatible completions endpoint (vLLM, llama.cpp's
+    server, text-generation-inference, ...) or to llama.cpp's native
+    /completion endpoint over a pooled keep-alive session, so that many
+    processes can share one resident model. Calls are safe to make from
+    several threads at once; the server batches concurrent requests.
+
+    Calls with choices or a max_time are streamed and stop reading as soon as
+    the answer is complete or time is up, which closes the request and lets
+    the server stop generating.
+    """
+
+    def __init__(self,
+                 base_url: str = "http://127.0.0.1:8080",
+                 api: str = "openai",
+                 model: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 max_connections: int = 8,
+                 timeout: float = 300.0,
+                 default_generation: Optional[GenerationConfig] = None):
+        """
+        Initialize the server LLM client.
+
+        Args:
+            base_url: Root URL of the server, without the /v1 path
+            api: "openai" for /v1/completions or "llamacpp" for /completion
+            model: Model name sent to OpenAI-compatible servers
+            api_key: Bearer token, if the server requires one
+            max_connections: Size of the connection pool, and of the thread
+                pool used by batch()
+            timeout: Seconds to wait for the server to respond
+            default_generation: Settings used by calls without their own
+        """
+        if api not in SERVER_APIS:
+            raise ValueError(f"Unknown server API {api!r}, expected one of {SERVER_APIS}")
+        self.base_url = base_url.rstrip("/")
+        self.api = api
+        self.model = model
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.default_generation = default_generation or GenerationConfig(
+            max_new_tokens=512, do_sample=True, temperature=0.7, top_p=0.9)
+        self.session = self._build_session(api_key)
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "streamed_calls": 0,
+            "prefix_hits": 0,
+            "prefill_tokens": 0,
+            "prefill_tokens_saved": 0,
+            "generate_seconds": 0.0,
+            "generated_tokens": 0,
+        }
+
+    @property
+    def speculative(self) -> bool:
+        """Speculative decoding, if any, is configured on the server."""
+        return False
+
+    def _build_session(self, api_key: Optional[str]) -> requests.Session:
+        """Create a keep-alive session with one pooled connection per concurrent call."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.max_connections,
+            # Completions are not idempotent, so only failed connects are retried
+            max_retries=Retry(total=3, connect=3, read=0, backoff_factor=0.5),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if api_key:
+            session.headers["Authorization"] = f"Bearer {api_key}"
+        return session
+
+    def invoke(self, messages, generation: Optional[GenerationConfig] = None) -> str:
+        """
+        Generate a completion for the given prompt.
+
+        Args:
+            messages: A prompt string or LangChain PromptValue
+            generation: Per-call generation settings, or None for default_generation
+
+        Returns:
+            The generated text, without the prompt
+        """
+        generation = generation or self.default_generation
+        if generation.choices or generation.max_time is not None:
+            text = ""
+            for chunk in self.stream(messages, generation):
+                text += chunk
+                if generation.find_end(text) is not None:
+                    break
+            return generation.truncate(text)
+
+        prompt = self._prompt(messages)
+        start = time.perf_counter()
+        response = self.session.post(
+            self._url(), json=self._payload(prompt, generation, stream=False), timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        self._record(body, time.perf_counter() - start)
+        return generation.truncate(self._text(body))
+
+    def stream(self, messages, generation: Optional[GenerationConfig] = None) -> Iterator[str]:
+        """
+        Generate a completion and yield it as it is produced.
+
+        Stops after generation.max_time seconds, if set. Closing the iterator
+        early closes the request.
+
+        Args:
+            messages: A prompt string or LangChain PromptValue
+            generation: Per-call generation settings, or None for default_generation
+
+        Returns:
+            Iterator of text chunks
+        """
+        generation = generation or self.default_generation
+        prompt = self._prompt(messages)
+        start = time.perf_counter()
+        chunks = 0
+        final: Dict[str, Any] = {}
+        with self.session.post(self._url(), json=self._payload(prompt, generation, stream=True),
+                               timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    text = self._text(event)
+                    if text:
+                        chunks += 1
+                        yield text
+                    # The last event carries the usage counts, where the server reports them
+                    if event.get("usage") or event.get("stop"):
+                        final = event
+                    if generation.max_time is not None and time.perf_counter() - start >= generation.max_time:
+                        break
+            finally:
+                self._record(final, time.perf_counter() - start, streamed=True, chunks=chunks)
+
+    def batch(self, prompts: Sequence, generation: Optional[GenerationConfig] = None) -> List[str]:
+        """
+        Generate completions for many prompts at once.
+
+        OpenAI-compatible servers get a single request with a list of prompts;
+        llama.cpp gets concurrent requests over the pool, which its server
+        batches into shared forward passes.
+
+        Args:
+            prompts: Prompt strings or LangChain PromptValues
+            generation: Per-call generation settings, or None for default_generation
+
+        Returns:
+            The generated texts, in the order of the prompts
+        """
+        generation = generation or self.default_generation
+        if not prompts:
+            return []
+        if self.api == "openai" and not generation.choices and generation.max_time is None:
+            start = time.perf_counter()
+            response = self.session.post(
+                self._url(),
+                json=self._payload([self._prompt(prompt) for prompt in prompts], generation, stream=False),
+                timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+            self._record(body, time.perf_counter() - start, calls=len(prompts))
+            texts = [""] * len(prompts)
+            for choice in body.get("choices", []):
+                texts[choice.get("index", 0)] = choice.get("text", "")
+            return [generation.truncate(text) for text in texts]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            return list(executor.map(lambda prompt: self.invoke(prompt, generation), prompts))
+
+    @staticmethod
+    def _prompt(messages) -> str:
+        return messages.to_string() if isinstance(messages, PromptValue) else str(messages)
+
+    def _url(self) -> str:
+        return f"{self.base_url}/v1/completions" if self.api == "openai" else f"{self.base_url}/completion"
+
+    def _payload(self, prompt, generation: GenerationConfig, stream: bool) -> Dict[str, Any]:
+        """Translate generation settings into the server's request body."""
+        temperature = (generation.temperature if generation.temperature is not None else 1.0) \
+            if generation.do_sample else 0.0
+        if self.api == "openai":
+            payload: Dict[str, Any] = {
+                "prompt": prompt,
+                "max_tokens": generation.max_new_tokens,
+                "temperature": temperature,
+                "stream": stream,
+            }
+            if self.model:
+                payload["model"] = self.model
+            if stream:
+                payload["stream_options"] = {"include_usage": True}
+        else:
+            payload = {
+                "prompt": prompt,
+                "n_predict": generation.max_new_tokens,
+                "temperature": temperature,
+                "stream": stream,
+                # Reuse the server's KV cache for the prompt prefix shared with the last request
+                "cache_prompt": True,
+            }
+            if generation.max_time is not None:
+                payload["t_max_predict_ms"] = int(generation.max_time * 1000)
+        if generation.do_sample and generation.top_p is not None:
+            payload["top_p"] = generation.top_p
+        if generation.stop:
+            payload["stop"] = list(generation.stop)
+        return payload
+
+    def _text(self, body: Dict[str, Any]) -> str:
+        """Extract the generated text from a response body or stream event."""
+        if self.api == "openai":
+            choices = body.get("choices") or []
+            return choices[0].get("text", "") if choices else ""
+        return body.get("content", "")
+
+    def _record(self,
+                body: Dict[str, Any],
+                seconds: float,
+                streamed: bool = False,
+                chunks: int = 0,
+                calls: int = 1) -> None:
+        """Record token counts reported by the server."""
+        if self.api == "openai":
+            usage = body.get("usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+            generated = usage.get("completion_tokens", chunks)
+        else:
+            cached = body.get("tokens_cached", 0)
+            prompt_tokens = body.get("tokens_evaluated", 0)
+            generated = body.get("tokens_predicted", chunks)
+
+        with self._lock:
+            self.stats["calls"] += calls
+            self.stats["streamed_calls"] += 1 if streamed else 0
+            self.stats["prefix_hits"] += 1 if cached else 0
+            self.stats["prefill_tokens"] += prompt_tokens - cached
+            self.stats["prefill_tokens_saved"] += cached
+            self.stats["generate_seconds"] += seconds
+            self.stats["generated_tokens"] += generated
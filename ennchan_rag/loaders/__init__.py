@@ -1,5 +1,7 @@
 """Document loaders for various sources."""
 
-from ennchan_rag.loaders.web import WebLoaderAdapter
+from ennchan_rag.loaders.web import WebLoaderAdapter, MultiWebLoader
 from ennchan_rag.loaders.text import TextLoaderAdapter
+from ennchan_rag.loaders.http_cache import HTTPCache
+from ennchan_rag.loaders.sources import load_sources
 # from ennchan_rag.loaders.string import StringLoaderAdapter
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass
+class CachedResponse:
+    """A response body stored in the HTTP cache along with its validators."""
+    url: str
+    body: bytes
+    encoding: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that turn a GET for this URL into a conditional request."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """
+    On-disk cache of HTTP responses for conditional GETs.
+
+    Each URL is stored as a body file plus a small JSON file with its ETag and
+    Last-Modified validators, both named after the hash of the URL.
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Initialize the HTTP cache.
+
+        Args:
+            cache_dir: Directory the responses are stored in
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """
+        Look up the cached response for a URL.
+
+        Args:
+            url: The requested URL
+
+        Returns:
+            The cached response, or None if the URL is not cached
+        """
+        path = self._path(url)
+        try:
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(path + ".body", "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(url=url, body=body, **meta)
+
+    def put(self, response: CachedResponse) -> None:
+        """
+        Store a response in the cache.
+
+        Args:
+            response: The response to store
+        """
+        path = self._path(response.url)
+        meta = {
+            "encoding": response.encoding,
+            "etag": response.etag,
+            "last_modified": response.last_modified,
+        }
+        with self._lock:
+            # Both files are written whole before they replace the old ones, and
+            # the old validators go first, so a crash in between leaves at worst
+            # an uncached URL, never a truncated body or another body's validators
+            with open(path + ".body.tmp", "wb") as f:
+                f.write(response.body)
+            with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            try:
+                os.remove(path + ".json")
+            except FileNotFoundError:
+                pass
+            os.replace(path + ".body.tmp", path + ".body")
+            os.replace(path + ".json.tmp", path + ".json")
@@ -0,0 +1,51 @@
+from typing import Any, Dict, Iterator, Optional, Sequence, Union
+
+from langchain_core.documents import Document
+
+from ennchan_rag.loaders.text import TextLoaderAdapter
+from ennchan_rag.loaders.web import MultiWebLoader
+from ennchan_rag.utils.validators import is_url, is_local_path
+
+
+def load_sources(sources: Union[str, Sequence[str]],
+                 extractors: Optional[Dict[str, Dict[str, Any]]] = None,
+                 cache_dir: Optional[str] = None,
+                 max_workers: int = 8,
+                 headers: Optional[Dict[str, str]] = None) -> Iterator[Document]:
+    """
+    Load documents from a mix of URLs and local files or directories.
+
+    All URLs are fetched concurrently by a single MultiWebLoader, while local
+    paths are streamed by TextLoaderAdapter. Sources that are neither are
+    reported and skipped.
+
+    Args:
+        sources: A URL or path, or a list of them
+        extractors: Per-site content extractors for web pages
+        cache_dir: Directory of the HTTP cache, or None to disable caching
+        max_workers: Number of pages fetched concurrently
+        headers: Extra request headers for web pages, e.g. a User-Agent
+
+    Returns:
+        Iterator of loaded Document objects
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+
+    urls = []
+    for source in sources:
+        if is_url(source):
+            urls.append(source)
+        elif is_local_path(source):
+            yield from TextLoaderAdapter(source).lazy_load()
+        else:
+            print(f"Skipping unknown document source: {source}")
+
+    if urls:
+        yield from MultiWebLoader(
+            urls,
+            extractors=extractors,
+            cache_dir=cache_dir,
+            max_workers=max_workers,
+            headers=headers,
+        ).lazy_load()
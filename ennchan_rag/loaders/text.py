@@ -1,5 +1,9 @@
-from langchain_community.document_loaders import TextLoader
-from typing import Optional
+import codecs
+import os
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from langchain_core.documents import Document
 
 from ennchan_rag.core.interfaces import DocLoader
 
@@ -7,37 +11,118 @@ from ennchan_rag.core.interfaces import DocLoader
 class TextLoaderAdapter(DocLoader):
     """
     Adapter for loading documents from text files.
-    
-    This class wraps the LangChain TextLoader to provide a consistent
-    interface for loading text content within the RAG system.
+
+    This class loads a text file, or every matching file under a directory,
+    as a stream: large files are read block by block and yielded as several
+    documents instead of being read into memory at once.
     """
-    
-    def __init__(self, 
+    # Bytes from the beginning of a file its encoding is detected from
+    DETECT_BYTES = 65536
+
+    def __init__(self,
         file_path: str,
-        encoding: Optional[str] = None, 
-        autodetect_encoding: bool = True):
+        encoding: Optional[str] = None,
+        autodetect_encoding: bool = True,
+        block_size: int = 1_000_000,
+        suffixes: Sequence[str] = (".txt", ".md", ".rst")):
         """
         Initialize the text loader adapter.
-        
+
         Args:
-            file_path: Path to the text file
-            encoding: Specific encoding to use, or None to use default
-            autodetect_encoding: Whether to attempt to autodetect the file encoding
+            file_path: Path to a text file or a directory of text files
+            encoding: Specific encoding to use, or None to use UTF-8 or the
+                detected encoding
+            autodetect_encoding: Whether to detect the encoding of each file
+                from its beginning when none is given, and replace the bytes
+                further on that still do not decode instead of failing
+            block_size: Number of characters read per document from large files
+            suffixes: File suffixes loaded when file_path is a directory
         """
         self.path = file_path
         self.encoding = encoding
         self.autodetect_encoding = autodetect_encoding
+        self.block_size = block_size
+        self.suffixes = tuple(suffixes)
+
+    def files(self) -> List[Path]:
+        """
+        List the files this loader reads.
+
+        Returns:
+            The file itself, or the matching files under the directory in sorted order
+        """
+        path = Path(os.path.expanduser(self.path))
+        if path.is_dir():
+            return sorted(
+                p for p in path.rglob("*")
+                if p.is_file() and p.suffix.lower() in self.suffixes
+            )
+        return [path]
 
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        Stream documents from the text files.
+
+        Each block ends at the last line break before block_size characters,
+        so lines are never split across documents.
+
+        Returns:
+            Iterator of Document objects
+        """
+        for file in self.files():
+            yield from self._read_blocks(file)
 
     def load(self):
         """
-        Load documents from a text file.
-        
+        Load documents from the text files.
+
         Returns:
             List of Document objects containing the text file content
         """
-        loader = TextLoader(self.path, 
-                          encoding=self.encoding, 
-                          autodetect_encoding=self.autodetect_encoding)
+        return list(self.lazy_load())
+
+    def _read_blocks(self, file: Path) -> Iterator[Document]:
+        """Read a file in blocks of about block_size characters."""
+        encoding = self.encoding or (self._detect_encoding(file) if self.autodetect_encoding else "utf-8")
+        # Detection only sees the beginning of the file
+        errors = "replace" if self.autodetect_encoding else "strict"
+        with open(file, "r", encoding=encoding, errors=errors) as f:
+            block_index = 0
+            pending = ""
+            while True:
+                chunk = f.read(self.block_size)
+                text = pending + chunk
+                # A short read means the end of the file
+                if len(chunk) < self.block_size:
+                    if text:
+                        yield self._document(file, text, block_index)
+                    return
+
+                # Cut at the last line break so lines are not split across documents
+                cut = text.rfind("\n") + 1 or len(text)
+                yield self._document(file, text[:cut], block_index)
+                pending = text[cut:]
+                block_index += 1
+
+    def _detect_encoding(self, file: Path) -> str:
+        """UTF-8 if the beginning of a file decodes as it, otherwise the most likely encoding."""
+        with open(file, "rb") as f:
+            sample = f.read(self.DETECT_BYTES)
+        try:
+            # Not final, so a character cut off at the end of the sample is fine
+            codecs.getincrementaldecoder("utf-8")().decode(sample)
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+        try:
+            from charset_normalizer import from_bytes
+        except ImportError:
+            return "utf-8"
+        match = from_bytes(sample).best()
+        return match.encoding if match is not None else "utf-8"
 
-        return loader.load()
\ No newline at end of file
+    def _document(self, file: Path, text: str, block_index: int) -> Document:
+        return Document(
+            page_content=text,
+            metadata={"source": str(file), "block": block_index}
+        )
@@ -4,3 +4,5 @@ from ennchan_rag.retrievers.similarity import SimilaritySearchRetrieval
 from ennchan_rag.retrievers.mmr import MMRRetrieval
 from ennchan_rag.retrievers.hybrid import HybridRetrieval
 from ennchan_rag.retrievers.keyword import KeywordRetrieval
+from ennchan_rag.retrievers.rerank import CrossEncoderReranker, benchmark_reranker
+from ennchan_rag.retrievers.multi_query import MultiQueryRetrieval, reciprocal_rank_fusion
@@ -1,5 +1,5 @@
 from langchain_core.documents import Document
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import re
 from ennchan_rag.core.interfaces import RetrievalStrategy
 from ennchan_rag.retrievers.keyword import KeywordRetrieval
@@ -13,7 +13,7 @@ class HybridRetrieval(RetrievalStrategy):
     understanding and specific terminology are important.
     """
     
-    def __init__(self, alpha: float = 0.5, k: int = 4):
+    def __init__(self, alpha: float = 0.5, k: int = 4, filter: Optional[Dict[str, Any]] = None):
         """
         Initialize the hybrid retrieval strategy.
         
@@ -21,11 +21,13 @@ class HybridRetrieval(RetrievalStrategy):
             alpha: Weight between 0 and 1 for blending results.
                   0 is all keyword, 1 is all semantic.
             k: Number of documents to return
+            filter: Optional metadata filter to apply to both searches
         """
         self.alpha = alpha
         self.k = k
-        self.keyword_retriever = KeywordRetrieval(k=k*2)  # Get more for reranking
-        self.semantic_retriever = SimilaritySearchRetrieval()
+        self.filter = filter
+        self.keyword_retriever = KeywordRetrieval(k=k*2, filter=filter)  # Get more for reranking
+        self.semantic_retriever = SimilaritySearchRetrieval(filter=filter)
     
     def retrieve(self, query: str, vector_store) -> List[Document]:
         """
@@ -36,7 +38,7 @@ class HybridRetrieval(RetrievalStrategy):
         try:
             # Get results from both retrievers
             keyword_docs = self.keyword_retriever.retrieve(query, vector_store)
-            semantic_docs = vector_store.similarity_search(query, k=self.k*2)
+            semantic_docs = vector_store.similarity_search(query, k=self.k*2, filter=self.filter)
             
             # Create a scoring system that combines both approaches
             doc_scores: Dict[str, Dict[str, Any]] = {}
@@ -1,5 +1,5 @@
 from langchain_core.documents import Document
-from typing import List
+from typing import Any, Dict, List, Optional
 import re
 from ennchan_rag.core.interfaces import RetrievalStrategy
 
@@ -11,14 +11,16 @@ class KeywordRetrieval(RetrievalStrategy):
     rather than semantic similarity.
     """
     
-    def __init__(self, k: int = 4):
+    def __init__(self, k: int = 4, filter: Optional[Dict[str, Any]] = None):
         """
         Initialize the keyword retrieval strategy.
         
         Args:
             k: Maximum number of documents to return
+            filter: Optional metadata filter to apply before matching
         """
         self.k = k
+        self.filter = filter
     
     def retrieve(self, query: str, vector_store) -> List[Document]:
         """
@@ -30,7 +32,10 @@ class KeywordRetrieval(RetrievalStrategy):
         try:
             # Get all documents from the vector store
             # Note: This is inefficient for large collections but works for demo purposes
-            all_docs = vector_store.get_all_documents()
+            if self.filter is not None:
+                all_docs = vector_store.get_all_documents(filter=self.filter)
+            else:
+                all_docs = vector_store.get_all_documents()
             
             # Extract keywords (simple implementation - remove stop words and punctuation)
             stop_words = {'a', 'an', 'the', 'and', 'or', 'but', 'is', 'are', 'was', 
@@ -1,5 +1,5 @@
 from langchain_core.documents import Document
-from typing import List
+from typing import Any, Dict, List, Optional
 from ennchan_rag.core.interfaces import RetrievalStrategy
 
 class MMRRetrieval(RetrievalStrategy):
@@ -11,7 +11,11 @@ class MMRRetrieval(RetrievalStrategy):
     while lower values (closer to 0.0) will prioritize relevance.
     """
     
-    def __init__(self, diversity: float = 0.3, k: int = 4, fetch_k: int = 20):
+    def __init__(self,
+                 diversity: float = 0.3,
+                 k: int = 4,
+                 fetch_k: int = 20,
+                 filter: Optional[Dict[str, Any]] = None):
         """
         Initialize the MMR retrieval strategy.
         
@@ -20,10 +24,12 @@ class MMRRetrieval(RetrievalStrategy):
                 relevance and diversity. 0 is all relevance, 1 is all diversity.
             k: Number of documents to return
             fetch_k: Number of documents to consider before reranking
+            filter: Optional metadata filter to apply to the search
         """
         self.diversity = diversity
         self.k = k
         self.fetch_k = fetch_k
+        self.filter = filter
     
     def retrieve(self, query: str, vector_store) -> List[Document]:
         """
@@ -37,7 +43,8 @@ class MMRRetrieval(RetrievalStrategy):
                 query, 
                 k=self.k,
                 fetch_k=self.fetch_k,
-                lambda_mult=self.diversity
+                lambda_mult=self.diversity,
+                filter=self.filter
             )
         except Exception as e:
             print(f"MMR retrieval failed: {e}. Falling back to similarity search.")
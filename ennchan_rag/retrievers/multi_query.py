@@ -0,0 +1,99 @@
+from langchain_core.documents import Document
+from typing import List, Dict, Any, Optional, Sequence
+from ennchan_rag.core.interfaces import RetrievalStrategy
+from ennchan_rag.utils.embeddings import embed_queries
+
+class MultiQueryRetrieval(RetrievalStrategy):
+    """
+    Retrieval strategy searching with the question and its refined queries.
+
+    The question and every planned search query are embedded as queries in
+    one batch, searched together, and the ranked lists are merged with
+    Reciprocal Rank Fusion, so documents found by several queries rise to
+    the top. This improves recall without one embedding round-trip per
+    query, for embedders that support batched queries (see embed_queries).
+    """
+
+    def __init__(self,
+                 queries: Optional[Sequence[str]] = None,
+                 k: int = 4,
+                 fetch_k: Optional[int] = None,
+                 rrf_k: int = 60,
+                 filter: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the multi-query retrieval strategy.
+
+        Args:
+            queries: Additional queries searched alongside the question
+            k: Number of documents to return
+            fetch_k: Number of candidates per query before fusion, default 2 * k
+            rrf_k: Rank constant of Reciprocal Rank Fusion; larger values
+                flatten the advantage of top ranks
+            filter: Optional metadata filter to apply to every search
+        """
+        self.queries = list(queries or [])
+        self.k = k
+        self.fetch_k = fetch_k or 2 * k
+        self.rrf_k = rrf_k
+        self.filter = filter
+        self.stats: Dict[str, int] = {}
+
+    def retrieve(self, query: str, vector_store) -> List[Document]:
+        """
+        Retrieve documents for the question and the additional queries.
+
+        Falls back to one search per query when the vector store cannot
+        search several embeddings at once.
+        """
+        # The question leads; repeated queries would only count twice in the fusion
+        queries = list(dict.fromkeys(q.strip() for q in [query, *self.queries] if q and q.strip()))
+        try:
+            embeddings = embed_queries(vector_store.embeddings, queries)
+            if hasattr(vector_store, 'similarity_search_with_score_by_vectors'):
+                ranked_lists = [
+                    [doc for doc, _ in results]
+                    for results in vector_store.similarity_search_with_score_by_vectors(
+                        embeddings, k=self.fetch_k, filter=self.filter)
+                ]
+            else:
+                ranked_lists = [
+                    vector_store.similarity_search_by_vector(embedding, k=self.fetch_k, filter=self.filter)
+                    for embedding in embeddings
+                ]
+        except Exception as e:
+            print(f"Multi-query retrieval failed: {e}. Falling back to similarity search.")
+            return vector_store.similarity_search(query, k=self.k, filter=self.filter)
+
+        fused = self.fuse(ranked_lists)
+        self.stats = {
+            "queries": len(queries),
+            "candidates": sum(len(docs) for docs in ranked_lists),
+            "unique": len(fused),
+        }
+        return fused[:self.k]
+
+    def fuse(self, ranked_lists: Sequence[List[Document]]) -> List[Document]:
+        """Merge ranked lists with Reciprocal Rank Fusion using this strategy's rrf_k."""
+        return reciprocal_rank_fusion(ranked_lists, self.rrf_k)
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[List[Document]], rrf_k: int = 60) -> List[Document]:
+    """
+    Merge ranked lists with Reciprocal Rank Fusion.
+
+    Args:
+        ranked_lists: Documents per query, best first
+        rrf_k: Rank constant; larger values flatten the advantage of top ranks
+
+    Returns:
+        Deduplicated documents ordered by their summed 1 / (rrf_k + rank)
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for docs in ranked_lists:
+        for rank, doc in enumerate(docs, 1):
+            # Identify a document by its store id, or by its content without one
+            doc_id = getattr(doc, 'id', None) or doc.page_content
+            documents.setdefault(doc_id, doc)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return [documents[doc_id] for doc_id in sorted(scores, key=scores.get, reverse=True)]
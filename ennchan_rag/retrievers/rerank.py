@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from ennchan_rag.core.extractive import count_tokens
+
+
+class CrossEncoderReranker:
+    """
+    Reranks retrieved documents with a cross-encoder.
+
+    A cross-encoder reads the query and a chunk together, which ranks far
+    better than bi-encoder similarity but costs a forward pass per pair. To
+    keep that affordable on CPU, pairs are scored in batches, scores are
+    cached by a hash of the pair, the number of candidates is capped and
+    scoring stops once the time budget is spent; candidates left unscored
+    keep their original order after the scored ones.
+    """
+
+    def __init__(self,
+                 model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 top_n: int = 4,
+                 max_candidates: int = 16,
+                 batch_size: int = 16,
+                 time_budget: Optional[float] = 2.0,
+                 cache_size: int = 4096,
+                 device: str = "cpu"):
+        """
+        Initialize the cross-encoder reranker.
+
+        Args:
+            model_name: Hugging Face id of the cross-encoder model
+            top_n: Number of documents to keep
+            max_candidates: Maximum number of retrieved documents to score
+            batch_size: Number of pairs scored per forward pass
+            time_budget: Seconds after which scoring stops, or None for no limit
+            cache_size: Maximum number of cached pair scores
+            device: Device to run the model on
+        """
+        self.model_name = model_name
+        self.top_n = top_n
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.cache_size = cache_size
+        self.device = device
+        self._model = None
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The cross-encoder, loaded on first use."""
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name, device=self.device)
+        return self._model
+
+    def rerank(self,
+               query: str,
+               documents: List[Document],
+               baseline_k: Optional[int] = None) -> Tuple[List[Document], Dict[str, float]]:
+        """
+        Reorder documents by cross-encoder relevance and keep the best ones.
+
+        Args:
+            query: The query the documents were retrieved for
+            documents: The retrieved documents, best first
+            baseline_k: Documents the context would hold without reranking,
+                by default top_n
+
+        Returns:
+            Tuple of up to top_n documents, best first, and statistics on the
+            added latency and the context tokens compared with the first
+            baseline_k retrieved documents
+        """
+        start = time.perf_counter()
+        candidates = documents[:self.max_candidates]
+        keys = [self._key(query, doc.page_content) for doc in candidates]
+
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+        cache_hits = len(scores)
+
+        pending = [i for i in range(len(candidates)) if i not in scores]
+        for offset in range(0, len(pending), self.batch_size):
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                break
+            batch = pending[offset:offset + self.batch_size]
+            batch_scores = self.model.predict(
+                [(query, candidates[i].page_content) for i in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            with self._lock:
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    self._cache[keys[i]] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        scored = sorted(scores, key=lambda i: scores[i], reverse=True)
+        unscored = [i for i in range(len(candidates)) if i not in scores]
+        reranked = [candidates[i] for i in scored + unscored][:self.top_n]
+
+        stats = {
+            "candidates": len(candidates),
+            "scored": len(scores) - cache_hits,
+            "cache_hits": cache_hits,
+            "seconds": time.perf_counter() - start,
+            # What the prompt would hold without reranking, not every over-fetched candidate
+            "tokens_baseline": sum(count_tokens(doc.page_content)
+                                   for doc in documents[:baseline_k or self.top_n]),
+            "tokens_out": sum(count_tokens(doc.page_content) for doc in reranked),
+        }
+        stats["tokens_saved"] = stats["tokens_baseline"] - stats["tokens_out"]
+        return reranked, stats
+
+    @staticmethod
+    def _key(query: str, text: str) -> str:
+        return hashlib.sha1(f"{query}\0{text}".encode("utf-8")).hexdigest()
+
+
+def benchmark_reranker(reranker: CrossEncoderReranker,
+                       vector_store: Any,
+                       questions: Sequence[str],
+                       baseline_k: int = 4) -> List[Dict[str, Any]]:
+    """
+    Measure the latency reranking adds against the prompt tokens it saves.
+
+    Each question retrieves max_candidates documents by similarity; the
+    baseline is the context of its first baseline_k documents, as used
+    without a reranker. The model is warmed up on the first question and
+    the score cache cleared before each one, so every rerank scores all of
+    its candidates.
+
+    Args:
+        reranker: The reranker to measure
+        vector_store: Store to retrieve candidates from
+        questions: Questions to retrieve and rerank for
+        baseline_k: Documents retrieved without reranking
+
+    Returns:
+        One result per question with the rerank seconds and the context
+        tokens with and without reranking
+    """
+    retrieved = [vector_store.similarity_search(question, k=reranker.max_candidates) for question in questions]
+    if questions:
+        reranker.rerank(questions[0], retrieved[0])
+
+    results = []
+    for question, candidates in zip(questions, retrieved):
+        with reranker._lock:
+            reranker._cache.clear()
+        _, stats = reranker.rerank(question, candidates, baseline_k=baseline_k)
+        results.append({"question": question, **stats})
+    return results
@@ -0,0 +1,3 @@
+"""Vector stores."""
+
+from ennchan_rag.stores.memory import ManagedVectorStore, benchmark_store
@@ -0,0 +1,648 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from ennchan_rag.stores.table import DocumentTable
+
+MetadataFilter = Union[Dict[str, Any], Callable[[Document], bool]]
+
+EVICTION_POLICIES = ("lru", "least_retrieved")
+
+
+class ManagedVectorStore(VectorStore):
+    """
+    In-memory vector store with bounded growth.
+
+    Embeddings are kept as normalized rows of a single matrix, so a search is
+    one matrix-vector product. Documents whose source has a TTL expire after
+    it, and when a document or byte cap is exceeded those same documents are
+    evicted by least recent use or least retrievals. Documents from sources
+    without a TTL, such as a preloaded corpus, are never evicted. Deleted rows
+    are compacted out of the matrix once they make up a large enough share.
+    The documents that never expire can be saved to and loaded from disk.
+
+    Metadata filters are dictionaries of required values, where a list or
+    tuple value matches any of its items. Texts and metadata live in a
+    columnar DocumentTable with interned metadata records, so filters are
+    matched once per distinct record (through an inverted index for indexed
+    fields) and only the rows a search returns become Documents.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    DOCUMENTS_FILE = "documents.jsonl"
+    INDEX_FILE = "store.json"
+
+    def __init__(self,
+                 embedding: Embeddings,
+                 ttl: Optional[Dict[str, float]] = None,
+                 max_documents: Optional[int] = None,
+                 max_bytes: Optional[int] = None,
+                 eviction: str = "lru",
+                 compact_ratio: float = 0.25,
+                 indexed_fields: Sequence[str] = ("request_id", "source")):
+        """
+        Initialize the managed vector store.
+
+        Args:
+            embedding: Embedding model for documents and queries
+            ttl: Seconds a document lives, keyed by its metadata "source"
+            max_documents: Maximum number of resident documents, or None
+            max_bytes: Maximum resident bytes (embeddings and text), or None
+            eviction: "lru" or "least_retrieved"
+            compact_ratio: Share of deleted rows that triggers a compaction
+            indexed_fields: Metadata fields with an inverted index for filtering
+        """
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {eviction!r}, expected one of {EVICTION_POLICIES}")
+
+        self.embedding = embedding
+        self.ttl = ttl or {}
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.compact_ratio = compact_ratio
+        self.indexed_fields = tuple(indexed_fields)
+
+        self._lock = threading.RLock()
+        self._table = DocumentTable()
+        self._rows: Dict[str, int] = {}
+        # Metadata value -> codes of the table's records holding it
+        self._index: Dict[str, Dict[Any, Set[int]]] = {field: defaultdict(set) for field in self.indexed_fields}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._expires = np.zeros(0, dtype=np.float64)
+        self._last_access = np.zeros(0, dtype=np.float64)
+        self._hits = np.zeros(0, dtype=np.int64)
+        self._counters = {"expired": 0, "evicted": 0, "compactions": 0}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @classmethod
+    def from_texts(cls,
+                   texts: List[str],
+                   embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "ManagedVectorStore":
+        ids = kwargs.pop("ids", None)
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def add_texts(self,
+                  texts: Iterable[str],
+                  metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None,
+                  **kwargs: Any) -> List[str]:
+        """
+        Embed and add texts to the store.
+
+        Args:
+            texts: The texts to add
+            metadatas: Metadata of each text
+            ids: Ids of each text; existing ids are replaced
+
+        Returns:
+            The ids of the added texts
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(vectors, texts, metadatas=metadatas, ids=ids)
+
+    def add_vectors(self,
+                    vectors: Sequence[Sequence[float]],
+                    texts: Sequence[str],
+                    metadatas: Optional[Sequence[dict]] = None,
+                    ids: Optional[Sequence[Optional[str]]] = None) -> List[str]:
+        """
+        Add precomputed embeddings with their texts to the store.
+
+        Args:
+            vectors: Embedding of each text
+            texts: The texts to add
+            metadatas: Metadata of each text
+            ids: Ids of each text; existing ids are replaced
+
+        Returns:
+            The ids of the added texts
+        """
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = [doc_id or uuid.uuid4().hex for doc_id in (ids or [None] * len(texts))]
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+        now = time.time()
+
+        with self._lock:
+            self.delete([doc_id for doc_id in ids if doc_id in self._rows])
+            self._expire(now)
+
+            start = len(self._table)
+            self._reserve(len(texts), matrix.shape[1])
+            self._matrix[start:start + len(texts)] = matrix
+
+            expires = [now + self.ttl[m.get("source")] if m.get("source") in self.ttl else np.inf
+                       for m in metadatas]
+            count = len(texts)
+            self._alive = np.concatenate([self._alive, np.ones(count, dtype=bool)])
+            self._expires = np.concatenate([self._expires, np.asarray(expires, dtype=np.float64)])
+            self._last_access = np.concatenate([self._last_access, np.full(count, now)])
+            self._hits = np.concatenate([self._hits, np.zeros(count, dtype=np.int64)])
+
+            for code in self._table.append(ids, texts, metadatas):
+                self._index_record(code)
+            for offset, doc_id in enumerate(ids):
+                self._rows[doc_id] = start + offset
+
+            self._enforce_limits()
+        return ids
+
+    def _reserve(self, count: int, dimension: int) -> None:
+        """Grow the embedding matrix geometrically so appends are amortized."""
+        size = len(self._table)
+        capacity = self._matrix.shape[0]
+        if size + count <= capacity:
+            return
+        matrix = np.zeros((max(2 * capacity, size + count), dimension), dtype=np.float32)
+        if size:
+            matrix[:size] = self._matrix[:size]
+        self._matrix = matrix
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Delete documents by id.
+
+        Args:
+            ids: The ids to delete
+
+        Returns:
+            True if any document was deleted
+        """
+        with self._lock:
+            rows = [self._rows[doc_id] for doc_id in ids or [] if doc_id in self._rows]
+            self._delete_rows(rows)
+            return bool(rows)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            return [self._table.document(self._rows[doc_id]) for doc_id in ids if doc_id in self._rows]
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return copies of the normalized embeddings of the given ids that are still stored."""
+        with self._lock:
+            return {doc_id: self._matrix[self._rows[doc_id]].copy() for doc_id in ids if doc_id in self._rows}
+
+    def get_all_documents(self, filter: Optional[MetadataFilter] = None) -> List[Document]:
+        """Return every resident document, optionally only those matching a filter."""
+        with self._lock:
+            self._expire(time.time())
+            return [self._table.document(row) for row in self._filter_rows(filter)]
+
+    def similarity_search(self,
+                          query: str,
+                          k: int = 4,
+                          filter: Optional[MetadataFilter] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def similarity_search_with_score(self,
+                                     query: str,
+                                     k: int = 4,
+                                     filter: Optional[MetadataFilter] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        """
+        Search for the documents most similar to a query.
+
+        Args:
+            query: The query text
+            k: Number of documents to return
+            filter: Metadata values to match, or a predicate on documents
+
+        Returns:
+            List of (document, cosine similarity) pairs, best first
+        """
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self,
+                                    embedding: List[float],
+                                    k: int = 4,
+                                    filter: Optional[MetadataFilter] = None,
+                                    **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score_by_vector(self,
+                                               embedding: List[float],
+                                               k: int = 4,
+                                               filter: Optional[MetadataFilter] = None) -> List[Tuple[Document, float]]:
+        """
+        Search for the documents most similar to an embedding.
+
+        Args:
+            embedding: The query embedding
+            k: Number of documents to return
+            filter: Metadata values to match, or a predicate on documents
+
+        Returns:
+            List of (document, cosine similarity) pairs, best first
+        """
+        query = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            rows, scores = self._search(query, k, filter)
+            self._touch(rows)
+            return [(self._table.document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_with_score_by_vectors(self,
+                                                embeddings: Sequence[List[float]],
+                                                k: int = 4,
+                                                filter: Optional[MetadataFilter] = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Search for the documents most similar to each of several embeddings.
+
+        The filter is resolved once and all queries are scored together as
+        one matrix product, instead of one search per query.
+
+        Args:
+            embeddings: The query embeddings
+            k: Number of documents to return per query
+            filter: Metadata values to match, or a predicate on documents
+
+        Returns:
+            One list of (document, cosine similarity) pairs per query, best first
+        """
+        queries = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+        with self._lock:
+            results = []
+            for rows, scores in self._search_batch(queries, k, filter):
+                self._touch(rows)
+                results.append([(self._table.document(row), float(score)) for row, score in zip(rows, scores)])
+            return results
+
+    def max_marginal_relevance_search(self,
+                                      query: str,
+                                      k: int = 4,
+                                      fetch_k: int = 20,
+                                      lambda_mult: float = 0.5,
+                                      filter: Optional[MetadataFilter] = None,
+                                      **kwargs: Any) -> List[Document]:
+        """
+        Search for documents that are relevant to the query but diverse.
+
+        Args:
+            query: The query text
+            k: Number of documents to return
+            fetch_k: Number of candidates to select from
+            lambda_mult: 0 for maximum diversity, 1 for maximum relevance
+            filter: Metadata values to match, or a predicate on documents
+
+        Returns:
+            List of selected documents
+        """
+        query = self._normalize(np.asarray(self.embedding.embed_query(query), dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            rows, _ = self._search(query, fetch_k, filter)
+            if len(rows) == 0:
+                return []
+            selected = maximal_marginal_relevance(query, self._matrix[rows], lambda_mult=lambda_mult, k=k)
+            rows = rows[selected]
+            self._touch(rows)
+            return [self._table.document(row) for row in rows]
+
+    def save(self, directory: str) -> None:
+        """
+        Persist the documents that never expire, such as an ingested corpus.
+
+        Documents with a TTL are request-scoped and are not saved. The
+        embeddings are written as one .npy matrix next to a JSON-lines file
+        of ids, texts and metadata, both in a new version directory. The
+        index file naming the current version and its document count is
+        replaced last, so a reader sees either the old or the new pair.
+
+        Args:
+            directory: Directory to write the index to
+        """
+        directory = os.path.expanduser(directory)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            rows = np.flatnonzero(self._alive & ~np.isfinite(self._expires))
+            matrix = self._matrix[rows] if len(rows) else np.zeros((0, 0), dtype=np.float32)
+            records = [
+                {"id": self._table.id(row), "text": self._table.text(row), "metadata": self._table.metadata(row)}
+                for row in rows
+            ]
+
+        version = f"store-{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(directory, version))
+        with open(os.path.join(directory, version, self.VECTORS_FILE), "wb") as f:
+            np.save(f, matrix)
+        with open(os.path.join(directory, version, self.DOCUMENTS_FILE), "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+        index_path = os.path.join(directory, self.INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": version, "documents": len(records)}, f)
+        os.replace(index_path + ".tmp", index_path)
+
+        # Nothing reads older versions, or those of an interrupted save, once
+        # the index names the new one
+        for name in os.listdir(directory):
+            if name.startswith("store-") and name != version:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+        for name in (self.VECTORS_FILE, self.DOCUMENTS_FILE):
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory: str, embedding: Embeddings, **kwargs: Any) -> "ManagedVectorStore":
+        """
+        Load a store saved with save.
+
+        Args:
+            directory: Directory the index was written to
+            embedding: Embedding model the index was built with
+            **kwargs: Further ManagedVectorStore options
+
+        Returns:
+            The loaded store, empty if the directory holds no index
+
+        Raises:
+            ValueError: If the saved embeddings and documents do not match
+        """
+        directory = os.path.expanduser(directory)
+        store = cls(embedding, **kwargs)
+        index = cls._read_index(directory)
+        # Indexes saved before versioning keep both files in the directory itself
+        version_dir = os.path.join(directory, index["version"]) if index is not None else directory
+        documents_path = os.path.join(version_dir, cls.DOCUMENTS_FILE)
+        if not os.path.exists(documents_path):
+            return store
+
+        matrix = np.load(os.path.join(version_dir, cls.VECTORS_FILE))
+        ids, texts, metadatas = [], [], []
+        with open(documents_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                texts.append(record["text"])
+                metadatas.append(record["metadata"])
+        expected = index["documents"] if index is not None else len(texts)
+        if len(matrix) != len(texts) or len(texts) != expected:
+            raise ValueError(f"Index in {directory} is inconsistent: {len(matrix)} embeddings and "
+                             f"{len(texts)} documents, {expected} expected; ingest the sources again")
+        if texts:
+            store.add_vectors(matrix, texts, metadatas=metadatas, ids=ids)
+        return store
+
+    @classmethod
+    def _read_index(cls, directory: str) -> Optional[Dict[str, Any]]:
+        """Read the index file naming the saved version, None if there is none."""
+        try:
+            with open(os.path.join(directory, cls.INDEX_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report the resident size of the store.
+
+        Returns:
+            Dictionary with resident documents and bytes, and lifecycle counters
+        """
+        with self._lock:
+            alive = int(self._alive.sum())
+            dimension = self._matrix.shape[1] if self._matrix.ndim == 2 else 0
+            embedding_bytes = alive * dimension * self._matrix.itemsize
+            text_bytes = int(self._table.lengths[self._alive].sum())
+            return {
+                "documents": alive,
+                "rows": len(self._table),
+                "metadata_records": len(self._table.records),
+                "embedding_bytes": embedding_bytes,
+                "text_bytes": text_bytes,
+                "bytes": embedding_bytes + text_bytes,
+                **self._counters,
+            }
+
+    def _search(self, query: np.ndarray, k: int, filter: Optional[MetadataFilter]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the top-k alive rows matching the filter and their scores."""
+        return self._search_batch(query.reshape(1, -1), k, filter)[0]
+
+    def _search_batch(self,
+                      queries: np.ndarray,
+                      k: int,
+                      filter: Optional[MetadataFilter]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return the top-k alive rows matching the filter and their scores for each query row."""
+        self._expire(time.time())
+        candidates = self._filter_rows(filter)
+        if len(candidates) == 0 or k <= 0:
+            return [(candidates[:0], np.zeros(0, dtype=np.float32)) for _ in range(len(queries))]
+
+        # One product scores every candidate against every query: (candidates, queries)
+        scores = self._matrix[candidates] @ queries.T
+        results = []
+        for column in scores.T:
+            if len(candidates) > k:
+                top = np.argpartition(-column, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(-column[top])]
+            results.append((candidates[top], column[top]))
+        return results
+
+    def _filter_rows(self, filter: Optional[MetadataFilter]) -> np.ndarray:
+        """Return the alive rows matching a filter, matching each metadata record once."""
+        if filter is None:
+            return np.flatnonzero(self._alive)
+
+        if callable(filter):
+            rows = np.flatnonzero(self._alive)
+            return rows[[bool(filter(self._table.document(row))) for row in rows]].astype(rows.dtype)
+
+        records = self._table.records
+        indexed = {key: value for key, value in filter.items() if key in self._index}
+        if indexed:
+            codes = None
+            for key, value in indexed.items():
+                matches = set().union(*(self._index[key].get(v, ()) for v in self._values(value)))
+                codes = matches if codes is None else codes & matches
+        else:
+            codes = range(len(records))
+
+        rest = {key: value for key, value in filter.items() if key not in self._index}
+        if rest:
+            codes = [code for code in codes if self._matches(records[code], rest)]
+
+        # Rows whose record matched, as one lookup over the record column
+        matching = np.zeros(len(records), dtype=bool)
+        matching[list(codes)] = True
+        return np.flatnonzero(self._alive & matching[self._table.record_codes])
+
+    @staticmethod
+    def _values(value: Any) -> Sequence[Any]:
+        return value if isinstance(value, (list, tuple, set)) else (value,)
+
+    @classmethod
+    def _matches(cls, metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+        return all(metadata.get(key) in cls._values(value) for key, value in filter.items())
+
+    def _index_record(self, code: int) -> None:
+        metadata = self._table.records[code]
+        for field, values in self._index.items():
+            if field in metadata:
+                try:
+                    values[metadata[field]].add(code)
+                except TypeError:
+                    # Unhashable values cannot be looked up, so they never match
+                    pass
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def _touch(self, rows: np.ndarray) -> None:
+        """Record that rows were returned by a search."""
+        self._last_access[rows] = time.time()
+        self._hits[rows] += 1
+
+    def _expire(self, now: float) -> None:
+        """Delete documents whose TTL has passed."""
+        expired = np.flatnonzero(self._alive & (self._expires <= now))
+        if len(expired):
+            self._counters["expired"] += len(expired)
+            self._delete_rows(expired)
+
+    def _enforce_limits(self) -> None:
+        """Evict documents with a TTL until the caps are met."""
+        while self._over_limits():
+            evictable = np.flatnonzero(self._alive & np.isfinite(self._expires))
+            if len(evictable) == 0:
+                return
+            if self.eviction == "least_retrieved":
+                order = np.lexsort((self._last_access[evictable], self._hits[evictable]))
+            else:
+                order = np.argsort(self._last_access[evictable])
+
+            # Evict in batches of up to 10% of the candidates
+            batch = evictable[order[:max(1, len(evictable) // 10)]]
+            self._counters["evicted"] += len(batch)
+            self._delete_rows(batch)
+
+    def _over_limits(self) -> bool:
+        if self.max_documents is None and self.max_bytes is None:
+            return False
+        stats = self.stats()
+        return (self.max_documents is not None and stats["documents"] > self.max_documents) or \
+            (self.max_bytes is not None and stats["bytes"] > self.max_bytes)
+
+    def _delete_rows(self, rows: Iterable[int]) -> None:
+        """Mark rows deleted and compact once enough of them are dead."""
+        for row in rows:
+            if self._alive[row]:
+                self._alive[row] = False
+                del self._rows[self._table.id(row)]
+                self._table.clear(row)
+
+        dead = len(self._table) - int(self._alive.sum())
+        if dead and dead >= self.compact_ratio * len(self._table):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop deleted rows from the embedding matrix, row arrays and document table."""
+        keep = np.flatnonzero(self._alive)
+        self._matrix = self._matrix[keep]
+        self._alive = self._alive[keep]
+        self._expires = self._expires[keep]
+        self._last_access = self._last_access[keep]
+        self._hits = self._hits[keep]
+        self._table.compact(keep)
+        self._rows = {self._table.id(row): row for row in range(len(self._table))}
+        self._index = {field: defaultdict(set) for field in self.indexed_fields}
+        for code in range(len(self._table.records)):
+            self._index_record(code)
+        self._counters["compactions"] += 1
+
+
+def benchmark_store(chunks: int = 100_000,
+                    dimension: int = 384,
+                    chunks_per_page: int = 5,
+                    chunk_chars: int = 800,
+                    searches: int = 50,
+                    seed: int = 0) -> Dict[str, float]:
+    """
+    Measure the memory a ManagedVectorStore keeps per chunk and its filtered search time.
+
+    Synthetic chunks are split from pages the way web results are, so a
+    page's chunks share their metadata. The heap retained by the store is
+    measured with tracemalloc and compared with keeping one Document per
+    chunk, as the store did before its DocumentTable.
+
+    Args:
+        chunks: Number of chunks to add
+        dimension: Embedding dimension
+        chunks_per_page: Chunks sharing one page's metadata
+        chunk_chars: Characters of text per chunk
+        searches: Filtered top-8 searches to time
+        seed: Seed of the random embeddings
+
+    Returns:
+        Bytes per chunk of text, of the store besides its embedding matrix
+        and of a list of Documents, the matrix bytes and the mean search
+        milliseconds
+    """
+    from ennchan_rag.utils.profiling import MemoryProfile
+
+    rng = np.random.default_rng(seed)
+    filler = "lorem ipsum dolor sit amet "
+
+    def chunk(i: int) -> Tuple[str, Dict[str, str]]:
+        page = i // chunks_per_page
+        text = f"chunk {i} " + filler * (chunk_chars // len(filler))
+        metadata = {"title": f"Page title number {page}", "url": f"https://example.com/articles/{page}",
+                    "source": "web_search", "query": f"search query {page % 50}",
+                    "request_id": f"req{page % 200:04d}"}
+        return text, metadata
+
+    with MemoryProfile() as baseline:
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in map(chunk, range(chunks))]
+    text_bytes = sum(len(doc.page_content.encode("utf-8")) for doc in documents)
+    del documents
+
+    store = ManagedVectorStore(None)
+    with MemoryProfile() as profile:
+        for start in range(0, chunks, 1000):
+            batch = [chunk(i) for i in range(start, min(start + 1000, chunks))]
+            store.add_vectors(rng.random((len(batch), dimension), dtype=np.float32),
+                              [text for text, _ in batch], [metadata for _, metadata in batch])
+        del batch
+    matrix_bytes = store._matrix.nbytes
+
+    queries = rng.random((searches, dimension), dtype=np.float32)
+    start = time.perf_counter()
+    for query in queries:
+        store.similarity_search_by_vector(query.tolist(), k=8, filter={"request_id": ["req0001", "corpus"]})
+    search_seconds = (time.perf_counter() - start) / max(1, searches)
+
+    return {
+        "chunks": chunks,
+        "text_bytes_per_chunk": text_bytes / chunks,
+        "store_bytes_per_chunk": (profile.retained_bytes - matrix_bytes) / chunks,
+        "documents_bytes_per_chunk": baseline.retained_bytes / chunks,
+        "matrix_bytes": matrix_bytes,
+        "metadata_records": store.stats()["metadata_records"],
+        "search_ms": search_seconds * 1000,
+    }
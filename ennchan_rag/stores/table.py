@@ -0,0 +1,160 @@
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class DocumentTable:
+    """
+    Columnar table of the documents held by a vector store.
+
+    Texts are stored UTF-8 encoded in one shared buffer and addressed by
+    offset and length arrays. Metadata is interned: the chunks of a page
+    share one read-only metadata record, and records share their values, so
+    a row costs an id, two offsets and a record code instead of a Document,
+    its dictionary and its strings. Documents are only built for the rows a
+    search actually returns.
+
+    Rows are append-only; cleared rows keep their space until compact is
+    called with the rows to keep.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offsets = np.zeros(0, dtype=np.int64)
+        self._lengths = np.zeros(0, dtype=np.int64)
+        self._ids: List[Optional[str]] = []
+        self._record_of = np.zeros(0, dtype=np.int32)
+        self._records: List[Dict[str, Any]] = []
+        self._record_codes: Dict[Hashable, int] = {}
+        self._values: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Encoded byte length of each row's text."""
+        return self._lengths
+
+    @property
+    def record_codes(self) -> np.ndarray:
+        """Metadata record code of each row."""
+        return self._record_of
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """Distinct metadata records, indexed by code. Must not be modified."""
+        return self._records
+
+    def append(self,
+               ids: Sequence[str],
+               texts: Sequence[str],
+               metadatas: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        Append rows to the table.
+
+        Args:
+            ids: Id of each row
+            texts: Text of each row
+            metadatas: Metadata of each row
+
+        Returns:
+            Codes of the metadata records that did not exist before
+        """
+        encoded = [text.encode("utf-8") for text in texts]
+        lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+        offsets = len(self._buffer) + np.cumsum(lengths) - lengths
+        self._buffer += b"".join(encoded)
+        self._offsets = np.concatenate([self._offsets, offsets])
+        self._lengths = np.concatenate([self._lengths, lengths])
+        self._ids.extend(ids)
+
+        known = len(self._records)
+        codes = [self._intern_record(metadata) for metadata in metadatas]
+        self._record_of = np.concatenate([self._record_of, np.asarray(codes, dtype=np.int32)])
+        return list(range(known, len(self._records)))
+
+    def id(self, row: int) -> Optional[str]:
+        return self._ids[row]
+
+    def text(self, row: int) -> str:
+        start = self._offsets[row]
+        return self._buffer[start:start + self._lengths[row]].decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """Return the shared metadata record of a row. Must not be modified."""
+        return self._records[self._record_of[row]]
+
+    def document(self, row: int) -> Document:
+        """Materialize a row as a Document with its own copy of the metadata."""
+        return Document(id=self._ids[row], page_content=self.text(row), metadata=dict(self.metadata(row)))
+
+    def clear(self, row: int) -> None:
+        """Forget a row's id; its text and record stay until the next compaction."""
+        self._ids[row] = None
+
+    def compact(self, keep: np.ndarray) -> None:
+        """
+        Keep only the given rows, rewriting the text buffer and the records.
+
+        Args:
+            keep: Rows to keep, in order
+        """
+        buffer = bytearray()
+        offsets = np.zeros(len(keep), dtype=np.int64)
+        for position, row in enumerate(keep):
+            offsets[position] = len(buffer)
+            start = self._offsets[row]
+            buffer += self._buffer[start:start + self._lengths[row]]
+        # Renumber the records still in use
+        used, codes = np.unique(self._record_of[keep], return_inverse=True)
+
+        self._buffer = buffer
+        self._offsets = offsets
+        self._lengths = self._lengths[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._record_of = codes.astype(np.int32)
+        self._records = [self._records[code] for code in used]
+        self._record_codes = {}
+        self._values = {}
+        for code, record in enumerate(self._records):
+            for name, value in record.items():
+                self._intern(name)
+                self._intern(value)
+            key = self._record_key(record)
+            if key is not None:
+                self._record_codes[key] = code
+
+    def nbytes(self) -> int:
+        """Bytes held by the text buffer and the row arrays, excluding ids and records."""
+        return len(self._buffer) + self._offsets.nbytes + self._lengths.nbytes + self._record_of.nbytes
+
+    def _intern(self, value: Any) -> Any:
+        """Return the shared instance of a metadata string."""
+        if isinstance(value, str):
+            return self._values.setdefault(value, value)
+        return value
+
+    @staticmethod
+    def _record_key(record: Dict[str, Any]) -> Optional[Hashable]:
+        """Return the lookup key of a record, or None if it holds unhashable values."""
+        # With the types, so that True and 1 stay distinct records
+        key = tuple((name, type(value), value) for name, value in record.items())
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _intern_record(self, metadata: Dict[str, Any]) -> int:
+        """Return the code of a metadata record, adding it if it is new."""
+        record = {self._intern(key): self._intern(value) for key, value in metadata.items()}
+        key = self._record_key(record)
+        if key is not None and key in self._record_codes:
+            return self._record_codes[key]
+        code = len(self._records)
+        self._records.append(record)
+        if key is not None:
+            self._record_codes[key] = code
+        return code
@@ -2,4 +2,8 @@
 
 from ennchan_rag.utils.validators import is_url, is_local_path
 from ennchan_rag.utils.model_cache import get_model
-from ennchan_rag.utils.quantization import load_quantization
\ No newline at end of file
+from ennchan_rag.utils.quantization import load_quantization
+from ennchan_rag.utils.dedup import SearchResultDeduplicator, canonicalize_url
+from ennchan_rag.utils.profiling import MemoryProfile, LatencyStats, peak_rss_bytes
+from ennchan_rag.utils.summary_cache import SummaryCache
+from ennchan_rag.utils.replay import Cassette, RecordingLLM, RecordingSearch
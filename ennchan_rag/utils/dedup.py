@@ -0,0 +1,210 @@
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid", "_ga"}
+TRACKING_PREFIXES = ("utm_",)
+
+_WORD = re.compile(r"\w+")
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to a key shared by its trivial variants.
+
+    The scheme, a leading "www.", default ports, the fragment, tracking
+    parameters, the order of the remaining parameters and a trailing slash
+    are all ignored.
+
+    Args:
+        url: The URL to canonicalize
+
+    Returns:
+        The canonical form of the URL
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return f"{host}{path}" + (f"?{urlencode(query)}" if query else "")
+
+
+def content_hash(text: str) -> str:
+    """Hash text after normalizing case and whitespace."""
+    return hashlib.sha1(" ".join(_WORD.findall(text.lower())).encode("utf-8")).hexdigest()
+
+
+def simhash(text: str, shingle_size: int = 3) -> Optional[int]:
+    """
+    Compute the 64-bit SimHash of the word shingles of a text.
+
+    Args:
+        text: The text to fingerprint
+        shingle_size: Number of consecutive words per shingle
+
+    Returns:
+        The fingerprint, or None if the text has fewer words than a shingle
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < shingle_size:
+        return None
+
+    weights = [0] * 64
+    for i in range(len(words) - shingle_size + 1):
+        shingle = " ".join(words[i:i + shingle_size]).encode("utf-8")
+        value = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class SearchResultDeduplicator:
+    """
+    Removes duplicate search results before they are embedded and summarized.
+
+    Results are dropped in three passes of increasing cost: by canonical URL,
+    by a hash of the normalized content, and by SimHash distance to catch
+    mirrors and syndicated copies with small edits. The first occurrence of a
+    page is kept, so the search engine's ranking is preserved.
+    """
+
+    # SimHash fingerprints are split into this many bands; two fingerprints
+    # within max_distance bits agree on at least one band if max_distance < BANDS
+    BANDS = 4
+
+    def __init__(self, max_distance: int = 3, shingle_size: int = 3, min_words: int = 50):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            max_distance: Maximum number of differing SimHash bits for two
+                pages to count as near-duplicates; at most BANDS - 1 (3), as
+                the banded lookup would miss pages further apart
+            shingle_size: Number of consecutive words per SimHash shingle
+            min_words: Pages shorter than this are only compared exactly,
+                as SimHash is unreliable on short texts
+
+        Raises:
+            ValueError: If max_distance is negative or not below BANDS
+        """
+        if not 0 <= max_distance < self.BANDS:
+            raise ValueError(f"Dedup max_distance must be between 0 and {self.BANDS - 1}, got {max_distance}")
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+
+    def dedupe(self, results: List[Dict]) -> Tuple[List[Dict], Dict[str, int]]:
+        """
+        Remove duplicate search results.
+
+        Args:
+            results: Search results with "url" and optionally "content"
+
+        Returns:
+            Tuple of the unique results and counters of what was dropped
+        """
+        run = self.start()
+        unique = run.add_all(results)
+        return unique, run.stats
+
+    def start(self) -> "DedupRun":
+        """Start deduplicating a set of results that arrives in batches."""
+        return DedupRun(self)
+
+    def _fingerprint(self, content: str) -> Optional[int]:
+        if len(_WORD.findall(content)) < self.min_words:
+            return None
+        return simhash(content, self.shingle_size)
+
+    def _bands(self, fingerprint: int) -> List[int]:
+        width = 64 // self.BANDS
+        return [fingerprint >> (band * width) & ((1 << width) - 1) for band in range(self.BANDS)]
+
+    def _has_near_duplicate(self, fingerprint: int, buckets: List[Dict[int, List[int]]]) -> bool:
+        for band, value in enumerate(self._bands(fingerprint)):
+            for other in buckets[band].get(value, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return True
+        return False
+
+
+class DedupRun:
+    """
+    Deduplication state of one set of search results.
+
+    Results can be added as they arrive, for example one search query at a
+    time; each is compared against everything added before it.
+    """
+
+    def __init__(self, deduplicator: SearchResultDeduplicator):
+        self.deduplicator = deduplicator
+        self.stats = {
+            "results": 0,
+            "url_duplicates": 0,
+            "content_duplicates": 0,
+            "near_duplicates": 0,
+            "llm_calls_avoided": 0,
+            "unique": 0,
+        }
+        self._seen_urls = set()
+        self._seen_hashes = set()
+        # Band index -> band value -> fingerprints with that band
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(deduplicator.BANDS)]
+
+    def add_all(self, results: List[Dict]) -> List[Dict]:
+        """Add results and return those that are not duplicates, in order."""
+        return [result for result in results if self.add(result)]
+
+    def add(self, result: Dict) -> bool:
+        """
+        Add a search result.
+
+        Args:
+            result: Search result with "url" and optionally "content"
+
+        Returns:
+            Whether the result is new
+        """
+        self.stats["results"] += 1
+        if "url" not in result:
+            return False
+        url_key = canonicalize_url(result["url"])
+        if url_key in self._seen_urls:
+            self._drop("url_duplicates", result)
+            return False
+        self._seen_urls.add(url_key)
+
+        content = result.get("content") or ""
+        if content:
+            digest = content_hash(content)
+            if digest in self._seen_hashes:
+                self._drop("content_duplicates", result)
+                return False
+            self._seen_hashes.add(digest)
+
+            fingerprint = self.deduplicator._fingerprint(content)
+            if fingerprint is not None:
+                if self.deduplicator._has_near_duplicate(fingerprint, self._buckets):
+                    self._drop("near_duplicates", result)
+                    return False
+                for band, value in enumerate(self.deduplicator._bands(fingerprint)):
+                    self._buckets[band].setdefault(value, []).append(fingerprint)
+
+        self.stats["unique"] += 1
+        return True
+
+    def _drop(self, reason: str, result: Dict) -> None:
+        self.stats[reason] += 1
+        # Every dropped page with content would have cost a summary call
+        if result.get("content"):
+            self.stats["llm_calls_avoided"] += 1
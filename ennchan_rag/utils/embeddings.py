@@ -0,0 +1,242 @@
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def set_threads(threads: Optional[int]) -> None:
+    """Limit the intra-op threads torch uses, or keep its default for None."""
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def _export_dir(model_name: str, cache_dir: str) -> Path:
+    return Path(os.path.expanduser(cache_dir)) / re.sub(r"[^\w.-]", "_", model_name)
+
+
+def export_onnx(model_name: str, cache_dir: str, quantization: Optional[str] = None) -> Path:
+    """
+    Export a sentence-transformer to ONNX once and cache it on disk.
+
+    Args:
+        model_name: Hugging Face id of the sentence-transformer
+        cache_dir: Directory the exported models are kept in
+        quantization: None for float32, or the int8 target of a dynamic
+            quantization: "avx2", "avx512", "avx512_vnni" or "arm64"
+
+    Returns:
+        Path of the ONNX file, relative to the exported model directory
+    """
+    from sentence_transformers import SentenceTransformer
+
+    export_dir = _export_dir(model_name, cache_dir)
+    file_name = Path("onnx") / (f"model_qint8_{quantization}.onnx" if quantization else "model.onnx")
+    if (export_dir / file_name).exists():
+        return file_name
+
+    print(f"Exporting {model_name} to ONNX{' (int8)' if quantization else ''}...")
+    if (export_dir / "onnx" / "model.onnx").exists():
+        model = SentenceTransformer(str(export_dir), backend="onnx", device="cpu")
+    else:
+        model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        model.save_pretrained(str(export_dir))
+    if quantization:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        export_dynamic_quantized_onnx_model(model, quantization, str(export_dir))
+    return file_name
+
+
+def build_embeddings(model_name: str,
+                     backend: str = "torch",
+                     batch_size: int = 32,
+                     normalize: bool = True,
+                     max_seq_length: Optional[int] = None,
+                     threads: Optional[int] = None,
+                     cache_dir: str = "~/.cache/ennchan_rag/embeddings",
+                     quantization: str = "avx2") -> HuggingFaceEmbeddings:
+    """
+    Create a sentence-transformer embedding model with the given runtime.
+
+    Args:
+        model_name: Hugging Face id of the sentence-transformer
+        backend: "torch", "onnx" for ONNX Runtime, or "onnx-int8" for an
+            int8 dynamically quantized ONNX model
+        batch_size: Number of texts encoded per forward pass
+        normalize: Whether to return unit-length embeddings
+        max_seq_length: Tokens after which texts are truncated, or None for
+            the model's default
+        threads: Intra-op threads of the runtime, or None for its default
+        cache_dir: Directory exported ONNX models and torch snapshots are cached in
+        quantization: int8 target of the "onnx-int8" backend
+
+    Returns:
+        The embedding model
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}")
+
+    set_threads(threads)
+    model_kwargs: Dict[str, Any] = {"device": "cpu"}
+    snapshot_dir = None
+    if backend == "torch":
+        # Load a local safetensors snapshot, written on first use, without hub lookups
+        snapshot_dir = _export_dir(model_name, cache_dir) / "torch"
+        if (snapshot_dir / "modules.json").exists():
+            model_name = str(snapshot_dir)
+            model_kwargs["local_files_only"] = True
+            model_kwargs["model_kwargs"] = {"low_cpu_mem_usage": True}
+            snapshot_dir = None
+    else:
+        try:
+            file_name = export_onnx(model_name, cache_dir, quantization if backend == "onnx-int8" else None)
+        except ImportError as e:
+            print(f"ONNX Runtime not available ({e}), falling back to torch embeddings")
+        else:
+            model_name = str(_export_dir(model_name, cache_dir))
+            model_kwargs = {
+                "device": "cpu",
+                "backend": "onnx",
+                "model_kwargs": {
+                    "file_name": str(file_name),
+                    "provider": "CPUExecutionProvider",
+                    **({"session_options": _session_options(threads)} if threads else {}),
+                },
+            }
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": batch_size, "normalize_embeddings": normalize},
+        query_encode_kwargs={"normalize_embeddings": normalize},
+    )
+    if snapshot_dir is not None:
+        # Ingest workers may race to write it; the first complete snapshot wins
+        tmp_dir = snapshot_dir.with_name(f"torch.tmp{os.getpid()}")
+        try:
+            embeddings._client.save_pretrained(str(tmp_dir), safe_serialization=True)
+            os.replace(tmp_dir, snapshot_dir)
+        except OSError as e:
+            if not (snapshot_dir / "modules.json").exists():
+                print(f"Could not write embedding model snapshot: {e}")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    if max_seq_length:
+        embeddings._client.max_seq_length = max_seq_length
+    return embeddings
+
+
+def embed_queries(embeddings, texts: Sequence[str]) -> List[List[float]]:
+    """
+    Embed several queries in one batch.
+
+    Queries are embedded with the query-side settings, such as a query
+    prompt or instruction, which embed_documents would leave out. A
+    HuggingFaceEmbeddings model encodes all of them in one call; other
+    embedders without an embed_queries method of their own fall back to one
+    embed_query call per query.
+
+    Args:
+        embeddings: The embedding model
+        texts: Queries to embed
+
+    Returns:
+        One embedding per query
+    """
+    texts = list(texts)
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    if isinstance(embeddings, HuggingFaceEmbeddings):
+        # The same encode arguments embed_query uses, for the whole batch
+        return embeddings._embed(texts, embeddings.query_encode_kwargs or embeddings.encode_kwargs)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def _session_options(threads: int):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    return options
+
+
+def embedding_options(config) -> Dict[str, Any]:
+    """
+    Collect the embedding runtime options of a configuration.
+
+    Args:
+        config: Configuration object containing the embedding settings
+
+    Returns:
+        Keyword arguments for build_embeddings
+    """
+    return {
+        "model_name": config.embeddings_model,
+        "backend": config.embedding_backend,
+        "batch_size": config.embedding_batch_size,
+        "normalize": config.embedding_normalize,
+        "max_seq_length": config.embedding_max_seq_length,
+        "threads": config.embedding_threads,
+        "cache_dir": config.embedding_cache_dir,
+        "quantization": config.embedding_quantization,
+    }
+
+
+def load_embeddings(config) -> HuggingFaceEmbeddings:
+    """
+    Load the embedding model with the runtime options of a configuration.
+
+    Args:
+        config: Configuration object containing the embedding settings
+
+    Returns:
+        The embedding model
+    """
+    return build_embeddings(**embedding_options(config))
+
+
+def benchmark_embeddings(options: Dict[str, Any],
+                         texts: Sequence[str],
+                         backends: Sequence[str] = EMBEDDING_BACKENDS,
+                         batch_sizes: Sequence[int] = (32, 128),
+                         thread_counts: Sequence[Optional[int]] = (None,)) -> List[Dict[str, Any]]:
+    """
+    Measure embedding throughput on CPU for each runtime option.
+
+    Every combination is warmed up on one batch before it is timed.
+
+    Args:
+        options: Base keyword arguments for build_embeddings
+        texts: Texts to embed
+        backends: Backends to compare
+        batch_sizes: Batch sizes to compare
+        thread_counts: Intra-op thread counts to compare, None for the default
+
+    Returns:
+        One result per combination with its sentences per second
+    """
+    results = []
+    for backend in backends:
+        for threads in thread_counts:
+            for batch_size in batch_sizes:
+                embeddings = build_embeddings(**{
+                    **options, "backend": backend, "batch_size": batch_size, "threads": threads})
+                embeddings.embed_documents(list(texts[:batch_size]))
+
+                start = time.perf_counter()
+                embeddings.embed_documents(list(texts))
+                seconds = time.perf_counter() - start
+                results.append({
+                    # The backend actually used, in case ONNX Runtime was unavailable
+                    "backend": backend if embeddings.model_kwargs.get("backend") == "onnx" else "torch",
+                    "batch_size": batch_size,
+                    "threads": threads,
+                    "seconds": seconds,
+                    "sentences_per_second": len(texts) / seconds if seconds else 0.0,
+                })
+    return results
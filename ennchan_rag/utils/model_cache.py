@@ -1,61 +1,178 @@
 # ennchan_rag/utils/model_cache.py
-from typing import Dict, Any, Optional
+import os
+import re
+import shutil
+from typing import Dict, Any, Optional, Tuple
 from langchain_huggingface import HuggingFacePipeline
 import time
 
+from ennchan_rag.utils.profiling import peak_rss_bytes
+
 # Global cache for models
 _MODEL_CACHE = {}
 _LAST_USED = {}
 _MAX_CACHE_SIZE = 2  # Maximum number of models to keep in cache
 
+# How long each model took to load, and from where
+_LOAD_STATS: Dict[str, Dict[str, Any]] = {}
+
+# Written last into an artifact directory, so a partial snapshot is never loaded
+ARTIFACT_MARKER = "ennchan_rag_artifact.json"
+
 def get_model(
-    model_id: str, 
-    task: str = "text-generation", 
+    model_id: str,
+    task: str = "text-generation",
     pipeline_kwargs: Optional[Dict[str, Any]] = None,
-    model_kwargs: Optional[Dict[str, Any]] = None
+    model_kwargs: Optional[Dict[str, Any]] = None,
+    artifact_dir: Optional[str] = None,
+    torch_dtype: Optional[str] = None
 ) -> HuggingFacePipeline:
     """
     Get a model from cache or load it if not cached.
-    
+
+    Text-generation models are loaded with low_cpu_mem_usage, so safetensors
+    weights are memory-mapped instead of being read into RAM and copied. The
+    tokenizer, config and weights are looked up in the local Hugging Face
+    cache before contacting the hub. With an artifact_dir and a torch_dtype
+    to convert to, the first load also writes a safetensors snapshot in that
+    dtype that later processes load directly; without a conversion the
+    checkpoint in the Hugging Face cache is loaded as is.
+
     Args:
         model_id: The Hugging Face model ID
         task: The task for the pipeline
         pipeline_kwargs: Keyword arguments for the pipeline
         model_kwargs: Keyword arguments for the model
-        
+        artifact_dir: Directory of converted model snapshots, or None
+        torch_dtype: "float32", "bfloat16", "float16", "auto" for the
+            checkpoint's dtype, or None for the default; only the first
+            three are snapshotted
+
     Returns:
         The HuggingFacePipeline instance
     """
     # Create a cache key from the parameters
     cache_key = f"{model_id}_{task}"
-    
+
     # Return cached model if available
     if cache_key in _MODEL_CACHE:
         print(f"Using cached model: {model_id}")
         _LAST_USED[cache_key] = time.time()
         return _MODEL_CACHE[cache_key]
-    
+
     # If cache is full, remove least recently used model
     if len(_MODEL_CACHE) >= _MAX_CACHE_SIZE:
         lru_key = min(_LAST_USED.items(), key=lambda x: x[1])[0]
         print(f"Cache full, removing model: {lru_key}")
         del _MODEL_CACHE[lru_key]
         del _LAST_USED[lru_key]
-    
+
     # Load the model
     print(f"Loading model: {model_id}")
     pipeline_kwargs = pipeline_kwargs or {}
     model_kwargs = model_kwargs or {}
-    
-    model = HuggingFacePipeline.from_model_id(
-        model_id=model_id,
-        task=task,
-        pipeline_kwargs=pipeline_kwargs,
-        model_kwargs=model_kwargs,
-    )
-    
+    start = time.perf_counter()
+
+    if task == "text-generation":
+        model, source = _load_text_generation(
+            model_id, pipeline_kwargs, model_kwargs, artifact_dir, torch_dtype)
+    else:
+        model = HuggingFacePipeline.from_model_id(
+            model_id=model_id,
+            task=task,
+            pipeline_kwargs=pipeline_kwargs,
+            model_kwargs=model_kwargs,
+        )
+        source = "hub"
+
+    seconds = time.perf_counter() - start
+    _LOAD_STATS[cache_key] = {
+        "seconds": seconds,
+        "source": source,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    print(f"Loaded {model_id} from {source} in {seconds:.1f}s")
+
     # Cache the model
     _MODEL_CACHE[cache_key] = model
     _LAST_USED[cache_key] = time.time()
-    
+
     return model
+
+def load_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Report how the models of this process were loaded.
+
+    Returns:
+        Load seconds, source ("artifact", "local" or "hub") and the process
+        peak RSS after loading, keyed by model and task
+    """
+    return {key: dict(stats) for key, stats in _LOAD_STATS.items()}
+
+def artifact_path(artifact_dir: str, model_id: str, torch_dtype: str) -> str:
+    """Return the snapshot directory of a model in a given dtype."""
+    name = re.sub(r"[^\w.-]", "_", model_id)
+    return os.path.join(os.path.expanduser(artifact_dir), f"{name}-{torch_dtype}")
+
+def _load_text_generation(
+    model_id: str,
+    pipeline_kwargs: Dict[str, Any],
+    model_kwargs: Dict[str, Any],
+    artifact_dir: Optional[str],
+    torch_dtype: Optional[str]
+) -> Tuple[HuggingFacePipeline, str]:
+    """Load a causal LM pipeline from its snapshot, the local cache or the hub."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+    model_kwargs = {"low_cpu_mem_usage": True, **model_kwargs}
+    if torch_dtype:
+        model_kwargs.setdefault("torch_dtype", torch_dtype if torch_dtype == "auto" else getattr(torch, torch_dtype))
+    # Only a dtype conversion is worth a snapshot; the default and "auto"
+    # dtypes load the cached checkpoint as is, and quantized weights are
+    # produced at load time
+    path = None
+    if artifact_dir and torch_dtype not in (None, "auto") and "quantization_config" not in model_kwargs:
+        path = artifact_path(artifact_dir, model_id, torch_dtype)
+
+    if path and os.path.exists(os.path.join(path, ARTIFACT_MARKER)):
+        tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+        model = AutoModelForCausalLM.from_pretrained(
+            path, local_files_only=True, use_safetensors=True, **model_kwargs)
+        source = "artifact"
+    else:
+        tokenizer, local = _from_pretrained_local_first(AutoTokenizer, model_id)
+        model, local = _from_pretrained_local_first(AutoModelForCausalLM, model_id, **model_kwargs)
+        source = "local" if local else "hub"
+        if path:
+            # Named by the dtype the weights actually have after loading
+            dtype = str(model.dtype).replace("torch.", "")
+            _write_artifact(artifact_path(artifact_dir, model_id, dtype), model, tokenizer, model_id)
+
+    pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    return HuggingFacePipeline(pipeline=pipe, model_id=model_id, pipeline_kwargs=pipeline_kwargs), source
+
+def _from_pretrained_local_first(cls, model_id: str, **kwargs) -> Tuple[Any, bool]:
+    """Load from the local Hugging Face cache, and only contact the hub if that fails."""
+    try:
+        return cls.from_pretrained(model_id, local_files_only=True, **kwargs), True
+    except OSError:
+        return cls.from_pretrained(model_id, **kwargs), False
+
+def _write_artifact(path: str, model, tokenizer, model_id: str) -> None:
+    """Save a safetensors snapshot of a loaded model, replacing any partial one."""
+    import json
+
+    print(f"Writing model snapshot to {path}")
+    tmp_path = path + ".tmp"
+    try:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        model.save_pretrained(tmp_path, safe_serialization=True)
+        tokenizer.save_pretrained(tmp_path)
+        with open(os.path.join(tmp_path, ARTIFACT_MARKER), "w", encoding="utf-8") as f:
+            json.dump({"model_id": model_id, "dtype": str(model.dtype), "created": time.time()}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not write model snapshot: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
@@ -0,0 +1,106 @@
+import sys
+import threading
+import tracemalloc
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of the process in bytes, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryProfile:
+    """
+    Context manager measuring the peak Python heap usage of a block.
+
+    Uses tracemalloc, so only allocations made by Python objects are counted;
+    tensors allocated by native libraries such as torch are not. Tracing
+    slows Python allocations down, so profile requests only when asked to.
+
+    Example:
+        with MemoryProfile() as profile:
+            model.graph.invoke({"question": question})
+        print(profile.peak_mib)
+    """
+
+    def __init__(self):
+        self.peak_bytes: Optional[int] = None
+        self.retained_bytes: Optional[int] = None
+        self._was_tracing = False
+        self._start_bytes = 0
+
+    def __enter__(self) -> "MemoryProfile":
+        self._was_tracing = tracemalloc.is_tracing()
+        if not self._was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._start_bytes = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = peak - self._start_bytes
+        self.retained_bytes = current - self._start_bytes
+        if not self._was_tracing:
+            tracemalloc.stop()
+
+    @property
+    def peak_mib(self) -> float:
+        """Peak memory above the starting point in MiB."""
+        return (self.peak_bytes or 0) / (1024 * 1024)
+
+
+class LatencyStats:
+    """
+    Rolling window of request latencies with tail percentiles.
+
+    Example:
+        latency = LatencyStats()
+        latency.record(3.2)
+        print(latency.percentiles()["p95"])
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Initialize the latency window.
+
+        Args:
+            window: Number of most recent requests the percentiles cover
+        """
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Record the latency of one request."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentiles(self) -> Dict[str, float]:
+        """
+        Report the latency distribution of the window.
+
+        Returns:
+            Dictionary with the request count and the p50, p95, p99 and
+            maximum latency in seconds
+        """
+        with self._lock:
+            samples = np.asarray(self._samples, dtype=np.float64)
+        if not len(samples):
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "count": len(samples),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(samples.max()),
+        }
@@ -0,0 +1,277 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.prompt_values import PromptValue
+
+from ennchan_rag.core import prompts
+from ennchan_rag.core.generation import GenerationConfig
+from ennchan_rag.core.interfaces import LLMInterface
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Pipeline stage of an LLM call, told apart by its prompt's prefix
+STAGE_PREFIXES = {
+    prompts.CLASSIFY_PREFIX: "classify",
+    prompts.QUERY_PREFIX: "query",
+    prompts.SUMMARY_PREFIX: "summary",
+    prompts.COMPILE_PREFIX: "compile",
+    prompts.STRATEGY_PREFIX: "strategy",
+    prompts.REWRITE_PREFIX: "rewrite",
+}
+
+
+def prompt_stage(prompt: str) -> str:
+    """Return the pipeline stage of a prompt, "answer" for prompts without a known prefix."""
+    return next((stage for prefix, stage in STAGE_PREFIXES.items() if prompt.startswith(prefix)), "answer")
+
+
+class Cassette:
+    """
+    On-disk recording of the LLM and web search calls of a pipeline.
+
+    Each call is one JSON line of a gzip file: its kind, the hash of its
+    input, the input itself, the output and the seconds it took. Recording
+    appends and flushes every call, so an interrupted run keeps what it
+    recorded, and the file is finished on close or at exit. Calls are
+    numbered by the request they belong to, see begin_request.
+
+    Replaying returns each recording once, in recorded order: a call gets
+    the next unused recording of the same input. An input that was never
+    recorded, like an answer prompt whose context changed with the retrieval
+    code, gets the next unused recording of the same stage instead,
+    preferably from the same request, unless the cassette is strict. Only a
+    repeated input replays a used recording, once all of its are used.
+
+    Example:
+        cassette = Cassette("run.jsonl.gz", mode=RECORD)
+        llm = RecordingLLM(llm, cassette)
+        ...
+        cassette = Cassette("run.jsonl.gz", mode=REPLAY, latency_scale=1.0)
+        llm = RecordingLLM(None, cassette)
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, latency_scale: float = 0.0, strict: bool = False):
+        """
+        Initialize the cassette.
+
+        Args:
+            path: Cassette file; recording appends to it
+            mode: RECORD to call the backends and store their outputs, REPLAY
+                to return the stored outputs without calling them
+            latency_scale: Replayed calls sleep for this share of their
+                recorded seconds; 0 replays instantly
+            strict: Raise KeyError on replaying an input that was not recorded
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Cassette mode must be '{RECORD}' or '{REPLAY}', got '{mode}'")
+        self.path = os.path.expanduser(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._file = None
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_stage: Dict[str, List[Dict[str, Any]]] = {}
+        self._used: set = set()
+        self._request = 0
+        self.stats = {"recorded": 0, "replayed": 0, "missed": 0, "recorded_seconds": 0.0}
+
+        if mode == REPLAY:
+            for position, entry in enumerate(self._read()):
+                entry["position"] = position
+                entry.setdefault("request", 0)
+                self._by_key.setdefault(entry["key"], []).append(entry)
+                self._by_stage.setdefault(entry["stage"], []).append(entry)
+        else:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = gzip.open(self.path, "at", encoding="utf-8")
+            atexit.register(self.close)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    def begin_request(self) -> None:
+        """Start the next request; its calls are recorded, and replayed, as a group."""
+        with self._lock:
+            self._request += 1
+
+    @staticmethod
+    def key(kind: str, text: str) -> str:
+        """Hash of a call's input."""
+        return hashlib.sha1(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def record(self, kind: str, stage: str, text: str, output: Any, seconds: float) -> None:
+        """
+        Store a call.
+
+        Args:
+            kind: "llm" or "search"
+            stage: Pipeline stage of the call
+            text: The prompt or search query
+            output: What the backend returned
+            seconds: How long the call took
+        """
+        entry = {"kind": kind, "stage": stage, "key": self.key(kind, text), "input": text,
+                 "output": output, "seconds": round(seconds, 4)}
+        with self._lock:
+            entry["request"] = self._request
+            line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.stats["recorded"] += 1
+            self.stats["recorded_seconds"] += seconds
+
+    def play(self, kind: str, stage: str, text: str, max_seconds: Optional[float] = None) -> Any:
+        """
+        Return the recorded output of a call, sleeping for its scaled latency.
+
+        Args:
+            kind: "llm" or "search"
+            stage: Pipeline stage of the call
+            text: The prompt or search query
+            max_seconds: Upper bound on the simulated latency
+
+        Returns:
+            The recorded output
+        """
+        key = self.key(kind, text)
+        with self._lock:
+            entry = self._take(self._by_key.get(key, []))
+            if entry is not None:
+                self.stats["replayed"] += 1
+            elif key in self._by_key:
+                # Asked again after every recording was used: repeat the last
+                entry = self._by_key[key][-1]
+                self.stats["replayed"] += 1
+            elif not self.strict:
+                entry = self._take(self._by_stage.get(stage, []))
+                self.stats["missed"] += 1
+            if entry is None:
+                raise KeyError(f"No unused recorded {kind} call for {stage} input: {text[:80]!r}")
+
+        seconds = entry["seconds"] * self.latency_scale
+        if max_seconds is not None:
+            seconds = min(seconds, max_seconds)
+        if seconds > 0:
+            time.sleep(seconds)
+        return entry["output"]
+
+    def close(self) -> None:
+        """Finish the cassette file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._by_key.values())
+
+    def _take(self, entries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Mark the first unused entry, preferably of the current request, as used and return it."""
+        unused = [entry for entry in entries if entry["position"] not in self._used]
+        entry = next((entry for entry in unused if entry["request"] == self._request), None)
+        if entry is None and unused:
+            entry = unused[0]
+        if entry is not None:
+            self._used.add(entry["position"])
+        return entry
+
+    def _read(self) -> List[Dict[str, Any]]:
+        """Read the recorded calls, up to the last complete one of an interrupted recording."""
+        entries = []
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as file:
+                for line in file:
+                    entries.append(json.loads(line))
+        except (EOFError, zlib.error, json.JSONDecodeError) as e:
+            print(f"Cassette {self.path} is truncated, replaying its first {len(entries)} calls: {e}")
+        return entries
+
+
+class RecordingLLM(LLMInterface):
+    """
+    LLM wrapper that records calls to a cassette or replays them from it.
+
+    When replaying, the wrapped LLM is not needed and not called, so the
+    pipeline runs offline with the recorded outputs and, optionally, their
+    recorded latencies.
+    """
+
+    def __init__(self, llm: Optional[LLMInterface], cassette: Cassette):
+        """
+        Initialize the wrapper.
+
+        Args:
+            llm: The LLM to record, or None when replaying
+            cassette: Cassette to record to or replay from
+        """
+        if cassette.recording and llm is None:
+            raise ValueError("Recording needs an LLM to record")
+        self.llm = llm
+        self.cassette = cassette
+        self._stats = {"calls": 0, "prefix_hits": 0, "prefill_tokens": 0, "prefill_tokens_saved": 0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Statistics of the wrapped LLM, or replay call counts without one."""
+        return self.llm.stats if self.llm is not None else self._stats
+
+    @property
+    def speculative(self) -> bool:
+        return self.llm is not None and getattr(self.llm, "speculative", False)
+
+    def register_prefix(self, prefix: str) -> None:
+        if self.llm is not None and hasattr(self.llm, "register_prefix"):
+            self.llm.register_prefix(prefix)
+
+    def invoke(self, messages, generation: Optional[GenerationConfig] = None) -> str:
+        prompt = messages.to_string() if isinstance(messages, PromptValue) else str(messages)
+        stage = prompt_stage(prompt)
+        if not self.cassette.recording:
+            self._stats["calls"] += 1
+            return self.cassette.play("llm", stage, prompt,
+                                      max_seconds=generation.max_time if generation is not None else None)
+
+        start = time.perf_counter()
+        if isinstance(self.llm, LLMInterface):
+            output = self.llm.invoke(messages, generation=generation)
+        else:
+            output = self.llm.invoke(messages)
+        self.cassette.record("llm", stage, prompt, output, time.perf_counter() - start)
+        return output
+
+
+class RecordingSearch:
+    """Web search wrapper that records results to a cassette or replays them from it."""
+
+    def __init__(self, search: Optional[Callable[[str, Optional[Dict]], List[Dict]]], cassette: Cassette):
+        """
+        Initialize the wrapper.
+
+        Args:
+            search: Web search function taking a query and the search config,
+                or None when replaying
+            cassette: Cassette to record to or replay from
+        """
+        if cassette.recording and search is None:
+            raise ValueError("Recording needs a search function to record")
+        self.search = search
+        self.cassette = cassette
+
+    def __call__(self, query: str, config: Optional[Dict] = None) -> List[Dict]:
+        if not self.cassette.recording:
+            return self.cassette.play("search", "search", query)
+
+        start = time.perf_counter()
+        results = self.search(query, config)
+        self.cassette.record("search", "search", query, results, time.perf_counter() - start)
+        return results
@@ -0,0 +1,205 @@
+import hashlib
+import math
+import re
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.prompt_values import PromptValue
+
+from ennchan_rag.core import prompts
+from ennchan_rag.core.generation import GenerationConfig
+from ennchan_rag.core.interfaces import LLMInterface
+
+# Seconds each stub LLM stage takes, keyed by the stage's prompt prefix
+STUB_LLM_LATENCIES = {
+    prompts.CLASSIFY_PREFIX: 0.1,
+    prompts.QUERY_PREFIX: 0.2,
+    prompts.SUMMARY_PREFIX: 0.4,
+    prompts.COMPILE_PREFIX: 0.4,
+    prompts.STRATEGY_PREFIX: 0.05,
+    prompts.REWRITE_PREFIX: 0.1,
+}
+
+
+class StubLLM(LLMInterface):
+    """
+    LLM stand-in that sleeps for a fixed time per stage and answers plausibly.
+
+    Lets the pipeline's scheduling be measured without a model: each call
+    takes the latency configured for its prompt's prefix, so the wall time
+    of a request is decided by which stages overlap.
+    """
+
+    def __init__(self,
+                 latencies: Optional[Dict[str, float]] = None,
+                 answer_latency: float = 0.4,
+                 queries: Sequence[str] = ("stub search query one", "stub search query two",
+                                           "stub search query three")):
+        """
+        Initialize the stub LLM.
+
+        Args:
+            latencies: Seconds per call, keyed by prompt prefix
+            answer_latency: Seconds for prompts without a known prefix, i.e. the answer
+            queries: Search queries returned for the query planning prompt
+        """
+        self.latencies = {**STUB_LLM_LATENCIES, **(latencies or {})}
+        self.answer_latency = answer_latency
+        self.queries = list(queries)
+        self.calls: Dict[str, int] = {}
+
+    def invoke(self, messages, generation: Optional[GenerationConfig] = None) -> str:
+        prompt = messages.to_string() if isinstance(messages, PromptValue) else str(messages)
+        prefix = next((prefix for prefix in self.latencies if prompt.startswith(prefix)), None)
+        seconds = self.latencies[prefix] if prefix is not None else self.answer_latency
+        if generation is not None and generation.max_time is not None:
+            seconds = min(seconds, generation.max_time)
+        time.sleep(seconds)
+        self.calls[prefix or "answer"] = self.calls.get(prefix or "answer", 0) + 1
+
+        if prefix == prompts.CLASSIFY_PREFIX:
+            return "EXPLANATION"
+        if prefix == prompts.QUERY_PREFIX:
+            return "[" + ", ".join(f'"{query}"' for query in self.queries) + "]"
+        if prefix == prompts.STRATEGY_PREFIX:
+            return "1"
+        if prefix == prompts.REWRITE_PREFIX:
+            # Already standalone: repeat the follow-up
+            match = re.search(r"Follow-up question: (.*)", prompt)
+            return match.group(1) if match else ""
+        return f"Stub text for a prompt of {len(prompt)} characters."
+
+
+class StubEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words embeddings that sleep per text embedded."""
+
+    def __init__(self, size: int = 64, seconds_per_text: float = 0.005):
+        """
+        Initialize the stub embeddings.
+
+        Args:
+            size: Dimension of the vectors
+            seconds_per_text: Simulated cost of embedding one text
+        """
+        self.size = size
+        self.seconds_per_text = seconds_per_text
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.size] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.seconds_per_text * len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class StubSearch:
+    """
+    Web search stand-in returning distinct pages after a per-query delay.
+
+    The n-th query of a request takes latency * (1 + n * spread) seconds, so
+    results arrive staggered as they do from a real search backend.
+    """
+
+    def __init__(self, latency: float = 0.5, spread: float = 0.5, results_per_query: int = 3):
+        """
+        Initialize the stub search.
+
+        Args:
+            latency: Seconds the fastest query takes
+            spread: Extra fraction of latency each following query takes
+            results_per_query: Pages returned per query
+        """
+        self.latency = latency
+        self.spread = spread
+        self.results_per_query = results_per_query
+        self._order: Dict[str, int] = {}
+
+    def __call__(self, query: str, config: Optional[Dict] = None) -> List[Dict]:
+        position = self._order.setdefault(query, len(self._order) % 8)
+        time.sleep(self.latency * (1 + position * self.spread))
+        return [
+            {
+                "url": f"https://example.com/{position}/{i}",
+                "title": f"{query} ({i})",
+                "content": " ".join(f"{query} page {i} sentence {j} with word{position}_{i}_{j}."
+                                    for j in range(40)),
+                "query": query,
+            }
+            for i in range(self.results_per_query)
+        ]
+
+
+def benchmark_pipeline(questions: Sequence[str] = ("How does the stub pipeline work?",),
+                       repeats: int = 3,
+                       llm_latencies: Optional[Dict[str, float]] = None,
+                       search_latency: float = 0.5,
+                       embedding_seconds: float = 0.005,
+                       corpus_size: int = 200) -> List[Dict[str, Any]]:
+    """
+    Measure request latency of the linear and the pipelined graph with stub backends.
+
+    Both modes answer the same questions against the same corpus, stub LLM
+    and stub search, so the difference is only in how the stages overlap.
+
+    Args:
+        questions: Questions asked in each mode
+        repeats: Times each question is asked per mode
+        llm_latencies: Seconds per stub LLM stage, keyed by prompt prefix
+        search_latency: Seconds the fastest stub search query takes
+        embedding_seconds: Seconds the stub embeddings take per text
+        corpus_size: Number of preloaded corpus documents
+
+    Returns:
+        One result per mode with its mean and best request seconds and the
+        mean seconds per stage
+    """
+    # Imported here, the model imports these utilities itself
+    from ennchan_rag.core.model import CORPUS_REQUEST_ID, SearchAugmentedQAModel
+    from ennchan_rag.stores.memory import ManagedVectorStore
+
+    results = []
+    for pipelined in (False, True):
+        vector_store = ManagedVectorStore(StubEmbeddings(seconds_per_text=embedding_seconds))
+        vector_store.add_documents([
+            Document(page_content=f"Corpus document {i} about topic{i % 20} and the stub pipeline.",
+                     metadata={"source": "corpus", "request_id": CORPUS_REQUEST_ID})
+            for i in range(corpus_size)
+        ])
+        model = SearchAugmentedQAModel(
+            llm=StubLLM(latencies=llm_latencies),
+            vector_store=vector_store,
+            prompt_source="stub",
+            context_scope=4,
+            search=StubSearch(latency=search_latency),
+            pipelined=pipelined,
+        )
+
+        seconds: List[float] = []
+        stages: Dict[str, List[float]] = {}
+        for question in questions:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                state = model.graph.invoke({"question": question})
+                seconds.append(time.perf_counter() - start)
+                for stage, stage_seconds in (state.get("timings") or {}).items():
+                    stages.setdefault(stage, []).append(stage_seconds)
+
+        results.append({
+            "mode": "pipelined" if pipelined else "linear",
+            "requests": len(seconds),
+            "mean_seconds": statistics.mean(seconds),
+            "best_seconds": min(seconds),
+            "stages": {stage: statistics.mean(values) for stage, values in stages.items()},
+        })
+    return results
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+class SummaryCache:
+    """
+    Persistent cache of page summaries in SQLite.
+
+    Summaries are keyed by the summarizing model and the settings that shape
+    a summary, such as its prompt template and the passage extraction, the
+    hash of the page content and a bucket of the question. With a question
+    embedding the bucket is a random-hyperplane LSH signature, so
+    near-identical questions share summaries; without one it falls back to
+    the question type. Entries of another model or other settings, and
+    entries unused for max_age seconds, are dropped when the cache is
+    opened, and the least recently used entries are evicted beyond
+    max_entries.
+
+    Example:
+        cache = SummaryCache("summaries.sqlite", model="my-model",
+                             settings={"prompt": SUMMARY_PROMPT})
+        bucket = cache.bucket(question_embedding, "FACTUAL")
+        summary = cache.get(page_hash, bucket)
+        if summary is None:
+            cache.put(page_hash, bucket, summarize(page))
+    """
+
+    def __init__(self,
+                 path: str,
+                 model: str,
+                 settings: Optional[Dict[str, Any]] = None,
+                 max_entries: int = 10000,
+                 max_age: Optional[float] = 7 * 24 * 3600,
+                 bucket_bits: int = 16,
+                 seed: int = 0):
+        """
+        Initialize the summary cache.
+
+        Args:
+            path: SQLite database file, created if missing
+            model: Name of the model producing the summaries
+            settings: JSON-serializable settings the summaries depend on,
+                like the summary prompt template and the extractor options
+            max_entries: Maximum number of cached summaries
+            max_age: Seconds an unused summary is kept, or None to keep it
+                until evicted
+            bucket_bits: Hyperplanes of the question LSH; fewer bits make
+                more questions share a bucket, and so a summary written for
+                another question
+            seed: Seed of the hyperplanes, fixed so buckets survive restarts
+        """
+        self.path = os.path.expanduser(path)
+        self.model = model
+        self.settings = settings or {}
+        # Stored in the model column, so a changed setting invalidates like a changed model
+        digest = hashlib.sha1(json.dumps(self.settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self.signature = f"{model}@{digest}"
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.bucket_bits = bucket_bits
+        self.seed = seed
+        self._planes: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "invalidated": 0}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " model TEXT NOT NULL,"
+                " content_hash TEXT NOT NULL,"
+                " bucket TEXT NOT NULL,"
+                " summary TEXT NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (model, content_hash, bucket))")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+            # Summaries of another model or prompt no longer match what it would write
+            cursor = self._conn.execute("DELETE FROM summaries WHERE model != ?", (self.signature,))
+            self.stats["invalidated"] = cursor.rowcount
+            if max_age is not None:
+                cursor = self._conn.execute("DELETE FROM summaries WHERE last_used < ?", (time.time() - max_age,))
+                self.stats["evicted"] += cursor.rowcount
+            self._evict_excess()
+
+    def bucket(self, question_embedding: Optional[Sequence[float]] = None, question_type: str = "") -> str:
+        """
+        Bucket of a question.
+
+        Args:
+            question_embedding: Embedding of the question, or None
+            question_type: Question type used when there is no embedding
+
+        Returns:
+            "lsh:<signature>" for an embedding, "type:<question type>" otherwise
+        """
+        if question_embedding is None:
+            return f"type:{question_type}"
+        vector = np.asarray(question_embedding, dtype=np.float32)
+        if self._planes is None or self._planes.shape[1] != len(vector):
+            self._planes = np.random.default_rng(self.seed).standard_normal(
+                (self.bucket_bits, len(vector))).astype(np.float32)
+        bits = (self._planes @ vector) > 0
+        return f"lsh:{len(vector)}:" + "".join("1" if bit else "0" for bit in bits)
+
+    def get(self, content_hash: str, bucket: str) -> Optional[str]:
+        """Return the cached summary of a page for a question bucket, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE model = ? AND content_hash = ? AND bucket = ?",
+                (self.signature, content_hash, bucket)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE summaries SET last_used = ? WHERE model = ? AND content_hash = ? AND bucket = ?",
+                    (time.time(), self.signature, content_hash, bucket))
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, content_hash: str, bucket: str, summary: str) -> None:
+        """Store the summary of a page for a question bucket, evicting the least recently used."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (model, content_hash, bucket, summary, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.signature, content_hash, bucket, summary, time.time()))
+            self.stats["stores"] += 1
+            self._evict_excess()
+
+    def _evict_excess(self) -> None:
+        """Delete the least recently used summaries beyond max_entries; call within a transaction."""
+        excess = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM summaries WHERE rowid IN "
+                "(SELECT rowid FROM summaries ORDER BY last_used LIMIT ?)", (excess,))
+            self.stats["evicted"] += cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def hit_rate(self) -> float:
+        """Share of lookups answered from the cache."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
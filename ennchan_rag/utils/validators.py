@@ -1,13 +1,17 @@
 from pathlib import Path
-import validators
+from urllib.parse import urlparse
 
 
 def is_url(string):
-    """Check if a string is a valid URL."""
-    return validators.url(string) is True
+    """Check if a string is an http(s) URL, including hosts without a domain like localhost."""
+    try:
+        parsed = urlparse(string)
+    except (TypeError, ValueError):
+        return False
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
 
 
 def is_local_path(string):
     """Check if a string is a valid local path."""
     path = Path(string)
-    return path.exists()
\ No newline at end of file
+    return path.exists()
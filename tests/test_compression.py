@@ -0,0 +1,30 @@
+from langchain_core.documents import Document
+
+from ennchan_rag.core.compression import ContextCompressor
+from ennchan_rag.core.model import QAModel
+from ennchan_rag.utils.stubs import StubEmbeddings, StubLLM
+
+
+class CountingEmbeddings(StubEmbeddings):
+    def __init__(self):
+        super().__init__(size=16, seconds_per_text=0.0)
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_compression_only_embeds_what_reaches_the_prompt():
+    embeddings = CountingEmbeddings()
+    model = QAModel(StubLLM(), None, "prompt", context_scope=1000,
+                    compressor=ContextCompressor(embeddings, ratio=0.5, min_tokens=10))
+    # A whole web page of 5000 sentences, as the search step indexes it
+    page = " ".join(f"Sentence number {i} is about the stub topic." for i in range(5000))
+
+    update = model.compress_context({"question": "What is the stub topic?", "context": [Document(page_content=page)]})
+    stats = update["compression_stats"]
+    # The sentences of the first 1000 characters, and the question
+    assert stats["sentences"] < 30
+    assert embeddings.embedded <= stats["sentences"] + 1
+    assert sum(len(doc.page_content) for doc in update["context"]) <= 1000
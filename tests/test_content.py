@@ -0,0 +1,34 @@
+import pytest
+
+from ennchan_rag.core.model import SearchAugmentedQAModel
+from ennchan_rag.core.planner import PipelinePlanner
+from ennchan_rag.stores import ManagedVectorStore
+from ennchan_rag.utils.stubs import StubEmbeddings, StubLLM, StubSearch
+
+
+class FailingPlanner(PipelinePlanner):
+    """Fails the plan_pipeline node, after the search stored the page bodies."""
+
+    def plan(self, *args, **kwargs):
+        raise RuntimeError("planner failed")
+
+
+def test_pages_are_released_when_a_node_raises():
+    model = SearchAugmentedQAModel(
+        llm=StubLLM(),
+        vector_store=ManagedVectorStore(StubEmbeddings(size=16, seconds_per_text=0.0)),
+        prompt_source="stub",
+        context_scope=1000,
+        planner=FailingPlanner(),
+        search=StubSearch(latency=0.0),
+        pipelined=False,
+    )
+    stored = []
+    put = model.content_store.put
+    model.content_store.put = lambda owner, text: stored.append(owner) or put(owner, text)
+
+    with pytest.raises(RuntimeError):
+        for _ in model.stream({"question": "What does the stub search return?"}):
+            pass
+    assert stored
+    assert model.content_store.stats()["contents"] == 0
@@ -0,0 +1,11 @@
+import pytest
+
+from ennchan_rag.utils import SearchResultDeduplicator
+
+
+def test_distances_beyond_the_banded_lookup_are_rejected():
+    SearchResultDeduplicator(max_distance=SearchResultDeduplicator.BANDS - 1)
+    with pytest.raises(ValueError):
+        SearchResultDeduplicator(max_distance=SearchResultDeduplicator.BANDS)
+    with pytest.raises(ValueError):
+        SearchResultDeduplicator(max_distance=-1)
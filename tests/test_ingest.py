@@ -0,0 +1,46 @@
+import os
+
+from ennchan_rag.ingest import Ingestor
+from ennchan_rag.utils.stubs import StubEmbeddings
+
+
+class RecordingIngestor(Ingestor):
+    """Embeds with stub embeddings in this process and records the index at every checkpoint."""
+
+    def __init__(self, index_dir):
+        super().__init__(index_dir, {"model_name": "stub"}, chunk_size=40, chunk_overlap=0,
+                         workers=0, batch_size=2, checkpoint_seconds=0.0)
+        self.checkpoints = []
+
+    def _local_embeddings(self):
+        return StubEmbeddings(size=16, seconds_per_text=0.0)
+
+    def _checkpoint(self, store):
+        self.checkpoints.append(sorted(doc.page_content for doc in store.get_all_documents()))
+        super()._checkpoint(store)
+
+
+def write_lines(path, word):
+    path.write_text("\n".join(f"{word} line number {i} of the file" for i in range(8)), encoding="utf-8")
+
+
+def test_changed_source_is_never_saved_half_replaced(tmp_path):
+    source = tmp_path / "notes.txt"
+    write_lines(source, "old")
+    first = RecordingIngestor(str(tmp_path / "index")).ingest([str(source)])
+    assert first["sources"] == 1 and first["sources_per_second"] > 0
+
+    write_lines(source, "new")
+    os.utime(source, (1, 1))
+    ingestor = RecordingIngestor(str(tmp_path / "index"))
+    stats = ingestor.ingest([str(source)])
+
+    assert stats["sources"] == 1
+    old_chunks = [text for text in ingestor.checkpoints[0] if text.startswith("old")]
+    assert len(old_chunks) == 8
+    assert len(ingestor.checkpoints) > 2
+    for texts in ingestor.checkpoints[:-1]:
+        # Until the new content is complete, every old chunk stays
+        assert [text for text in texts if text.startswith("old")] == old_chunks
+    assert all(text.startswith("new") for text in ingestor.checkpoints[-1])
+    assert len(ingestor.checkpoints[-1]) == 8
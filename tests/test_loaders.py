@@ -0,0 +1,125 @@
+import os
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ennchan_rag.loaders import MultiWebLoader, TextLoaderAdapter
+from ennchan_rag.loaders.http_cache import CachedResponse, HTTPCache
+from ennchan_rag.loaders.sources import load_sources
+from ennchan_rag.utils.validators import is_url
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    """Serves pages validated by ETag or by Last-Modified, answering conditional GETs with 304."""
+    # Path -> (body, validators)
+    pages = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path not in self.pages:
+            self.send_error(404)
+            return
+        body, headers = self.pages[self.path]
+        self.requests.append((self.path, dict(self.headers)))
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if (etag and self.headers.get("If-None-Match") == etag) or \
+                (last_modified and self.headers.get("If-Modified-Since") == last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# Keep only the paragraphs, leaving out the title
+EXTRACTORS = {"localhost": {"name": "p"}}
+
+
+def page(title, text):
+    return f"<html><head><title>{title}</title></head><body><p>{text}</p></body></html>"
+
+
+@pytest.fixture
+def site():
+    handler = type("Handler", (StubSiteHandler,), {"requests": [], "pages": {
+        "/etag.html": (page("ETag page", "Validated by ETag."), {"ETag": '"v1"'}),
+        "/modified.html": (page("Modified page", "Validated by date."),
+                           {"Last-Modified": formatdate(0, usegmt=True)}),
+    }})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield handler, f"http://localhost:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_is_url_accepts_hosts_without_a_domain():
+    assert is_url("http://localhost:8000/doc.html")
+    assert is_url("https://en.wikipedia.org/wiki/World_War_II")
+    assert not is_url("docs/notes.txt")
+    assert not is_url("ftp://example.com/file")
+
+
+def test_load_sources_fetches_localhost_urls(site):
+    handler, url = site
+    docs = list(load_sources([f"{url}/etag.html"], extractors=EXTRACTORS))
+    assert [doc.page_content for doc in docs] == ["Validated by ETag."]
+    assert docs[0].metadata == {"source": f"{url}/etag.html", "title": "ETag page"}
+
+
+def test_cached_pages_are_revalidated(site, tmp_path):
+    handler, url = site
+    urls = [f"{url}/etag.html", f"{url}/modified.html"]
+
+    first = MultiWebLoader(urls, extractors=EXTRACTORS, cache_dir=str(tmp_path))
+    assert sorted(doc.page_content for doc in first.load()) == ["Validated by ETag.", "Validated by date."]
+    assert first.stats == {"fetched": 2, "not_modified": 0, "failed": 0}
+
+    second = MultiWebLoader(urls, extractors=EXTRACTORS, cache_dir=str(tmp_path))
+    assert sorted(doc.page_content for doc in second.load()) == ["Validated by ETag.", "Validated by date."]
+    assert second.stats == {"fetched": 0, "not_modified": 2, "failed": 0}
+    conditional = {path: headers for path, headers in handler.requests[2:]}
+    assert conditional["/etag.html"]["If-None-Match"] == '"v1"'
+    assert conditional["/modified.html"]["If-Modified-Since"] == formatdate(0, usegmt=True)
+
+
+def test_changed_pages_are_downloaded_again(site, tmp_path):
+    handler, url = site
+    MultiWebLoader([f"{url}/etag.html"], extractors=EXTRACTORS, cache_dir=str(tmp_path)).load()
+    handler.pages["/etag.html"] = (page("ETag page", "Changed."), {"ETag": '"v2"'})
+
+    loader = MultiWebLoader([f"{url}/etag.html"], extractors=EXTRACTORS, cache_dir=str(tmp_path))
+    assert [doc.page_content for doc in loader.load()] == ["Changed."]
+    assert loader.stats["fetched"] == 1
+
+
+def test_text_loader_detects_the_encoding(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(("Это тестовый текст о погоде в городе, написанный для проверки загрузчика.\n" * 40)
+                     .encode("cp1251"))
+
+    docs = TextLoaderAdapter(str(path)).load()
+    assert "тестовый текст" in docs[0].page_content
+    with pytest.raises(UnicodeDecodeError):
+        TextLoaderAdapter(str(path), autodetect_encoding=False).load()
+
+
+def test_http_cache_replaces_both_files(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.put(CachedResponse(url="http://localhost/a", body=b"old", etag='"1"'))
+    cache.put(CachedResponse(url="http://localhost/a", body=b"new", etag='"2"'))
+
+    cached = cache.get("http://localhost/a")
+    assert (cached.body, cached.etag) == (b"new", '"2"')
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,58 @@
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from ennchan_rag.retrievers import MultiQueryRetrieval
+from ennchan_rag.stores import ManagedVectorStore
+from ennchan_rag.utils.embeddings import embed_queries
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeds texts by their letter counts and records every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _vector(self, text):
+        return [text.lower().count(letter) + 0.1 for letter in "abcdefgh"]
+
+    def embed_documents(self, texts):
+        self.calls.append(("documents", len(texts)))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append(("query", 1))
+        return self._vector(text)
+
+
+class BatchedQueryEmbeddings(CountingEmbeddings):
+    def embed_queries(self, texts):
+        self.calls.append(("queries", len(texts)))
+        return [self._vector(text) for text in texts]
+
+
+def test_queries_are_embedded_in_one_batch():
+    embeddings = BatchedQueryEmbeddings()
+    store = ManagedVectorStore(embeddings)
+    store.add_texts(["abba", "cafe", "head"])
+    embeddings.calls.clear()
+
+    docs = MultiQueryRetrieval(queries=["cab", "hedge"], k=2).retrieve("bad", store)
+    assert len(docs) == 2
+    assert embeddings.calls == [("queries", 3)]
+
+
+def test_embedders_without_batched_queries_embed_each_query():
+    embeddings = CountingEmbeddings()
+    assert len(embed_queries(embeddings, ["one", "two"])) == 2
+    assert embeddings.calls == [("query", 1), ("query", 1)]
+
+
+def test_huggingface_queries_use_the_query_encode_kwargs(monkeypatch):
+    embeddings = HuggingFaceEmbeddings.model_construct(
+        encode_kwargs={"batch_size": 8}, query_encode_kwargs={"prompt": "query: "})
+    calls = []
+    monkeypatch.setattr(HuggingFaceEmbeddings, "_embed",
+                        lambda self, texts, kwargs: calls.append((texts, kwargs)) or [[0.0]] * len(texts))
+
+    assert embed_queries(embeddings, ["one", "two"]) == [[0.0], [0.0]]
+    assert calls == [(["one", "two"], {"prompt": "query: "})]
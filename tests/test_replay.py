@@ -0,0 +1,66 @@
+import pytest
+
+from ennchan_rag.core import prompts
+from ennchan_rag.utils.replay import RECORD, REPLAY, Cassette, RecordingLLM, RecordingSearch
+
+
+class ScriptedLLM:
+    def __init__(self, outputs):
+        self.outputs = iter(outputs)
+
+    def invoke(self, messages):
+        return next(self.outputs)
+
+
+def record(path, calls):
+    cassette = Cassette(str(path), mode=RECORD)
+    llm = RecordingLLM(ScriptedLLM([output for _, output in calls]), cassette)
+    for prompt, _ in calls:
+        cassette.begin_request()
+        llm.invoke(prompt)
+    cassette.close()
+
+
+def test_replays_the_recorded_output_of_each_prompt(tmp_path):
+    path = tmp_path / "run.jsonl.gz"
+    record(path, [(prompts.COMPILE_PREFIX + "q1", "Q1 COMPILED"), (prompts.COMPILE_PREFIX + "q2", "Q2 COMPILED")])
+
+    cassette = Cassette(str(path), mode=REPLAY)
+    llm = RecordingLLM(None, cassette)
+    cassette.begin_request()
+    cassette.begin_request()
+    assert llm.invoke(prompts.COMPILE_PREFIX + "q2") == "Q2 COMPILED"
+    assert llm.invoke(prompts.COMPILE_PREFIX + "q1") == "Q1 COMPILED"
+    assert cassette.stats["replayed"] == 2
+
+
+def test_unrecorded_prompt_gets_an_unused_recording_of_its_request(tmp_path):
+    path = tmp_path / "run.jsonl.gz"
+    record(path, [(prompts.COMPILE_PREFIX + "q1", "Q1 COMPILED"), (prompts.COMPILE_PREFIX + "q2", "Q2 COMPILED")])
+
+    cassette = Cassette(str(path), mode=REPLAY)
+    llm = RecordingLLM(None, cassette)
+    cassette.begin_request()
+    assert llm.invoke(prompts.COMPILE_PREFIX + "q1") == "Q1 COMPILED"
+    cassette.begin_request()
+    assert llm.invoke(prompts.COMPILE_PREFIX + "q2 reordered") == "Q2 COMPILED"
+    assert cassette.stats["missed"] == 1
+
+
+def test_strict_cassette_rejects_unrecorded_prompts(tmp_path):
+    path = tmp_path / "run.jsonl.gz"
+    record(path, [(prompts.COMPILE_PREFIX + "q1", "Q1 COMPILED")])
+
+    llm = RecordingLLM(None, Cassette(str(path), mode=REPLAY, strict=True))
+    with pytest.raises(KeyError):
+        llm.invoke(prompts.COMPILE_PREFIX + "q2")
+
+
+def test_search_results_round_trip(tmp_path):
+    path = tmp_path / "run.jsonl.gz"
+    results = [{"url": "https://example.com/1", "title": "One", "content": "text"}]
+    cassette = Cassette(str(path), mode=RECORD)
+    assert RecordingSearch(lambda query, config: results, cassette)("query") == results
+    cassette.close()
+
+    assert RecordingSearch(None, Cassette(str(path), mode=REPLAY))("query") == results
@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ennchan_rag.core.generation import GenerationConfig
+from ennchan_rag.llms import ServerLLM
+
+
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    """Completion endpoints of an OpenAI-compatible server and of llama.cpp's server."""
+    protocol_version = "HTTP/1.1"
+    # Streamed words and the seconds between them
+    words = ["alpha ", "beta ", "gamma "]
+    delay = 0.0
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append((self.path, body))
+        openai = self.path == "/v1/completions"
+        if body.get("stream"):
+            self._stream(openai)
+        elif openai:
+            prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+            self._send_json({
+                "choices": [{"index": index, "text": f"answer to {prompt}"} for index, prompt in enumerate(prompts)],
+                "usage": {"prompt_tokens": 10 * len(prompts), "completion_tokens": 3 * len(prompts),
+                          "prompt_tokens_details": {"cached_tokens": 4}},
+            })
+        else:
+            self._send_json({"content": f"answer to {body['prompt']}", "tokens_evaluated": 10,
+                             "tokens_cached": 6, "tokens_predicted": 3})
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, openai):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(event):
+            data = ("data: " + (event if isinstance(event, str) else json.dumps(event)) + "\n\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        try:
+            for word in self.words:
+                send({"choices": [{"index": 0, "text": word}]} if openai else {"content": word, "stop": False})
+                time.sleep(self.delay)
+            if openai:
+                send({"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": len(self.words),
+                                               "prompt_tokens_details": {"cached_tokens": 4}}})
+                send("[DONE]")
+            else:
+                send({"content": "", "stop": True, "tokens_evaluated": 10, "tokens_cached": 6,
+                      "tokens_predicted": len(self.words)})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early
+            pass
+
+
+@pytest.fixture
+def server():
+    handler = type("Handler", (StubCompletionHandler,), {"requests": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("api, cached", [("openai", 4), ("llamacpp", 6)])
+def test_invoke_records_stats(server, api, cached):
+    handler, url = server
+    llm = ServerLLM(base_url=url, api=api, model="stub")
+
+    assert llm.invoke("question", GenerationConfig(max_new_tokens=8)) == "answer to question"
+    path, body = handler.requests[-1]
+    assert path == ("/v1/completions" if api == "openai" else "/completion")
+    assert body["stream"] is False
+    assert llm.stats["calls"] == 1
+    assert llm.stats["prefix_hits"] == 1
+    assert llm.stats["prefill_tokens_saved"] == cached
+    assert llm.stats["prefill_tokens"] == 10 - cached
+    assert llm.stats["generated_tokens"] == 3
+
+
+@pytest.mark.parametrize("api", ["openai", "llamacpp"])
+def test_stream_yields_server_sent_events(server, api):
+    handler, url = server
+    llm = ServerLLM(base_url=url, api=api)
+
+    assert list(llm.stream("question", GenerationConfig(max_new_tokens=8))) == ["alpha ", "beta ", "gamma "]
+    assert handler.requests[-1][1]["stream"] is True
+    assert llm.stats["streamed_calls"] == 1
+    assert llm.stats["generated_tokens"] == 3
+
+
+def test_openai_batch_sends_one_request(server):
+    handler, url = server
+    llm = ServerLLM(base_url=url, api="openai")
+
+    assert llm.batch(["one", "two", "three"]) == ["answer to one", "answer to two", "answer to three"]
+    assert len(handler.requests) == 1
+    assert handler.requests[0][1]["prompt"] == ["one", "two", "three"]
+    assert llm.stats["calls"] == 3
+
+
+def test_llamacpp_batch_sends_concurrent_requests(server):
+    handler, url = server
+    llm = ServerLLM(base_url=url, api="llamacpp")
+
+    assert llm.batch(["one", "two", "three"]) == ["answer to one", "answer to two", "answer to three"]
+    assert sorted(body["prompt"] for _, body in handler.requests) == ["one", "three", "two"]
+    assert all(body["cache_prompt"] for _, body in handler.requests)
+    assert llm.stats["calls"] == 3
+
+
+@pytest.mark.parametrize("api", ["openai", "llamacpp"])
+def test_invoke_stops_reading_at_a_choice(server, api):
+    handler, url = server
+    handler.words = ["The ", "answer ", "is ", "FACTUAL ", "because "] + ["more "] * 40
+    handler.delay = 0.02
+    llm = ServerLLM(base_url=url, api=api)
+
+    start = time.perf_counter()
+    answer = llm.invoke("question", GenerationConfig(max_new_tokens=64, choices=["FACTUAL", "OPINION"]))
+    assert answer == "The answer is FACTUAL"
+    # The full stream would take almost a second
+    assert time.perf_counter() - start < 0.5
+    assert handler.requests[-1][1]["stream"] is True
+
+
+@pytest.mark.parametrize("api", ["openai", "llamacpp"])
+def test_invoke_stops_reading_at_max_time(server, api):
+    handler, url = server
+    handler.words = ["word "] * 100
+    handler.delay = 0.02
+    llm = ServerLLM(base_url=url, api=api)
+
+    start = time.perf_counter()
+    answer = llm.invoke("question", GenerationConfig(max_new_tokens=128, max_time=0.2))
+    assert time.perf_counter() - start < 1.0
+    assert 0 < answer.count("word") < 100
+    if api == "llamacpp":
+        assert handler.requests[-1][1]["t_max_predict_ms"] == 200
@@ -0,0 +1,63 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from ennchan_rag.stores import ManagedVectorStore, benchmark_store
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic embeddings from the characters of a text."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = np.zeros(8, dtype=np.float32)
+        for i, char in enumerate(text):
+            vector[i % 8] += ord(char)
+        return vector.tolist()
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = ManagedVectorStore(HashEmbeddings())
+    store.add_texts(["alpha", "beta", "gamma"], metadatas=[{"source": "corpus"}] * 3, ids=["a", "b", "c"])
+    store.save(str(tmp_path))
+    # Saving again replaces the previous version
+    store.save(str(tmp_path))
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("store-")]) == 1
+
+    loaded = ManagedVectorStore.load(str(tmp_path), HashEmbeddings())
+    assert sorted(doc.page_content for doc in loaded.get_all_documents()) == ["alpha", "beta", "gamma"]
+    assert loaded.similarity_search("beta", k=1)[0].page_content == "beta"
+
+
+def test_load_rejects_mismatched_files(tmp_path):
+    store = ManagedVectorStore(HashEmbeddings())
+    store.add_texts(["alpha", "beta"], metadatas=[{"source": "corpus"}] * 2)
+    store.save(str(tmp_path))
+
+    with open(tmp_path / ManagedVectorStore.INDEX_FILE, "r", encoding="utf-8") as f:
+        version = json.load(f)["version"]
+    with open(tmp_path / version / ManagedVectorStore.DOCUMENTS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "x", "text": "extra", "metadata": {}}) + "\n")
+
+    with pytest.raises(ValueError):
+        ManagedVectorStore.load(str(tmp_path), HashEmbeddings())
+
+
+def test_load_reads_the_unversioned_layout(tmp_path):
+    np.save(tmp_path / ManagedVectorStore.VECTORS_FILE, np.ones((1, 8), dtype=np.float32))
+    with open(tmp_path / ManagedVectorStore.DOCUMENTS_FILE, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "a", "text": "alpha", "metadata": {}}) + "\n")
+
+    loaded = ManagedVectorStore.load(str(tmp_path), HashEmbeddings())
+    assert [doc.page_content for doc in loaded.get_all_documents()] == ["alpha"]
+
+
+def test_benchmark_store_measures_less_than_one_document_per_chunk():
+    result = benchmark_store(chunks=2000, dimension=16, searches=2)
+    assert result["metadata_records"] == 400
+    assert result["text_bytes_per_chunk"] < result["store_bytes_per_chunk"] < result["documents_bytes_per_chunk"]
@@ -0,0 +1,53 @@
+import time
+
+from ennchan_rag.core.summaries import SummaryStage
+
+
+def summarize_slowly(result):
+    time.sleep(0.5)
+    return {"url": result["url"], "summary": "done"}
+
+
+def test_collect_returns_every_summary():
+    stage = SummaryStage(lambda result: {"url": result["url"]}, workers=2)
+    for i in range(5):
+        stage.submit({"url": f"https://example.com/{i}"})
+
+    outputs, unfinished = stage.collect()
+    assert sorted(output["url"] for output in outputs) == [f"https://example.com/{i}" for i in range(5)]
+    assert unfinished == 0
+
+
+def test_collect_timeout_stops_the_workers():
+    stage = SummaryStage(summarize_slowly, workers=2)
+    for i in range(4):
+        stage.submit({"url": f"https://example.com/{i}"})
+
+    outputs, unfinished = stage.collect(timeout=0.2)
+    assert outputs == []
+    assert unfinished == 4
+
+    # The running summaries finish, then the workers exit instead of waiting for more
+    for worker in stage._workers:
+        worker.join(2.0)
+    assert not any(worker.is_alive() for worker in stage._workers)
+
+
+def test_cancel_refuses_new_results():
+    stage = SummaryStage(summarize_slowly, workers=1)
+    stage.cancel()
+    assert not stage.submit({"url": "https://example.com/late"})
+    stage._workers[0].join(2.0)
+    assert not stage._workers[0].is_alive()
+
+
+def test_full_queue_never_blocks_past_the_timeout():
+    stage = SummaryStage(summarize_slowly, workers=1, max_pending=1)
+    start = time.monotonic()
+    queued = [stage.submit({"url": f"https://example.com/{i}"}, timeout=0.1) for i in range(4)]
+    assert queued.count(False) == stage.dropped > 0
+
+    # The queue is full of slow work, yet collect keeps to its timeout
+    outputs, unfinished = stage.collect(timeout=0.2)
+    assert time.monotonic() - start < 1.0
+    assert unfinished == stage.submitted - len(outputs)
@@ -0,0 +1,33 @@
+from ennchan_rag.utils import SummaryCache
+
+
+def test_changed_settings_invalidate_summaries(tmp_path):
+    path = str(tmp_path / "summaries.sqlite")
+    cache = SummaryCache(path, model="model", settings={"summary_prompt": "Summarize:"})
+    cache.put("page", "type:FACTUAL", "summary")
+    cache.close()
+
+    cache = SummaryCache(path, model="model", settings={"summary_prompt": "Summarize:"})
+    assert cache.get("page", "type:FACTUAL") == "summary"
+    cache.close()
+
+    cache = SummaryCache(path, model="model", settings={"summary_prompt": "Summarize briefly:"})
+    assert cache.stats["invalidated"] == 1
+    assert cache.get("page", "type:FACTUAL") is None
+    cache.close()
+
+
+def test_unused_summaries_expire_when_the_cache_opens(tmp_path):
+    path = str(tmp_path / "summaries.sqlite")
+    cache = SummaryCache(path, model="model")
+    cache.put("old page", "type:FACTUAL", "old summary")
+    cache.put("new page", "type:FACTUAL", "new summary")
+    with cache._conn:
+        cache._conn.execute("UPDATE summaries SET last_used = 0 WHERE content_hash = 'old page'")
+    cache.close()
+
+    cache = SummaryCache(path, model="model", max_age=3600)
+    assert cache.stats["evicted"] == 1
+    assert cache.get("old page", "type:FACTUAL") is None
+    assert cache.get("new page", "type:FACTUAL") == "new summary"
+    cache.close()